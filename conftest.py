@@ -1,10 +1,9 @@
 from pathlib import Path
 
 import pytest
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from jupyter_scheduler.orm import Base
+from jupyter_scheduler.orm import Base, dispose_engines, get_engine
 from jupyter_scheduler.scheduler import Scheduler
 from jupyter_scheduler.tests.mocks import MockEnvironmentManager
 
@@ -45,12 +44,13 @@ def jp_scheduler_db_url(jp_scheduler_staging_dir: Path) -> str:
 
 @pytest.fixture
 def jp_scheduler_db(jp_scheduler_db_url):
-    engine = create_engine(jp_scheduler_db_url, echo=False)
+    engine = get_engine(jp_scheduler_db_url)
     Base.metadata.create_all(engine)
     Session = sessionmaker(bind=engine)
     session = Session()
     yield session
     session.close()
+    dispose_engines()
 
 
 @pytest.fixture
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+import click
+
+from jupyter_scheduler.utils import DEFAULT_COPY_BUFFER_SIZE, copy_file
+
+
+def read_write_copy(source: str, destination: str, buffer_size: int):
+    """Copy of earlier versions, which read the whole file into memory"""
+    with open(source, "rb") as source_file:
+        with open(destination, "wb") as destination_file:
+            destination_file.write(source_file.read())
+
+
+def measure(copy, source: str, destination: str, buffer_size: int):
+    """Returns the seconds and the peak bytes allocated by Python to copy `source`"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        copy(source, destination, buffer_size)
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        os.remove(destination)
+
+
+@click.command(
+    help="Compares the peak memory of copying a staging input file by reading it whole and by streaming it."
+)
+@click.option("--size-mb", default=512, help="Size of the copied file in MB, default is 512.")
+@click.option(
+    "--buffer-size",
+    default=DEFAULT_COPY_BUFFER_SIZE,
+    help=f"Size of the copy chunks in bytes, default is {DEFAULT_COPY_BUFFER_SIZE}.",
+)
+def main(size_mb, buffer_size) -> None:
+    with tempfile.TemporaryDirectory() as root_dir:
+        source = os.path.join(root_dir, "input.csv")
+        with open(source, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        destination = os.path.join(root_dir, "staging", "input.csv")
+        os.makedirs(os.path.dirname(destination))
+        click.echo(f"Copying a {size_mb} MB file\n")
+        for label, copy in {"read and write": read_write_copy, "copy_file": copy_file}.items():
+            seconds, peak = measure(copy, source, destination, buffer_size)
+            click.echo(f"{label:>16}: {seconds * 1000:8.1f} ms, peak {peak / 1024 / 1024:8.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
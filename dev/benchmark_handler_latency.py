@@ -0,0 +1,107 @@
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional
+
+import click
+import nbformat
+
+from jupyter_scheduler.models import CreateJob, ListJobsQuery
+from jupyter_scheduler.orm import create_tables
+from jupyter_scheduler.scheduler import Scheduler
+from jupyter_scheduler.tests.mocks import MockEnvironmentManager
+
+
+class NoExecutionScheduler(Scheduler):
+    """Stages the jobs it creates without executing them"""
+
+    def start_job_process(
+        self, job_id: str, staging_paths: Dict[str, str], compute_type: Optional[str] = None
+    ) -> int:
+        return 0
+
+
+def write_input_folder(root_dir: str, input_mb: int) -> str:
+    """Writes a notebook next to `input_mb` MB of data files, returns the notebook path"""
+    with open(os.path.join(root_dir, "input.ipynb"), "w") as f:
+        notebook = nbformat.v4.new_notebook()
+        notebook.metadata["kernelspec"] = {"name": "python3", "display_name": "Python 3"}
+        nbformat.write(notebook, f)
+    for index in range(input_mb):
+        with open(os.path.join(root_dir, f"data-{index}.bin"), "wb") as f:
+            f.write(os.urandom(1024 * 1024))
+    return "input.ipynb"
+
+
+async def call(executor: Optional[ThreadPoolExecutor], func, *args):
+    """Calls `func` on the event loop, or in `executor` as the handlers do"""
+    if not executor:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(func, *args))
+
+
+async def time_list_requests(
+    scheduler: Scheduler, executor: Optional[ThreadPoolExecutor], input_uri: str, requests: int
+):
+    """Returns the seconds each list request took, from its arrival while a
+    job is being created to its response
+    """
+
+    async def list_jobs(start: float):
+        await call(executor, scheduler.list_jobs, ListJobsQuery(max_items=100))
+        return time.perf_counter() - start
+
+    model = CreateJob(
+        input_uri=input_uri,
+        runtime_environment_name="default",
+        name="benchmark",
+        package_input_folder=True,
+    )
+    # The list requests arrive right after the create request
+    start = time.perf_counter()
+    create = asyncio.ensure_future(call(executor, scheduler.create_job, model))
+    latencies = await asyncio.gather(*[list_jobs(start) for _ in range(requests)])
+    await create
+    return latencies
+
+
+@click.command(
+    help="Compares the latency of list requests sent while a job is created, with scheduler calls on the event loop and in a thread pool."
+)
+@click.option(
+    "--input-mb", default=256, help="Size of the packaged input folder in MB, default is 256."
+)
+@click.option("--requests", default=5, help="No of concurrent list requests, default is 5.")
+@click.option("--threads", default=4, help="No of threads of the pool, default is 4.")
+def main(input_mb, requests, threads) -> None:
+    with tempfile.TemporaryDirectory() as root_dir:
+        db_url = f"sqlite:///{os.path.join(root_dir, 'scheduler.sqlite')}"
+        create_tables(db_url, drop_tables=True)
+        input_uri = write_input_folder(root_dir, input_mb)
+
+        scheduler = NoExecutionScheduler(
+            db_url=db_url,
+            root_dir=root_dir,
+            environments_manager=MockEnvironmentManager(),
+            task_runner_class=None,
+            staging_path=os.path.join(root_dir, "staging"),
+        )
+        # Warms up the connection pool and the statement caches
+        scheduler.list_jobs(ListJobsQuery(max_items=100))
+
+        click.echo(f"{requests} list requests while creating a job with {input_mb} MB of input\n")
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for label, mode in {"event loop": None, "thread pool": executor}.items():
+                latencies = asyncio.run(time_list_requests(scheduler, mode, input_uri, requests))
+                click.echo(
+                    f"{label:>12}: median {statistics.median(latencies) * 1000:8.1f} ms, "
+                    f"max {max(latencies) * 1000:8.1f} ms"
+                )
+
+
+if __name__ == "__main__":
+    main()
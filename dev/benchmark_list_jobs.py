@@ -0,0 +1,90 @@
+import os
+import statistics
+import tempfile
+import time
+
+import click
+
+from jupyter_scheduler.models import ListJobsQuery
+from jupyter_scheduler.orm import Job, create_session, create_tables
+from jupyter_scheduler.scheduler import Scheduler
+from jupyter_scheduler.tests.mocks import MockEnvironmentManager
+from jupyter_scheduler.utils import get_utc_timestamp
+
+# Columns shown by the jobs list of the UI
+DEFAULT_FIELDS = "name,input_filename,create_time,status,status_message,job_files"
+
+
+def insert_jobs(db_url: str, jobs_count: int):
+    now = get_utc_timestamp()
+    rows = [
+        {
+            "job_id": f"job-{index:08d}",
+            "name": f"job {index}",
+            "runtime_environment_name": "environment-a",
+            "runtime_environment_parameters": {f"param_{i}": "x" * 20 for i in range(20)},
+            "input_filename": f"notebook-{index % 50}.ipynb",
+            "output_formats": ["ipynb", "html"],
+            "parameters": {f"parameter_{i}": "y" * 20 for i in range(20)},
+            "tags": ["benchmark"],
+            "status": "COMPLETED",
+            "create_time": now - index,
+            "update_time": now - index,
+            "package_input_folder": True,
+            "packaged_files": [f"data/file-{i}.csv" for i in range(50)],
+        }
+        for index in range(jobs_count)
+    ]
+    with create_session(db_url)() as session:
+        session.bulk_insert_mappings(Job, rows)
+        session.commit()
+
+
+def time_list_jobs(scheduler: Scheduler, query: ListJobsQuery, repeat: int) -> float:
+    """Returns the median seconds to list and serialize a page of jobs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = scheduler.list_jobs(query)
+        response.json(exclude_none=True, exclude_unset=bool(query.fields))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+@click.command(
+    help="Compares the time to list pages of jobs with all fields and with the fields selected by `--fields`."
+)
+@click.option("--jobs-count", default=10000, help="No of jobs to insert, default is 10000.")
+@click.option("--max-items", default=1000, help="No of jobs per page, default is 1000.")
+@click.option("--repeat", default=10, help="No of timed requests for each query, default is 10.")
+@click.option("--fields", default=DEFAULT_FIELDS, help="Comma separated job fields to select.")
+def main(jobs_count, max_items, repeat, fields) -> None:
+    with tempfile.TemporaryDirectory() as root_dir:
+        db_url = f"sqlite:///{os.path.join(root_dir, 'scheduler.sqlite')}"
+        create_tables(db_url, drop_tables=True)
+        insert_jobs(db_url, jobs_count)
+
+        scheduler = Scheduler(
+            db_url=db_url,
+            root_dir=root_dir,
+            environments_manager=MockEnvironmentManager(),
+            task_runner_class=None,
+        )
+        queries = {
+            "all fields": ListJobsQuery(max_items=max_items),
+            "selected fields": ListJobsQuery(max_items=max_items, fields=fields.split(",")),
+        }
+        # Warms up the connection pool and the statement caches
+        for query in queries.values():
+            scheduler.list_jobs(query)
+
+        click.echo(f"Listing {max_items} of {jobs_count} jobs, median of {repeat} requests\n")
+        baseline = None
+        for label, query in queries.items():
+            seconds = time_list_jobs(scheduler, query, repeat)
+            baseline = baseline or seconds
+            click.echo(f"{label:>16}: {seconds * 1000:8.1f} ms ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
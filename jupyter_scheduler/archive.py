@@ -0,0 +1,146 @@
+import gzip
+import json
+import os
+import tarfile
+from typing import Collection, Dict, Iterable, List, Optional
+
+import fsspec
+
+from jupyter_scheduler.utils import DEFAULT_COPY_BUFFER_SIZE, copy_file_object
+
+# Suffix of the member index written next to an archive
+INDEX_SUFFIX = ".index.json"
+
+
+def index_path(archive_path: str) -> str:
+    return archive_path + INDEX_SUFFIX
+
+
+def archive_index(members: Iterable[tarfile.TarInfo]) -> Dict[str, Dict[str, int]]:
+    """Returns the offset of the data of every file of the archive in its
+    uncompressed stream, with the size of the file, by member name
+    """
+    return {
+        member.name: {"offset": member.offset_data, "size": member.size}
+        for member in members
+        if member.isfile()
+    }
+
+
+def add_file(tar: tarfile.TarFile, path: str, arcname: str, index: Dict[str, Dict[str, int]]):
+    """Adds the file at `path` to `tar`, an archive opened for writing, as
+    `arcname`, and records the offset and the size of its data in `index`
+    """
+    tarinfo = tar.gettarinfo(path, arcname)
+    if not tarinfo.isfile():
+        tar.addfile(tarinfo)
+        return
+    with open(path, "rb") as f:
+        tar.addfile(tarinfo, f)
+    # The data ends at the current offset of the archive, padded to a full block
+    padded_size = -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+    index[arcname] = {"offset": tar.offset - padded_size, "size": tarinfo.size}
+
+
+def write_index(archive_path: str, index: Dict[str, Dict[str, int]]):
+    with fsspec.open(index_path(archive_path), "w") as f:
+        json.dump({"members": index}, f)
+
+
+def read_index(archive_path: str) -> Optional[Dict[str, Dict[str, int]]]:
+    """Returns the member index of the archive, None if it has none"""
+    try:
+        with fsspec.open(index_path(archive_path), "r") as f:
+            return json.load(f)["members"]
+    except (FileNotFoundError, KeyError, ValueError):
+        return None
+
+
+def member_destination(output_dir: str, name: str) -> Optional[str]:
+    """Returns the path that the member `name` is extracted to, None
+    for the members whose path is outside of `output_dir`
+    """
+    output_dir = os.path.abspath(output_dir)
+    destination = os.path.abspath(os.path.join(output_dir, name))
+    if os.path.commonpath([output_dir, destination]) != output_dir:
+        return None
+    return destination
+
+
+def extract_members(
+    archive_path: str,
+    output_dir: str,
+    names: Optional[Collection[str]] = None,
+    compressed: bool = True,
+    overwrite: bool = True,
+    buffer_size: int = DEFAULT_COPY_BUFFER_SIZE,
+) -> List[str]:
+    """Extracts the files of the archive at `archive_path`, any path supported by
+    fsspec, to `output_dir` and returns the names of the extracted files.
+
+    The archive is decompressed and read as a stream, without seeking. When `names`
+    is given only these files are extracted, and reading stops after the last of
+    them, so that the files after it are not decompressed. The member index of the
+    archive is written when it has none and the archive was read to the end.
+    """
+    wanted = set(names) if names is not None else None
+    extracted = []
+    members = []
+    with fsspec.open(archive_path, "rb") as f:
+        with tarfile.open(fileobj=f, mode="r|gz" if compressed else "r|") as tar:
+            for member in tar:
+                members.append(member)
+                if not member.isfile() or (wanted is not None and member.name not in wanted):
+                    continue
+                destination = member_destination(output_dir, member.name)
+                if destination and (overwrite or not os.path.exists(destination)):
+                    os.makedirs(os.path.dirname(destination), exist_ok=True)
+                    with tar.extractfile(member) as source, open(destination, "wb") as target:
+                        copy_file_object(source, target, buffer_size)
+                    os.utime(destination, (member.mtime, member.mtime))
+                    extracted.append(member.name)
+                if wanted is not None:
+                    wanted.discard(member.name)
+                    if not wanted:
+                        return extracted
+
+    if read_index(archive_path) is None:
+        write_index(archive_path, archive_index(members))
+    return extracted
+
+
+def read_chunk(source, size: int, name: str) -> bytes:
+    chunk = source.read(size)
+    if not chunk:
+        raise EOFError(f"Archive ends before the end of '{name}'.")
+    return chunk
+
+
+def copy_member(
+    archive_path: str,
+    name: str,
+    destination: str,
+    index: Dict[str, Dict[str, int]],
+    compressed: bool = True,
+    buffer_size: int = DEFAULT_COPY_BUFFER_SIZE,
+):
+    """Copies the file `name` of the archive to `destination` with the member
+    `index` of the archive. The file is read directly at its offset in an
+    uncompressed archive, a compressed archive is decompressed up to the end of
+    the file without parsing the members before it.
+    """
+    offset, size = index[name]["offset"], index[name]["size"]
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    with fsspec.open(archive_path, "rb") as f:
+        source = gzip.GzipFile(fileobj=f) if compressed else f
+        with source, open(destination, "wb") as target:
+            if compressed:
+                # Compressed streams cannot seek, the data before the file is skipped
+                while offset:
+                    offset -= len(read_chunk(source, min(offset, buffer_size), name))
+            else:
+                source.seek(offset)
+            while size:
+                chunk = read_chunk(source, min(size, buffer_size), name)
+                target.write(chunk)
+                size -= len(chunk)
@@ -20,3 +20,15 @@ class IdempotencyTokenError(Exception):
 
     def __str__(self):
         return f"Job with Idempotency Token '{self.idempotency_token}' already exists."
+
+
+class InputFolderTooLargeError(SchedulerError):
+    def __init__(self, input_dir: str, max_bytes: int):
+        self.input_dir = input_dir
+        self.max_bytes = max_bytes
+
+    def __str__(self):
+        return (
+            f"Input folder '{self.input_dir}' is larger than the limit of {self.max_bytes} bytes "
+            "for packaged input folders."
+        )
@@ -11,8 +11,10 @@ import nbconvert
 import nbformat
 from nbconvert.preprocessors import CellExecutionError, ExecutePreprocessor
 
+from jupyter_scheduler.archive import add_file, write_index
+from jupyter_scheduler.kernel_pool import get_kernel_pool
 from jupyter_scheduler.models import DescribeJob, JobFeature, Status
-from jupyter_scheduler.orm import Job, create_session
+from jupyter_scheduler.orm import Job, create_session, retry_on_db_lock
 from jupyter_scheduler.parameterize import add_parameters
 from jupyter_scheduler.utils import get_utc_timestamp
 
@@ -89,34 +91,31 @@ class ExecutionManager(ABC):
         """Returns True if notebook has valid metadata to execute, False otherwise"""
         return True
 
+    def update_job(self, values: Dict):
+        """Updates the job record, retries while the database
+        is locked by the writes of other job processes
+        """
+
+        def update():
+            with self.db_session() as session:
+                session.query(Job).filter(Job.job_id == self.job_id).update(values)
+                session.commit()
+
+        retry_on_db_lock(update)
+
     def before_start(self):
         """Called before start of execute"""
-        job = self.model
-        with self.db_session() as session:
-            session.query(Job).filter(Job.job_id == job.job_id).update(
-                {"start_time": get_utc_timestamp(), "status": Status.IN_PROGRESS}
-            )
-            session.commit()
+        self.update_job({"start_time": get_utc_timestamp(), "status": Status.IN_PROGRESS})
 
     def on_failure(self, e: Exception):
         """Called after failure of execute"""
-        job = self.model
-        with self.db_session() as session:
-            session.query(Job).filter(Job.job_id == job.job_id).update(
-                {"status": Status.FAILED, "status_message": str(e)}
-            )
-            session.commit()
+        self.update_job({"status": Status.FAILED, "status_message": str(e)})
 
         traceback.print_exc()
 
     def on_complete(self):
         """Called after job is completed"""
-        job = self.model
-        with self.db_session() as session:
-            session.query(Job).filter(Job.job_id == job.job_id).update(
-                {"status": Status.COMPLETED, "end_time": get_utc_timestamp()}
-            )
-            session.commit()
+        self.update_job({"status": Status.COMPLETED, "end_time": get_utc_timestamp()})
 
 
 class DefaultExecutionManager(ExecutionManager):
@@ -132,17 +131,26 @@ class DefaultExecutionManager(ExecutionManager):
             nb = add_parameters(nb, job.parameters)
 
         staging_dir = os.path.dirname(self.staging_paths["input"])
-        ep = ExecutePreprocessor(
-            kernel_name=nb.metadata.kernelspec["name"], store_widget_state=True, cwd=staging_dir
-        )
+        kernel_name = nb.metadata.kernelspec["name"]
+        ep = ExecutePreprocessor(kernel_name=kernel_name, store_widget_state=True, cwd=staging_dir)
+
+        # A kernel pool is only configured in pooled worker processes
+        kernel_pool = get_kernel_pool()
+        kernel = kernel_pool.acquire(kernel_name, cwd=staging_dir) if kernel_pool else None
 
         try:
-            ep.preprocess(nb, {"metadata": {"path": staging_dir}})
+            ep.preprocess(nb, {"metadata": {"path": staging_dir}}, km=kernel.km if kernel else None)
         except CellExecutionError as e:
             raise e
         finally:
-            self.add_side_effects_files(staging_dir)
-            self.create_output_files(job, nb)
+            try:
+                self.add_side_effects_files(staging_dir)
+                self.create_output_files(job, nb)
+            finally:
+                if kernel:
+                    if ep.kc:
+                        ep.kc.stop_channels()
+                    kernel_pool.release(kernel)
 
     def add_side_effects_files(self, staging_dir: str):
         """Scan for side effect files potentially created after input file execution and update the job's packaged_files with these files"""
@@ -154,7 +162,7 @@ class DefaultExecutionManager(ExecutionManager):
                 if file_rel_path != input_notebook:
                     new_files_set.add(file_rel_path)
 
-        if new_files_set:
+        def update_packaged_files():
             with self.db_session() as session:
                 current_packaged_files_set = set(
                     session.query(Job.packaged_files).filter(Job.job_id == self.job_id).scalar()
@@ -166,6 +174,9 @@ class DefaultExecutionManager(ExecutionManager):
                 )
                 session.commit()
 
+        if new_files_set:
+            retry_on_db_lock(update_packaged_files)
+
     def create_output_files(self, job: DescribeJob, notebook_node):
         for output_format in job.output_formats:
             cls = nbconvert.get_exporter(output_format)
@@ -250,16 +261,18 @@ class ArchivingExecutionManager(DefaultExecutionManager):
             # Create an archive file of the staging directory for this run
             # and everything under it
             fh = io.BytesIO()
+            index = {}
             with tarfile.open(fileobj=fh, mode="w:gz") as tar:
                 for root, dirs, files in os.walk(local_staging_dir):
                     for file in files:
                         # This flattens the directory structure, so that in the tar
                         # file, output files and side-effect files are side-by-side
-                        tar.add(os.path.join(root, file), file)
+                        add_file(tar, os.path.join(root, file), file, index)
 
             archive_filepath = self.staging_paths["tar.gz"]
             with fsspec.open(archive_filepath, "wb") as f:
                 f.write(fh.getvalue())
+            write_index(archive_filepath, index)
 
             # Clean up the side-effect files in the run directory
             shutil.rmtree(run_dir)
@@ -0,0 +1,112 @@
+import json
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+from sqlalchemy import Select, delete, exc, insert, select, type_coerce
+
+from jupyter_scheduler.exceptions import SchedulerError
+from jupyter_scheduler.models import EmailNotifications
+from jupyter_scheduler.orm import EmailNotificationType, JsonType
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def export_statement(model, id_column, batch_size: int = DEFAULT_BATCH_SIZE) -> Select:
+    """Returns the statement that streams all rows of `model` in `id_column` order,
+    fetching `batch_size` rows at a time from a server side cursor
+    """
+    columns = [
+        # Email notifications are exported as the stored JSON object
+        (
+            type_coerce(column, JsonType).label(column.name)
+            if isinstance(column.type, EmailNotificationType)
+            else column
+        )
+        for column in model.__table__.columns
+    ]
+    return (
+        select(*columns)
+        .order_by(id_column)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+
+
+def to_ndjson(rows: Iterable[Any]) -> str:
+    """Returns the rows as newline delimited JSON objects"""
+    return "".join(json.dumps(dict(row._mapping)) + "\n" for row in rows)
+
+
+def export_rows(session, model, id_column, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[str]:
+    """Yields all rows of `model` as NDJSON, one chunk of `batch_size` rows at a time"""
+    result = session.execute(export_statement(model, id_column, batch_size))
+    for rows in result.partitions():
+        yield to_ndjson(rows)
+
+
+def parse_row(table, line: str, line_number: int) -> Dict[str, Any]:
+    """Returns the insert values of `table` for a row exported as NDJSON,
+    columns missing from the row are set to NULL and unknown keys are ignored
+    """
+    try:
+        values = json.loads(line)
+    except ValueError:
+        raise SchedulerError(f"Invalid JSON on line {line_number}.")
+    if not isinstance(values, dict):
+        raise SchedulerError(f"Line {line_number} is not a JSON object.")
+
+    row = {}
+    for column in table.columns:
+        value = values.get(column.name)
+        if column.primary_key and not value:
+            raise SchedulerError(f"Line {line_number} has no '{column.name}'.")
+        if value is not None and isinstance(column.type, EmailNotificationType):
+            value = EmailNotifications(**value)
+        row[column.name] = value
+
+    return row
+
+
+def import_rows(
+    session,
+    model,
+    tag_column,
+    lines: Iterable[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> int:
+    """Inserts the NDJSON rows of `lines` into the table of `model` and
+    their tags into the tag table of `tag_column`, with one multi-row
+    insert per `batch_size` rows. Returns the number of inserted rows,
+    the caller commits the session.
+    """
+    table = model.__table__
+    id_name = tag_column.name
+    numbered_lines = ((n, line) for n, line in enumerate(lines, 1) if line.strip())
+
+    count = 0
+    while True:
+        rows: List[Dict[str, Any]] = [
+            parse_row(table, line, n) for n, line in islice(numbered_lines, batch_size)
+        ]
+        if not rows:
+            break
+
+        tags = [
+            {id_name: row[id_name], "tag": tag}
+            for row in rows
+            for tag in sorted(set(row.get("tags") or []))
+        ]
+        try:
+            session.execute(insert(table), rows)
+            # Drops tags left behind by rows that were deleted in bulk
+            session.execute(
+                delete(tag_column.table).where(tag_column.in_([row[id_name] for row in rows]))
+            )
+            if tags:
+                session.execute(insert(tag_column.table), tags)
+        except exc.IntegrityError as e:
+            raise SchedulerError(
+                f"Rows {count + 1} to {count + len(rows)} conflict with existing rows: {e.orig}"
+            ) from e
+        count += len(rows)
+
+    return count
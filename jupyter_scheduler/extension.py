@@ -1,20 +1,35 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from jupyter_core.paths import jupyter_data_dir
 from jupyter_server.extension.application import ExtensionApp
 from jupyter_server.transutils import _i18n
-from traitlets import Bool, Type, Unicode, default
-
-from jupyter_scheduler.orm import create_tables
+from traitlets import Bool, Integer, Type, Unicode, default
+
+from jupyter_scheduler.orm import (
+    configure_engines,
+    create_tables,
+    dispose_engines,
+    get_async_db_url,
+    get_pool_stats,
+)
+from jupyter_scheduler.scheduler import AsyncScheduler, Scheduler
 
 from .handlers import (
     BatchJobHandler,
+    BatchStopJobHandler,
     ConfigHandler,
     FilesDownloadHandler,
+    FilesDownloadStatusHandler,
     JobDefinitionHandler,
+    JobDefinitionsExportHandler,
+    JobDefinitionsImportHandler,
     JobFromDefinitionHandler,
     JobHandler,
+    JobsCountByStatusHandler,
     JobsCountHandler,
+    JobsExportHandler,
+    JobsImportHandler,
     RuntimeEnvironmentsHandler,
 )
 
@@ -27,10 +42,17 @@ class SchedulerApp(ExtensionApp):
     handlers = [
         (r"scheduler/jobs", JobHandler),
         (r"scheduler/jobs/count", JobsCountHandler),
+        (r"scheduler/jobs/count_by_status", JobsCountByStatusHandler),
+        (r"scheduler/jobs/export", JobsExportHandler),
+        (r"scheduler/jobs/import", JobsImportHandler),
         (r"scheduler/jobs/%s" % JOB_ID_REGEX, JobHandler),
         (r"scheduler/jobs/%s/download_files" % JOB_ID_REGEX, FilesDownloadHandler),
+        (r"scheduler/jobs/%s/download_files/status" % JOB_ID_REGEX, FilesDownloadStatusHandler),
         (r"scheduler/batch/jobs", BatchJobHandler),
+        (r"scheduler/batch/jobs/stop", BatchStopJobHandler),
         (r"scheduler/job_definitions", JobDefinitionHandler),
+        (r"scheduler/job_definitions/export", JobDefinitionsExportHandler),
+        (r"scheduler/job_definitions/import", JobDefinitionsImportHandler),
         (r"scheduler/job_definitions/%s" % JOB_DEFINITION_ID_REGEX, JobDefinitionHandler),
         (r"scheduler/job_definitions/%s/jobs" % JOB_DEFINITION_ID_REGEX, JobFromDefinitionHandler),
         (r"scheduler/runtime_environments", RuntimeEnvironmentsHandler),
@@ -45,6 +67,43 @@ class SchedulerApp(ExtensionApp):
     def _db_url_default(self):
         return f"sqlite:///{jupyter_data_dir()}/scheduler.sqlite"
 
+    db_pool_size = Integer(
+        default_value=5,
+        config=True,
+        help=_i18n(
+            """Number of connections kept open in the connection pool that is
+        shared by all database sessions of the server process.
+        """
+        ),
+    )
+
+    db_max_overflow = Integer(
+        default_value=10,
+        config=True,
+        help=_i18n("Number of connections that can be opened above `db_pool_size` under load."),
+    )
+
+    db_pool_pre_ping = Bool(
+        default_value=False,
+        config=True,
+        help=_i18n(
+            """Test pooled connections before use and replace stale ones,
+        useful with database servers that close idle connections.
+        """
+        ),
+    )
+
+    db_busy_timeout = Integer(
+        default_value=30000,
+        config=True,
+        help=_i18n(
+            """Milliseconds that a connection to a SQLite database waits for
+        a lock held by another process before failing with "database is locked".
+        Applies to the server and job processes.
+        """
+        ),
+    )
+
     environment_manager_class = Type(
         default_value="jupyter_scheduler.environments.CondaEnvironmentManager",
         klass="jupyter_scheduler.environments.EnvironmentManager",
@@ -66,9 +125,26 @@ class SchedulerApp(ExtensionApp):
         help=_i18n("The job files manager class to use."),
     )
 
+    handler_thread_pool_size = Integer(
+        default_value=8,
+        config=True,
+        help=_i18n(
+            """Number of threads used by the REST handlers to call synchronous
+        scheduler methods, so that database queries and file copies do not
+        block the server event loop. Set to 0 to call them on the event loop.
+        """
+        ),
+    )
+
     def initialize_settings(self):
         super().initialize_settings()
 
+        configure_engines(
+            pool_size=self.db_pool_size,
+            max_overflow=self.db_max_overflow,
+            pool_pre_ping=self.db_pool_pre_ping,
+            sqlite_busy_timeout=self.db_busy_timeout,
+        )
         create_tables(self.db_url, self.drop_tables)
 
         environments_manager = self.environment_manager_class()
@@ -82,12 +158,55 @@ class SchedulerApp(ExtensionApp):
 
         job_files_manager = self.job_files_manager_class(scheduler=scheduler)
 
+        self.scheduler_executor = None
+        if self.handler_thread_pool_size:
+            self.scheduler_executor = ThreadPoolExecutor(
+                max_workers=self.handler_thread_pool_size, thread_name_prefix="jupyter_scheduler"
+            )
+
         self.settings.update(
             environments_manager=environments_manager,
             scheduler=scheduler,
             job_files_manager=job_files_manager,
+            scheduler_executor=self.scheduler_executor,
         )
 
+        loop = asyncio.get_event_loop()
+        self.background_tasks = []
         if scheduler.task_runner:
-            loop = asyncio.get_event_loop()
-            loop.create_task(scheduler.task_runner.start())
+            self.background_tasks.append(loop.create_task(scheduler.task_runner.start()))
+
+        if isinstance(scheduler, Scheduler):
+            self.background_tasks.append(loop.create_task(scheduler.start_job_queue()))
+            if scheduler.retention_enabled:
+                self.background_tasks.append(loop.create_task(scheduler.start_retention()))
+
+    async def stop_extension(self):
+        for task in self.background_tasks:
+            task.cancel()
+
+        if self.scheduler_executor:
+            self.scheduler_executor.shutdown(wait=False)
+
+        scheduler = self.settings.get("scheduler")
+        if isinstance(scheduler, Scheduler) and scheduler.worker_pool:
+            # Idle workers shut down their pooled kernels before exiting
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, scheduler.worker_pool.shutdown)
+            stats = scheduler.worker_pool.stats()
+            if stats:
+                self.log.info(f"Worker pool stats: {stats}")
+
+        if isinstance(scheduler, Scheduler):
+            for label, db_url in {
+                "Database": scheduler.db_url,
+                "Async database": get_async_db_url(scheduler.db_url),
+            }.items():
+                stats = get_pool_stats(db_url)
+                if stats:
+                    self.log.info(f"{label} connection pool stats: {stats}")
+
+        if isinstance(scheduler, AsyncScheduler):
+            await scheduler.dispose()
+
+        dispose_engines()
@@ -1,9 +1,14 @@
+import asyncio
+import inspect
+import io
 import json
 import re
+from functools import partial
 
 from jupyter_server.base.handlers import APIHandler
 from jupyter_server.extension.handler import ExtensionHandlerMixin
 from jupyter_server.utils import ensure_async
+from tornado.iostream import StreamClosedError
 from tornado.web import HTTPError, authenticated
 
 from jupyter_scheduler.environments import EnvironmentRetrievalError
@@ -15,10 +20,13 @@ from jupyter_scheduler.exceptions import (
 from jupyter_scheduler.models import (
     DEFAULT_MAX_ITEMS,
     DEFAULT_SORT,
+    CountJobsByStatusQuery,
     CountJobsQuery,
+    CountMode,
     CreateJob,
     CreateJobDefinition,
     CreateJobFromDefinition,
+    CreateJobResult,
     ListJobDefinitionsQuery,
     ListJobsQuery,
     SortDirection,
@@ -56,6 +64,23 @@ class JobHandlersMixin:
 
         return self._execution_manager_class
 
+    @property
+    def executor(self):
+        return self.settings.get("scheduler_executor", None)
+
+    async def run_in_executor(self, func, *args, **kwargs):
+        """Calls a scheduler or environments manager method without
+        blocking the event loop. Synchronous methods run in the
+        `scheduler_executor` thread pool, coroutine functions are
+        awaited directly.
+        """
+        if inspect.iscoroutinefunction(func) or not self.executor:
+            return await ensure_async(func(*args, **kwargs))
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+        return await ensure_async(result)
+
 
 def compute_sort_model(query_argument):
     sort_by = []
@@ -78,8 +103,8 @@ class JobDefinitionHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     async def get(self, job_definition_id=None):
         if job_definition_id:
             try:
-                job_definition = await ensure_async(
-                    self.scheduler.get_job_definition(job_definition_id)
+                job_definition = await self.run_in_executor(
+                    self.scheduler.get_job_definition, job_definition_id
                 )
             except SchedulerError as e:
                 self.log.exception(e)
@@ -103,8 +128,11 @@ class JobDefinitionHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
                     sort_by=sort_by if sort_by else [DEFAULT_SORT],
                     max_items=self.get_query_argument("max_items", DEFAULT_MAX_ITEMS),
                     next_token=self.get_query_argument("next_token", None),
+                    count_mode=self.get_query_argument("count_mode", CountMode.exact),
+                )
+                list_response = await self.run_in_executor(
+                    self.scheduler.list_job_definitions, list_query
                 )
-                list_response = await ensure_async(self.scheduler.list_job_definitions(list_query))
             except ValidationError as e:
                 self.log.exception(e)
                 raise HTTPError(500, str(e)) from e
@@ -123,8 +151,8 @@ class JobDefinitionHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     async def post(self):
         payload = self.get_json_body()
         try:
-            job_definition_id = await ensure_async(
-                self.scheduler.create_job_definition(CreateJobDefinition(**payload))
+            job_definition_id = await self.run_in_executor(
+                self.scheduler.create_job_definition, CreateJobDefinition(**payload)
             )
         except ValidationError as e:
             self.log.exception(e)
@@ -147,10 +175,10 @@ class JobDefinitionHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     async def patch(self, job_definition_id):
         payload = self.get_json_body()
         try:
-            await ensure_async(
-                self.scheduler.update_job_definition(
-                    job_definition_id, UpdateJobDefinition(**payload)
-                )
+            await self.run_in_executor(
+                self.scheduler.update_job_definition,
+                job_definition_id,
+                UpdateJobDefinition(**payload),
             )
         except ValidationError as e:
             self.log.exception(e)
@@ -170,7 +198,7 @@ class JobDefinitionHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     @authenticated
     async def delete(self, job_definition_id):
         try:
-            await ensure_async(self.scheduler.delete_job_definition(job_definition_id))
+            await self.run_in_executor(self.scheduler.delete_job_definition, job_definition_id)
         except SchedulerError as e:
             self.log.exception(e)
             raise HTTPError(500, str(e)) from e
@@ -189,7 +217,7 @@ class JobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     async def get(self, job_id=None):
         if job_id:
             try:
-                job = await ensure_async(self.scheduler.get_job(job_id))
+                job = await self.run_in_executor(self.scheduler.get_job, job_id)
             except SchedulerError as e:
                 self.log.exception(e)
                 raise HTTPError(500, str(e)) from e
@@ -212,8 +240,13 @@ class JobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
                     sort_by=sort_by if sort_by else [DEFAULT_SORT],
                     max_items=self.get_query_argument("max_items", DEFAULT_MAX_ITEMS),
                     next_token=self.get_query_argument("next_token", None),
+                    count_mode=self.get_query_argument("count_mode", CountMode.exact),
+                    job_files=self.get_query_argument("job_files", True),
+                    fields=self.get_query_arguments("fields", None) or None,
+                )
+                list_jobs_response = await self.run_in_executor(
+                    self.scheduler.list_jobs, list_jobs_query
                 )
-                list_jobs_response = await ensure_async(self.scheduler.list_jobs(list_jobs_query))
             except ValidationError as e:
                 self.log.exception(e)
                 raise HTTPError(500, str(e)) from e
@@ -224,13 +257,18 @@ class JobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
                 self.log.exception(e)
                 raise HTTPError(500, "Unexpected error occurred while getting jobs list.") from e
             else:
-                self.finish(list_jobs_response.json(exclude_none=True))
+                # Jobs only have the selected fields set when `fields` is passed
+                self.finish(
+                    list_jobs_response.json(
+                        exclude_none=True, exclude_unset=bool(list_jobs_query.fields)
+                    )
+                )
 
     @authenticated
     async def post(self):
         payload = self.get_json_body()
         try:
-            job_id = await ensure_async(self.scheduler.create_job(CreateJob(**payload)))
+            job_id = await self.run_in_executor(self.scheduler.create_job, CreateJob(**payload))
         except ValidationError as e:
             self.log.exception(e)
             raise HTTPError(500, str(e)) from e
@@ -264,9 +302,9 @@ class JobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
 
         try:
             if status:
-                await ensure_async(self.scheduler.stop_job(job_id))
+                await self.run_in_executor(self.scheduler.stop_job, job_id)
             else:
-                await ensure_async(self.scheduler.update_job(job_id, UpdateJob(**payload)))
+                await self.run_in_executor(self.scheduler.update_job, job_id, UpdateJob(**payload))
         except ValidationError as e:
             self.log.exception(e)
             raise HTTPError(500, str(e)) from e
@@ -283,7 +321,7 @@ class JobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     @authenticated
     async def delete(self, job_id):
         try:
-            await ensure_async(self.scheduler.delete_job(job_id))
+            await self.run_in_executor(self.scheduler.delete_job, job_id)
         except SchedulerError as e:
             self.log.exception(e)
             raise HTTPError(500, str(e)) from e
@@ -301,8 +339,8 @@ class JobFromDefinitionHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandl
         payload = self.get_json_body()
         try:
             model = CreateJobFromDefinition(**payload)
-            job_id = await ensure_async(
-                self.scheduler.create_job_from_definition(job_definition_id, model=model)
+            job_id = await self.run_in_executor(
+                self.scheduler.create_job_from_definition, job_definition_id, model=model
             )
         except ValidationError as e:
             self.log.exception(e)
@@ -318,12 +356,38 @@ class JobFromDefinitionHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandl
 
 
 class BatchJobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
+    @authenticated
+    async def post(self):
+        payload = self.get_json_body()
+        if not isinstance(payload, list):
+            raise HTTPError(500, "Expected a list of jobs.")
+
+        models = []
+        results = []
+        for item in payload:
+            try:
+                models.append(CreateJob(**item))
+                results.append(None)
+            except (ValidationError, TypeError) as e:
+                results.append(CreateJobResult(error=str(e)))
+
+        try:
+            created = iter(await self.run_in_executor(self.scheduler.create_jobs, models))
+        except SchedulerError as e:
+            self.log.exception(e)
+            raise HTTPError(500, str(e)) from e
+        except Exception as e:
+            self.log.exception(e)
+            raise HTTPError(500, "Unexpected error occurred during creation of jobs.") from e
+
+        results = [result or next(created) for result in results]
+        self.finish(json.dumps({"results": [result.dict(exclude_none=True) for result in results]}))
+
     @authenticated
     async def delete(self):
         job_ids = self.get_query_arguments("job_id")
         try:
-            for job_id in job_ids:
-                await ensure_async(self.scheduler.delete_job(job_id))
+            await self.run_in_executor(self.scheduler.delete_jobs, job_ids)
         except SchedulerError as e:
             self.log.exception(e)
             raise HTTPError(500, str(e)) from e
@@ -335,6 +399,23 @@ class BatchJobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
             self.finish()
 
 
+class BatchStopJobHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
+    @authenticated
+    async def post(self):
+        job_ids = self.get_query_arguments("job_id")
+        try:
+            await self.run_in_executor(self.scheduler.stop_jobs, job_ids)
+        except SchedulerError as e:
+            self.log.exception(e)
+            raise HTTPError(500, str(e)) from e
+        except Exception as e:
+            self.log.exception(e)
+            raise HTTPError(500, "Unexpected error occurred while stopping the jobs.") from e
+        else:
+            self.set_status(204)
+            self.finish()
+
+
 class JobsCountHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     @authenticated
     async def get(self):
@@ -343,7 +424,7 @@ class JobsCountHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
             status=Status(status.upper()) if status else Status.IN_PROGRESS
         )
         try:
-            count = await ensure_async(self.scheduler.count_jobs(count_jobs_query))
+            count = await self.run_in_executor(self.scheduler.count_jobs, count_jobs_query)
         except SchedulerError as e:
             self.log.exception(e)
             raise HTTPError(500, str(e)) from e
@@ -354,13 +435,120 @@ class JobsCountHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
             self.finish(json.dumps(dict(count=count)))
 
 
+class JobsCountByStatusHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
+    @authenticated
+    async def get(self):
+        create_time_start = self.get_query_argument("create_time_start", None)
+        create_time_end = self.get_query_argument("create_time_end", None)
+        try:
+            query = CountJobsByStatusQuery(
+                job_definition_id=self.get_query_argument("job_definition_id", None),
+                create_time_start=int(create_time_start) if create_time_start else None,
+                create_time_end=int(create_time_end) if create_time_end else None,
+            )
+            counts = await self.run_in_executor(self.scheduler.count_jobs_by_status, query)
+        except ValueError as e:
+            self.log.exception(e)
+            raise HTTPError(500, str(e)) from e
+        except SchedulerError as e:
+            self.log.exception(e)
+            raise HTTPError(500, str(e)) from e
+        except Exception as e:
+            self.log.exception(e)
+            raise HTTPError(500, "Unexpected error occurred while getting job counts.") from e
+        else:
+            self.finish(json.dumps(dict(counts={str(status): n for status, n in counts.items()})))
+
+
+class NDJSONHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
+    """Base class for handlers that export and import
+    records as newline delimited JSON (NDJSON)
+    """
+
+    async def write_ndjson(self, export):
+        """Streams the chunks returned by the `export` generator,
+        flushing each chunk before the next one is read
+        """
+        self.set_header("Content-Type", "application/x-ndjson")
+        written = False
+        try:
+            if inspect.isasyncgenfunction(export):
+                async for chunk in export():
+                    self.write(chunk)
+                    written = True
+                    await self.flush()
+            else:
+                chunks = export()
+                try:
+                    while True:
+                        chunk = await self.run_in_executor(next, chunks, None)
+                        if chunk is None:
+                            break
+                        self.write(chunk)
+                        written = True
+                        await self.flush()
+                finally:
+                    await self.run_in_executor(chunks.close)
+        except StreamClosedError:
+            return
+        except Exception as e:
+            self.log.exception(e)
+            if written:
+                # An export that fails midway must not look complete to the client
+                self.request.connection.close()
+                return
+            raise HTTPError(500, "Unexpected error occurred during the export.") from e
+        else:
+            self.finish()
+
+    async def read_ndjson(self, import_):
+        """Passes the lines of the request body to `import_`"""
+        lines = io.TextIOWrapper(io.BytesIO(self.request.body), encoding="utf-8")
+        try:
+            count = await self.run_in_executor(import_, lines)
+        except SchedulerError as e:
+            self.log.exception(e)
+            raise HTTPError(500, str(e)) from e
+        except Exception as e:
+            self.log.exception(e)
+            raise HTTPError(500, "Unexpected error occurred during the import.") from e
+        else:
+            self.finish(json.dumps(dict(count=count)))
+
+
+class JobsExportHandler(NDJSONHandler):
+    @authenticated
+    async def get(self):
+        await self.write_ndjson(self.scheduler.export_jobs)
+
+
+class JobsImportHandler(NDJSONHandler):
+    @authenticated
+    async def post(self):
+        await self.read_ndjson(self.scheduler.import_jobs)
+
+
+class JobDefinitionsExportHandler(NDJSONHandler):
+    @authenticated
+    async def get(self):
+        await self.write_ndjson(self.scheduler.export_job_definitions)
+
+
+class JobDefinitionsImportHandler(NDJSONHandler):
+    @authenticated
+    async def post(self):
+        await self.read_ndjson(self.scheduler.import_job_definitions)
+
+
 class RuntimeEnvironmentsHandler(ExtensionHandlerMixin, JobHandlersMixin, APIHandler):
     @authenticated
     async def get(self):
         """Returns names of available runtime environments and output formats mappings"""
         try:
-            environments = await ensure_async(self.environments_manager.list_environments())
-            output_formats = await ensure_async(self.environments_manager.output_formats_mapping())
+            environments = await self.run_in_executor(self.environments_manager.list_environments)
+            output_formats = await self.run_in_executor(
+                self.environments_manager.output_formats_mapping
+            )
         except EnvironmentRetrievalError as e:
             raise HTTPError(500, str(e))
 
@@ -407,11 +595,29 @@ class FilesDownloadHandler(ExtensionHandlerMixin, APIHandler):
     @authenticated
     async def get(self, job_id):
         redownload = self.get_query_argument("redownload", False)
+        wait = self.get_query_argument("wait", "false") == "true"
+        all_files = self.get_query_argument("all_files", "false") == "true"
         try:
-            await self.job_files_manager.copy_from_staging(job_id=job_id, redownload=redownload)
+            if wait:
+                await self.job_files_manager.wait_for_download(
+                    job_id=job_id, redownload=redownload, all_files=all_files
+                )
+            else:
+                await self.job_files_manager.copy_from_staging(
+                    job_id=job_id, redownload=redownload, all_files=all_files
+                )
         except Exception as e:
             self.log.exception(e)
             raise HTTPError(500, str(e)) from e
         else:
             self.set_status(204)
             self.finish()
+
+
+class FilesDownloadStatusHandler(FilesDownloadHandler):
+    @authenticated
+    async def get(self, job_id):
+        status = self.job_files_manager.download_status(job_id)
+        if status is None:
+            raise HTTPError(404, f"Files of job {job_id} are not being downloaded.")
+        self.finish(json.dumps(dict(status=status)))
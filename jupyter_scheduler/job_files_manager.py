@@ -1,39 +1,160 @@
+import asyncio
 import os
 import random
-import tarfile
-from multiprocessing import Process
-from typing import Dict, List, Optional, Type
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
 
-import fsspec
 from jupyter_server.utils import ensure_async
 
+from jupyter_scheduler.archive import (
+    copy_member,
+    extract_members,
+    member_destination,
+    read_index,
+)
 from jupyter_scheduler.exceptions import SchedulerError
+from jupyter_scheduler.models import Status
 from jupyter_scheduler.scheduler import BaseScheduler
+from jupyter_scheduler.utils import DEFAULT_COPY_BUFFER_SIZE, FileCopier
+
+
+class DownloadOptions(NamedTuple):
+    redownload: bool
+    extract_all_files: bool
+
+    def covers(self, other: "DownloadOptions") -> bool:
+        """Returns True if a download with these options also downloads the
+        files requested with `other`
+        """
+        return (self.redownload or not other.redownload) and (
+            self.extract_all_files or not other.extract_all_files
+        )
 
 
 class JobFilesManager:
+    """Downloads job files from the staging location on a thread pool shared by
+    all jobs, with up to `BaseScheduler.max_concurrent_downloads` downloads at a
+    time. Concurrent downloads of the files of the same job are coalesced, a
+    request gets the future of the download in progress when that download
+    covers its options, otherwise its download starts after that one.
+    """
+
     scheduler = None
 
+    # Number of finished downloads whose status is kept
+    max_finished_downloads = 1000
+
     def __init__(self, scheduler: Type[BaseScheduler]):
         self.scheduler = scheduler
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # The options and future of the last download of each job
+        self._downloads: "OrderedDict[str, Tuple[DownloadOptions, Future]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.scheduler.max_concurrent_downloads,
+                thread_name_prefix="jupyter-scheduler-download",
+            )
+        return self._executor
+
+    async def copy_from_staging(
+        self, job_id: str, redownload: Optional[bool] = False, all_files: Optional[bool] = False
+    ) -> Future:
+        """Starts downloading the files of the job, or joins the download of the job
+        that is in progress, and returns its future without waiting for it.
+        Side-effect files of archived jobs are only extracted with `all_files`
+        when `lazy_archive_extraction` is enabled.
+        """
+        options = DownloadOptions(
+            bool(redownload), bool(all_files or not self.scheduler.lazy_archive_extraction)
+        )
+        with self._lock:
+            pending = self._pending_download(job_id)
+            if pending and pending[0].covers(options):
+                return pending[1]
 
-    async def copy_from_staging(self, job_id: str, redownload: Optional[bool] = False):
         job = await ensure_async(self.scheduler.get_job(job_id, False))
         staging_paths = await ensure_async(self.scheduler.get_staging_paths(job))
         output_filenames = self.scheduler.get_job_filenames(job)
         output_dir = self.scheduler.get_local_output_path(model=job, root_dir_relative=True)
 
-        p = Process(
-            target=Downloader(
-                output_formats=job.output_formats,
-                output_filenames=output_filenames,
-                staging_paths=staging_paths,
-                output_dir=output_dir,
-                redownload=redownload,
-                include_staging_files=job.package_input_folder,
-            ).download
+        downloader = Downloader(
+            output_formats=job.output_formats,
+            output_filenames=output_filenames,
+            staging_paths=staging_paths,
+            output_dir=output_dir,
+            redownload=redownload,
+            include_staging_files=job.package_input_folder,
+            buffer_size=self.scheduler.copy_buffer_size,
+            concurrency=self.scheduler.staging_concurrency,
+            extract_all_files=options.extract_all_files,
         )
-        p.start()
+        with self._lock:
+            # Another request may have started a download while the job was read
+            pending = self._pending_download(job_id)
+            if pending and pending[0].covers(options):
+                return pending[1]
+            # Files are not written by two downloads of the same job at once
+            future = self.executor.submit(
+                run_after, pending[1] if pending else None, downloader.download
+            )
+            future.add_done_callback(partial(self._log_download_error, job_id))
+            self._downloads.pop(job_id, None)
+            self._downloads[job_id] = (options, future)
+            self._forget_finished_downloads()
+        return future
+
+    async def wait_for_download(
+        self, job_id: str, redownload: Optional[bool] = False, all_files: Optional[bool] = False
+    ):
+        """Downloads the files of the job and waits until they are downloaded"""
+        future = await self.copy_from_staging(job_id, redownload, all_files)
+        await asyncio.wrap_future(future)
+
+    def download_status(self, job_id: str) -> Optional[Status]:
+        """Returns the status of the last download of the files of the job,
+        None if they were not downloaded since the server started
+        """
+        with self._lock:
+            download = self._downloads.get(job_id)
+        if download is None:
+            return None
+        future = download[1]
+        if not future.done():
+            return Status.IN_PROGRESS
+        return Status.FAILED if future.exception() else Status.COMPLETED
+
+    def _pending_download(self, job_id: str) -> Optional[Tuple[DownloadOptions, Future]]:
+        download = self._downloads.get(job_id)
+        if download and not download[1].done():
+            return download
+        return None
+
+    def _log_download_error(self, job_id: str, future: Future):
+        if not future.cancelled() and future.exception():
+            self.scheduler.log.error(
+                f"Failed to download the files of job {job_id}", exc_info=future.exception()
+            )
+
+    def _forget_finished_downloads(self):
+        finished = [job_id for job_id, (_, future) in self._downloads.items() if future.done()]
+        for job_id in finished[: max(len(finished) - self.max_finished_downloads, 0)]:
+            del self._downloads[job_id]
+
+
+def run_after(pending: Optional[Future], func):
+    """Calls `func` once the `pending` future is done, whether it failed or not.
+    Runs on the download thread pool, where `pending` was submitted earlier.
+    """
+    if pending:
+        wait([pending])
+    return func()
 
 
 class Downloader:
@@ -45,6 +166,9 @@ class Downloader:
         output_dir: str,
         redownload: bool,
         include_staging_files: bool = False,
+        buffer_size: int = DEFAULT_COPY_BUFFER_SIZE,
+        concurrency: int = 1,
+        extract_all_files: bool = True,
     ):
         self.output_formats = output_formats
         self.output_filenames = output_filenames
@@ -52,6 +176,9 @@ class Downloader:
         self.output_dir = output_dir
         self.redownload = redownload
         self.include_staging_files = include_staging_files
+        self.buffer_size = buffer_size
+        self.concurrency = concurrency
+        self.extract_all_files = extract_all_files
 
     def generate_filepaths(self):
         """A generator that produces filepaths"""
@@ -69,17 +196,52 @@ class Downloader:
                 if not os.path.exists(output_filepath) or self.redownload:
                     yield input_filepath, output_filepath
 
+    def archive_member_name(self, archive_filepath: str, staging_path: str) -> str:
+        """Returns the name in the archive of the file staged at `staging_path`,
+        files staged next to the archive are archived by their filename
+        """
+        if os.path.dirname(staging_path) == os.path.dirname(archive_filepath):
+            return os.path.basename(staging_path)
+        return staging_path
+
     def download_tar(self, archive_format: str = "tar"):
         archive_filepath = self.staging_paths[archive_format]
-        read_mode = "r:gz" if archive_format == "tar.gz" else "tar"
+        compressed = archive_format == "tar.gz"
+        if self.extract_all_files:
+            extract_members(
+                archive_filepath,
+                self.output_dir,
+                compressed=compressed,
+                overwrite=self.redownload,
+                buffer_size=self.buffer_size,
+            )
+            return
 
-        with fsspec.open(archive_filepath) as f:
-            with tarfile.open(fileobj=f, mode=read_mode) as tar:
-                # if extraction filter is supported (Python 3.12+), set a no-op filter
-                if hasattr(tar, "extraction_filter"):
-                    tar.extraction_filter = lambda member, path: member
+        names = [
+            self.archive_member_name(archive_filepath, self.staging_paths[output_format])
+            for output_format in self.output_formats + ["input"]
+            if output_format in self.staging_paths
+        ]
+        index = read_index(archive_filepath)
+        if index is None:
+            extract_members(
+                archive_filepath,
+                self.output_dir,
+                names,
+                compressed=compressed,
+                overwrite=self.redownload,
+                buffer_size=self.buffer_size,
+            )
+            return
 
-                tar.extractall(self.output_dir)
+        for name in names:
+            destination = member_destination(self.output_dir, name)
+            if name not in index or not destination:
+                continue
+            if self.redownload or not os.path.exists(destination):
+                copy_member(
+                    archive_filepath, name, destination, index, compressed, self.buffer_size
+                )
 
     def download(self):
         # ensure presence of staging paths
@@ -96,14 +258,10 @@ class Downloader:
         elif "tar.gz" in self.staging_paths:
             self.download_tar("tar.gz")
         else:
-            filepaths = self.generate_filepaths()
-            for input_filepath, output_filepath in filepaths:
-                try:
-                    with fsspec.open(input_filepath) as input_file:
-                        with fsspec.open(output_filepath, mode="wb") as output_file:
-                            output_file.write(input_file.read())
-                except Exception as e:
-                    pass
+            # Files that fail to copy, such as outputs of a failed job, are skipped
+            FileCopier("copy", self.buffer_size, self.concurrency).copy_files(
+                list(self.generate_filepaths())
+            )
 
 
 class JobFilesManagerWithErrors(JobFilesManager):
@@ -123,8 +281,10 @@ class JobFilesManagerWithErrors(JobFilesManager):
     def _should_raise_error(self, probability=0.5):
         return random.random() < probability
 
-    async def copy_from_staging(self, job_id: str, redownload: Optional[bool] = False):
+    async def copy_from_staging(
+        self, job_id: str, redownload: Optional[bool] = False, all_files: Optional[bool] = False
+    ) -> Future:
         if self._should_raise_error():
             raise SchedulerError("Failed copy_from_staging because of a deliberate exception.")
         else:
-            return super().copy_from_staging(job_id, redownload)
+            return await super().copy_from_staging(job_id, redownload, all_files)
@@ -0,0 +1,207 @@
+import time
+from typing import Callable, Dict, List, Optional
+
+from jupyter_client.manager import KernelManager
+
+from jupyter_scheduler.workers import (
+    register_exit_callback,
+    register_idle_callback,
+    register_stats_callback,
+)
+
+# Languages for which the working directory of a warm kernel can be changed
+# before execution, kernels for other languages are never reused.
+CHDIR_CODE = {"python": "import os as __os; __os.chdir({path!r}); del __os"}
+
+_kernel_pool = None
+
+
+class PooledKernel:
+    """A kernel manager along with its pool bookkeeping"""
+
+    def __init__(self, kernel_name: str, km: KernelManager):
+        self.kernel_name = kernel_name
+        self.km = km
+        self.uses = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def language(self) -> Optional[str]:
+        try:
+            return self.km.kernel_spec.language
+        except Exception:
+            return None
+
+    def chdir(self, path: str, timeout: int = 60):
+        """Changes the working directory of the running kernel"""
+        kc = self.km.client()
+        kc.start_channels()
+        try:
+            kc.wait_for_ready(timeout=timeout)
+            kc.execute_interactive(
+                CHDIR_CODE[self.language].format(path=path),
+                silent=True,
+                store_history=False,
+                timeout=timeout,
+            )
+        finally:
+            kc.stop_channels()
+
+    def shutdown(self):
+        try:
+            self.km.shutdown_kernel(now=True)
+        except Exception:
+            pass
+
+
+class KernelPool:
+    """Pool of pre-started kernels keyed by kernelspec name.
+
+    A kernel is taken from the pool for each notebook execution and is
+    either recycled behind a restart or discarded when it is released,
+    so every execution still starts from a fresh kernel state.
+
+    Parameters
+    ----------
+    size : int
+        Maximum number of idle kernels kept for each kernelspec
+    idle_ttl : float, optional
+        Seconds after which an idle kernel is shut down, 0 keeps
+        idle kernels until the pool is shut down
+    max_uses : int, optional
+        Number of executions after which a kernel is discarded
+        instead of recycled, 0 means kernels are always recycled
+    kernel_manager_factory : callable, optional
+        Creates a kernel manager for a kernelspec name
+    """
+
+    def __init__(
+        self,
+        size: int,
+        idle_ttl: float = 0,
+        max_uses: int = 0,
+        kernel_manager_factory: Optional[Callable[[str], KernelManager]] = None,
+    ):
+        self.size = size
+        self.idle_ttl = idle_ttl
+        self.max_uses = max_uses
+        self.kernel_manager_factory = kernel_manager_factory or (
+            lambda kernel_name: KernelManager(kernel_name=kernel_name)
+        )
+        self.hits = 0
+        self.misses = 0
+        self._idle: Dict[str, List[PooledKernel]] = {}
+
+    def start_kernel(self, kernel_name: str, cwd: Optional[str] = None) -> PooledKernel:
+        km = self.kernel_manager_factory(kernel_name)
+        km.start_kernel(cwd=cwd)
+        return PooledKernel(kernel_name, km)
+
+    def prewarm(self, kernel_name: str):
+        """Starts kernels for `kernel_name` until the pool is full"""
+        idle = self._idle.setdefault(kernel_name, [])
+        while len(idle) < self.size:
+            idle.append(self.start_kernel(kernel_name))
+
+    def acquire(self, kernel_name: str, cwd: str) -> PooledKernel:
+        """Returns a running kernel with `cwd` as working directory,
+        starts a new kernel if the pool has no idle kernel for `kernel_name`
+        """
+        self.evict_idle()
+        idle = self._idle.get(kernel_name, [])
+        while idle:
+            kernel = idle.pop()
+            try:
+                if not kernel.km.is_alive():
+                    raise RuntimeError(f"Pooled kernel '{kernel_name}' is not running.")
+                kernel.chdir(cwd)
+            except Exception:
+                kernel.shutdown()
+                continue
+
+            self.hits += 1
+            kernel.uses += 1
+            return kernel
+
+        self.misses += 1
+        kernel = self.start_kernel(kernel_name, cwd=cwd)
+        kernel.uses += 1
+        return kernel
+
+    def release(self, kernel: PooledKernel):
+        """Restarts the kernel and returns it to the pool, or shuts it down
+        if it has reached `max_uses`, cannot be reused, or the pool is full
+        """
+        idle = self._idle.setdefault(kernel.kernel_name, [])
+        if (
+            len(idle) >= self.size
+            or (self.max_uses and kernel.uses >= self.max_uses)
+            or kernel.language not in CHDIR_CODE
+        ):
+            kernel.shutdown()
+            return
+
+        try:
+            kernel.km.restart_kernel(now=True)
+        except Exception:
+            kernel.shutdown()
+            return
+
+        kernel.last_used = time.monotonic()
+        idle.append(kernel)
+
+    def evict_idle(self):
+        """Shuts down kernels that have been idle for longer than `idle_ttl`"""
+        if not self.idle_ttl:
+            return
+
+        now = time.monotonic()
+        for kernel_name, idle in self._idle.items():
+            expired = [kernel for kernel in idle if now - kernel.last_used > self.idle_ttl]
+            for kernel in expired:
+                idle.remove(kernel)
+                kernel.shutdown()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "idle": sum(len(idle) for idle in self._idle.values()),
+        }
+
+    def shutdown(self):
+        for idle in self._idle.values():
+            for kernel in idle:
+                kernel.shutdown()
+        self._idle = {}
+
+
+def configure_kernel_pool(
+    size: int, idle_ttl: float = 0, max_uses: int = 0, prewarm: Optional[List[str]] = None
+):
+    """Creates the kernel pool of the current process,
+    used as a `WorkerPool` initializer
+    """
+    global _kernel_pool
+
+    _kernel_pool = KernelPool(size=size, idle_ttl=idle_ttl, max_uses=max_uses)
+    for kernel_name in prewarm or []:
+        _kernel_pool.prewarm(kernel_name)
+
+    register_idle_callback(_kernel_pool.evict_idle)
+    register_exit_callback(_kernel_pool.shutdown)
+    register_stats_callback(kernel_pool_stats)
+
+
+def kernel_pool_stats() -> Dict[str, int]:
+    """Returns the hits and misses of the kernel pool of the current process,
+    reported by pooled workers to the server
+    """
+    if not _kernel_pool:
+        return {}
+    return {"kernel_pool_hits": _kernel_pool.hits, "kernel_pool_misses": _kernel_pool.misses}
+
+
+def get_kernel_pool() -> Optional[KernelPool]:
+    """Returns the kernel pool of the current process, if configured"""
+    return _kernel_pool
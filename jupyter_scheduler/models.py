@@ -89,12 +89,21 @@ class CreateJob(BaseModel):
 
     @root_validator
     def compute_input_filename(cls, values) -> Dict:
-        if not values["input_filename"] and values["input_uri"]:
+        if not values.get("input_filename") and values.get("input_uri"):
             values["input_filename"] = os.path.basename(values["input_uri"])
 
         return values
 
 
+class CreateJobResult(BaseModel):
+    """Outcome of creating one of the jobs of a batch,
+    either the id of the new job or the error
+    """
+
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+
+
 class JobFile(BaseModel):
     """This model is used to describe the display value,
     output format, and the filepath for a single job file.
@@ -168,6 +177,24 @@ DEFAULT_SORT = SortField(name="create_time", direction=SortDirection.desc)
 DEFAULT_MAX_ITEMS = 1000
 
 
+class CountMode(str, Enum):
+    """How the `total_count` of a list response is computed.
+
+    `exact` counts the matching rows for every page, `estimated` reuses
+    a recently counted value for the same filters, and `none` skips the
+    count, clients then rely on `next_token` to tell if there are more
+    pages. The count is never queried when the first page holds all
+    matching rows.
+    """
+
+    exact = "exact"
+    estimated = "estimated"
+    none = "none"
+
+    def __str__(self):
+        return self.value
+
+
 class ListJobsQuery(BaseModel):
     job_definition_id: Optional[str] = None
     status: Optional[Status] = None
@@ -177,11 +204,17 @@ class ListJobsQuery(BaseModel):
     sort_by: List[SortField] = [DEFAULT_SORT]
     max_items: Optional[int] = DEFAULT_MAX_ITEMS
     next_token: Optional[str] = None
+    count_mode: CountMode = CountMode.exact
+    # When False, `job_files` and `downloaded` are left unset and
+    # are only computed by `get_job`
+    job_files: bool = True
+    # Names of the `DescribeJob` fields to return, all fields when not set
+    fields: Optional[List[str]] = None
 
 
 class ListJobsResponse(BaseModel):
     jobs: List[DescribeJob] = []
-    total_count: int = 0
+    total_count: Optional[int] = 0
     next_token: Optional[str] = None
 
 
@@ -189,6 +222,13 @@ class CountJobsQuery(BaseModel):
     status: Status = Status.IN_PROGRESS
 
 
+class CountJobsByStatusQuery(BaseModel):
+    job_definition_id: Optional[str] = None
+    # Bounds of the window of job create times, the start is inclusive
+    create_time_start: Optional[int] = None
+    create_time_end: Optional[int] = None
+
+
 class UpdateJob(BaseModel):
     status: Optional[Status] = None
     name: Optional[str] = None
@@ -268,11 +308,12 @@ class ListJobDefinitionsQuery(BaseModel):
     sort_by: List[SortField] = [DEFAULT_SORT]
     max_items: Optional[int] = DEFAULT_MAX_ITEMS
     next_token: Optional[str] = None
+    count_mode: CountMode = CountMode.exact
 
 
 class ListJobDefinitionsResponse(BaseModel):
     job_definitions: List[DescribeJobDefinition] = []
-    total_count: int = 0
+    total_count: Optional[int] = 0
     next_token: Optional[str] = None
 
 
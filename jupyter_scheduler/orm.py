@@ -1,11 +1,36 @@
+import asyncio
 import json
+import os
+import random
+import threading
+import time
 from sqlite3 import OperationalError
+from typing import Callable, Dict, List, Optional, Union
 from uuid import uuid4
 
 import sqlalchemy.types as types
-from sqlalchemy import Boolean, Column, Integer, String, create_engine, inspect
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Index,
+    Integer,
+    String,
+    create_engine,
+    delete,
+    event,
+    exc,
+    func,
+    insert,
+    inspect,
+    make_url,
+    select,
+    update,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, declarative_mixin, registry, sessionmaker
 from sqlalchemy.sql import text
+from traitlets.log import get_logger
 
 from jupyter_scheduler.models import EmailNotifications, Status
 from jupyter_scheduler.utils import get_utc_timestamp
@@ -93,7 +118,30 @@ class CommonColumns:
 
 class Job(CommonColumns, Base):
     __tablename__ = "jobs"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        # `list_jobs` sorts by `create_time` by default, with `job_id` to break ties,
+        # the composite indexes serve the filters of the jobs list and the job
+        # definition detail view.
+        Index("ix_jobs_create_time", "create_time", "job_id"),
+        Index("ix_jobs_status_create_time", "status", "create_time", "job_id"),
+        Index(
+            "ix_jobs_job_definition_id_create_time", "job_definition_id", "create_time", "job_id"
+        ),
+        Index("ix_jobs_start_time", "start_time"),
+        # Name filters are case-insensitive prefix matches, which SQLite only
+        # answers with an index on the name with the NOCASE collation
+        Index("ix_jobs_name", text("name COLLATE NOCASE")).ddl_if(dialect="sqlite"),
+        # Rejects a second job with the same token atomically, the index
+        # only covers the jobs that were created with a token.
+        Index(
+            "ux_jobs_idempotency_token",
+            "idempotency_token",
+            unique=True,
+            sqlite_where=text("idempotency_token IS NOT NULL"),
+            postgresql_where=text("idempotency_token IS NOT NULL"),
+        ),
+        {"extend_existing": True},
+    )
     job_id = Column(String(36), primary_key=True, default=generate_uuid)
     job_definition_id = Column(String(36))
     status = Column(String(64), default=Status.STOPPED)
@@ -109,7 +157,11 @@ class Job(CommonColumns, Base):
 
 class JobDefinition(CommonColumns, Base):
     __tablename__ = "job_definitions"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        Index("ix_job_definitions_create_time", "create_time", "job_definition_id"),
+        Index("ix_job_definitions_name", text("name COLLATE NOCASE")).ddl_if(dialect="sqlite"),
+        {"extend_existing": True},
+    )
     job_definition_id = Column(String(36), primary_key=True, default=generate_uuid)
     schedule = Column(String(256))
     timezone = Column(String(36))
@@ -120,9 +172,144 @@ class JobDefinition(CommonColumns, Base):
     # Any default values specified for new columns will be ignored during the migration process.
 
 
+class JobTag(Base):
+    """Tags of jobs, one row per tag, used to filter jobs by tag"""
+
+    __tablename__ = "job_tags"
+    __table_args__ = (Index("ix_job_tags_tag_job_id", "tag", "job_id"),)
+    job_id = Column(String(36), primary_key=True)
+    tag = Column(String(256), primary_key=True)
+
+
+class JobDefinitionTag(Base):
+    """Tags of job definitions, one row per tag, used to filter job definitions by tag"""
+
+    __tablename__ = "definition_tags"
+    __table_args__ = (
+        Index("ix_definition_tags_tag_job_definition_id", "tag", "job_definition_id"),
+    )
+    job_definition_id = Column(String(36), primary_key=True)
+    tag = Column(String(256), primary_key=True)
+
+
+def replace_tags_statements(tag_column, entity_id: str, tags: Optional[List[str]] = None) -> list:
+    """Returns the statements that replace the rows of `entity_id`
+    in the tag table of `tag_column` with `tags`
+    """
+    statements = [delete(tag_column.table).where(tag_column == entity_id)]
+    if tags:
+        statements.append(
+            insert(tag_column.table).values(
+                [{tag_column.name: entity_id, "tag": tag} for tag in sorted(set(tags))]
+            )
+        )
+
+    return statements
+
+
+def replace_tags(session, tag_column, entity_id: str, tags: Optional[List[str]] = None):
+    for statement in replace_tags_statements(tag_column, entity_id, tags):
+        session.execute(statement)
+
+
+def tagged_with(id_column, tag_column, tags: List[str]) -> list:
+    """Returns filter criteria for rows that have all `tags`,
+    each resolved with the (tag, id) index of the tag table
+    """
+    return [id_column.in_(select(tag_column).where(tag_column.table.c.tag == tag)) for tag in tags]
+
+
+def sync_tags(tag_column, id_attribute: str):
+    """Keeps the tag table of `tag_column` in sync with the `tags`
+    column of the model instances that are flushed by a session
+    """
+
+    def after_insert_or_update(mapper, connection, target):
+        if inspect(target).attrs.tags.history.has_changes():
+            entity_id = getattr(target, id_attribute)
+            for statement in replace_tags_statements(tag_column, entity_id, target.tags):
+                connection.execute(statement)
+
+    def after_delete(mapper, connection, target):
+        for statement in replace_tags_statements(tag_column, getattr(target, id_attribute)):
+            connection.execute(statement)
+
+    return after_insert_or_update, after_delete
+
+
+# Models with a `tags` column, with the tag table column
+# and the attribute that identify their rows
+TAGGED_MODELS = (
+    (Job, JobTag.job_id, "job_id"),
+    (JobDefinition, JobDefinitionTag.job_definition_id, "job_definition_id"),
+)
+
+for model, tag_column, id_attribute in TAGGED_MODELS:
+    after_insert_or_update, after_delete = sync_tags(tag_column, id_attribute)
+    event.listen(model, "after_insert", after_insert_or_update)
+    event.listen(model, "after_update", after_insert_or_update)
+    event.listen(model, "after_delete", after_delete)
+
+
+def backfill_tags(engine, model, tag_column, id_attribute: str):
+    """Fills a new tag table from the `tags` column of existing rows"""
+    id_column = getattr(model, id_attribute)
+    with engine.begin() as connection:
+        rows = connection.execute(select(id_column, model.tags).where(model.tags.is_not(None)))
+        values = [
+            {tag_column.name: entity_id, "tag": tag}
+            for entity_id, tags in rows
+            for tag in sorted(set(tags or []))
+        ]
+        if values:
+            connection.execute(insert(tag_column.table), values)
+
+
+def clear_duplicate_idempotency_tokens(connection):
+    """Keeps the idempotency token of the most recently created job per token,
+    so that the unique index can be created over jobs that were created before
+    it. The tokens of the other jobs are cleared, and logged.
+    """
+    duplicated = (
+        select(Job.idempotency_token)
+        .where(Job.idempotency_token.is_not(None))
+        .group_by(Job.idempotency_token)
+        .having(func.count() > 1)
+    )
+    rows = connection.execute(
+        select(Job.job_id, Job.idempotency_token)
+        .where(Job.idempotency_token.in_(duplicated))
+        .order_by(Job.idempotency_token, Job.create_time.desc(), Job.job_id.desc())
+    ).all()
+
+    tokens = set()
+    cleared_job_ids = []
+    for job_id, token in rows:
+        if token in tokens:
+            cleared_job_ids.append(job_id)
+        else:
+            tokens.add(token)
+    if not cleared_job_ids:
+        return
+
+    connection.execute(
+        update(Job.__table__).where(Job.job_id.in_(cleared_job_ids)).values(idempotency_token=None)
+    )
+    get_logger().warning(
+        f"Cleared the idempotency token of {len(cleared_job_ids)} jobs that share it with "
+        f"a more recent job, to create a unique index on the token. "
+        f"Duplicated tokens: {', '.join(sorted(tokens))}."
+    )
+
+
+# Functions that prepare existing rows before an index is created
+INDEX_MIGRATIONS = {"ux_jobs_idempotency_token": clear_duplicate_idempotency_tokens}
+
+
 def update_db_schema(engine, Base):
     inspector = inspect(engine)
     alter_statements = []
+    missing_indexes = []
 
     for table_name, model in Base.metadata.tables.items():
         if not inspector.has_table(table_name):
@@ -139,17 +326,213 @@ def update_db_schema(engine, Base):
             )
             alter_statements.append(alter_statement)
 
-    if not alter_statements:
+        indexes_db_names = {index["name"] for index in inspector.get_indexes(table_name)}
+        missing_indexes.extend(
+            index for index in model.indexes if index.name not in indexes_db_names
+        )
+
+    if not alter_statements and not missing_indexes:
         return
-    with engine.connect() as connection:
+    with engine.begin() as connection:
         for alter_statement in alter_statements:
             connection.execute(alter_statement)
+        # Indexes are created after the columns they cover have been added
+        for index in missing_indexes:
+            if index.name in INDEX_MIGRATIONS:
+                INDEX_MIGRATIONS[index.name](connection)
+            index.create(connection)
+
+
+# Pool options applied to engines created by `get_engine`,
+# set at server start by `configure_engines`.
+engine_options = {
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_pre_ping": False,
+    "sqlite_busy_timeout": 30000,
+}
+
+_engines: Dict[str, Union[Engine, AsyncEngine]] = {}
+_engines_pid = os.getpid()
+_engines_lock = threading.Lock()
+_connections_created: Dict[str, int] = {}
+
+
+def configure_engines(
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_pre_ping: bool = False,
+    sqlite_busy_timeout: int = 30000,
+):
+    """Sets the connection pool options for engines created
+    after this call, existing engines are not changed.
+    """
+    engine_options.update(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pool_pre_ping,
+        sqlite_busy_timeout=sqlite_busy_timeout,
+    )
+
+
+def run_with_engine_options(options: dict, target: Callable):
+    """Calls `target` after applying engine options, used to
+    carry the options of the server into job processes
+    """
+    configure_engines(**options)
+    return target()
+
+
+def is_sqlite_file(db_url) -> bool:
+    url = make_url(db_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def set_sqlite_pragmas(engine: Engine):
+    """Configures SQLite connections of `engine` for concurrent writers
+    from several processes: write-ahead logging so that readers do not
+    block the writer, waiting up to `sqlite_busy_timeout` milliseconds
+    for a lock instead of failing, and syncing to disk at checkpoints only.
+    """
+    busy_timeout = int(engine_options["sqlite_busy_timeout"])
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+
+def retry_on_db_lock(func: Callable, retries: int = 5, backoff: float = 0.1):
+    """Calls `func`, retrying with exponential backoff and jitter
+    while it fails because the database is locked by another writer
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except exc.OperationalError as e:
+            if attempt == retries or "database is locked" not in str(e):
+                raise
+            time.sleep(backoff * 2**attempt * random.uniform(0.5, 1.5))
+
+
+def get_engine_options(db_url) -> dict:
+    options = {"pool_pre_ping": engine_options["pool_pre_ping"]}
+    # In-memory SQLite databases use a single connection per thread
+    # and do not accept the queue pool options.
+    if make_url(db_url).get_backend_name() != "sqlite" or is_sqlite_file(db_url):
+        options.update(
+            pool_size=engine_options["pool_size"], max_overflow=engine_options["max_overflow"]
+        )
+
+    return options
+
+
+def get_engine(db_url) -> Engine:
+    """Returns the engine for `db_url`, shared by all sessions of
+    the current process. Engines inherited from a parent process
+    are discarded without closing the parent's connections.
+    """
+    return get_registered_engine(db_url, create_engine)
+
+
+def get_async_engine(db_url) -> AsyncEngine:
+    """Returns the async engine for `db_url`, registered with the
+    engines of `get_engine` and configured the same way
+    """
+    return get_registered_engine(get_async_db_url(db_url), create_async_engine)
+
+
+def get_registered_engine(db_url, create: Callable):
+    global _engines_pid
+
+    with _engines_lock:
+        if _engines_pid != os.getpid():
+            for engine in _engines.values():
+                get_sync_engine(engine).dispose(close=False)
+            _engines.clear()
+            _connections_created.clear()
+            _engines_pid = os.getpid()
+
+        key = str(db_url)
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create(db_url, echo=False, **get_engine_options(db_url))
+            if is_sqlite_file(db_url):
+                set_sqlite_pragmas(get_sync_engine(engine))
+            _connections_created[key] = 0
+
+            @event.listens_for(get_sync_engine(engine), "connect")
+            def count_connection(dbapi_connection, connection_record):
+                _connections_created[key] += 1
+
+            _engines[key] = engine
+
+        return engine
+
+
+def get_sync_engine(engine: Union[Engine, AsyncEngine]) -> Engine:
+    """Returns the engine that events and pool options apply to"""
+    return engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+
+
+def get_pool_stats(db_url) -> Dict[str, int]:
+    """Returns connection pool statistics of the engine for `db_url`"""
+    key = str(db_url)
+    engine = _engines.get(key)
+    if engine is None:
+        return {}
+
+    pool = engine.pool
+    stats = {"connections_created": _connections_created.get(key, 0)}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+
+    return stats
+
+
+def dispose_engines():
+    """Closes the connections of all engines of the current process"""
+    with _engines_lock:
+        for engine in _engines.values():
+            if isinstance(engine, AsyncEngine):
+                dispose_async_engine(engine)
+            else:
+                engine.dispose()
+        _engines.clear()
+        _connections_created.clear()
+
+
+def dispose_async_engine(engine: AsyncEngine):
+    """Closes the connections of an async engine from synchronous code,
+    in a new event loop that runs in another thread if this thread
+    already runs one
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(engine.dispose())
+        return
+
+    thread = threading.Thread(target=asyncio.run, args=(engine.dispose(),))
+    thread.start()
+    thread.join()
 
 
 def create_tables(db_url, drop_tables=False, Base=Base):
-    engine = create_engine(db_url)
+    engine = get_engine(db_url)
     update_db_schema(engine, Base)
 
+    inspector = inspect(engine)
+    new_tables = {
+        table_name
+        for table_name in Base.metadata.tables
+        if drop_tables or not inspector.has_table(table_name)
+    }
+
     try:
         if drop_tables:
             Base.metadata.drop_all(engine)
@@ -158,9 +541,33 @@ def create_tables(db_url, drop_tables=False, Base=Base):
     finally:
         Base.metadata.create_all(engine)
 
+    for model, tag_column, id_attribute in TAGGED_MODELS:
+        tables = {tag_column.table.name, model.__tablename__}
+        if tag_column.table.name in new_tables and not tables.issubset(new_tables):
+            backfill_tags(engine, model, tag_column, id_attribute)
+
 
 def create_session(db_url):
-    engine = create_engine(db_url, echo=False)
-    Session = sessionmaker(bind=engine)
+    Session = sessionmaker(bind=get_engine(db_url))
 
     return Session
+
+
+# Async drivers used by `create_async_session` for database urls
+# that specify the default, synchronous driver of a dialect.
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def get_async_db_url(db_url) -> str:
+    url = make_url(db_url)
+    backend, _, driver = url.drivername.partition("+")
+    if backend in ASYNC_DRIVERS and driver != ASYNC_DRIVERS[backend]:
+        url = url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+    return url.render_as_string(hide_password=False)
+
+
+def create_async_session(db_url):
+    AsyncSession = async_sessionmaker(bind=get_async_engine(db_url), expire_on_commit=False)
+
+    return AsyncSession
@@ -0,0 +1,216 @@
+import base64
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, and_, func, literal, or_, select, tuple_
+
+from jupyter_scheduler.exceptions import SchedulerError
+from jupyter_scheduler.models import CountMode, SortDirection, SortField
+
+# Query fields that select a page and do not change the total count
+PAGE_FIELDS = {"sort_by", "max_items", "next_token", "count_mode", "job_files", "fields"}
+
+
+def count_statement(statement: Select) -> Select:
+    """Returns a statement that counts the rows selected by `statement`"""
+    return select(func.count()).select_from(statement.subquery())
+
+
+def encode_next_token(sort_by: List[SortField], values: Sequence[Any]) -> str:
+    """Returns an opaque token for the page after the row with sort key `values`"""
+    token = {
+        "sort_by": [[sort_field.name, sort_field.direction.value] for sort_field in sort_by],
+        "values": list(values),
+    }
+    return base64.urlsafe_b64encode(json.dumps(token).encode()).decode()
+
+
+def decode_next_token(next_token: str, sort_by: List[SortField]) -> List[Any]:
+    """Returns the sort key values encoded in `next_token`"""
+    try:
+        token = json.loads(base64.urlsafe_b64decode(next_token.encode()))
+        values = token["values"]
+        token_sort_by = token["sort_by"]
+    except (ValueError, TypeError, KeyError):
+        raise SchedulerError(f"Invalid next_token '{next_token}'.")
+
+    if token_sort_by != [[sort_field.name, sort_field.direction.value] for sort_field in sort_by]:
+        raise SchedulerError("The next_token was created for a different sort order.")
+
+    return values
+
+
+def sort_keys(model, id_column, sort_by: List[SortField]) -> List[Tuple[Any, SortDirection]]:
+    """Returns the columns and directions that rows are ordered by, ending
+    with the id column in the direction of the last sort field to make the
+    order total while keeping it servable by an index on (column, id)
+    """
+    keys = [
+        (getattr(model, sort_field.name), sort_field.direction)
+        for sort_field in sort_by
+        if sort_field.name != id_column.key
+    ]
+    keys.append((id_column, keys[-1][1] if keys else SortDirection.asc))
+    return keys
+
+
+def is_nullable(column) -> bool:
+    """Returns False for columns that are always set, because
+    they are not nullable or are filled with a default value
+    """
+    column = column.expression
+    return column.nullable and column.default is None and not column.primary_key
+
+
+def order_by_clauses(keys: List[Tuple[Any, SortDirection]]) -> list:
+    clauses = []
+    for column, direction in keys:
+        clause = column.desc() if direction == SortDirection.desc else column.asc()
+        # NULLs are ordered as the smallest values on every database
+        if is_nullable(column):
+            clause = (
+                clause.nulls_last() if direction == SortDirection.desc else clause.nulls_first()
+            )
+        clauses.append(clause)
+
+    return clauses
+
+
+def after_criterion(column, direction: SortDirection, value):
+    """Returns the criterion for values of `column` that are ordered after `value`"""
+    if direction == SortDirection.asc:
+        return column.is_not(None) if value is None else column > value
+    elif value is None:
+        return None
+    elif is_nullable(column):
+        return or_(column < value, column.is_(None))
+    else:
+        return column < value
+
+
+def equal_criterion(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def seek_criterion(keys: List[Tuple[Any, SortDirection]], values: Sequence[Any]):
+    """Returns the criterion for rows that are ordered after the row with sort key `values`"""
+    directions = {direction for _, direction in keys}
+    if len(directions) == 1 and not any(
+        value is None or is_nullable(column) for (column, _), value in zip(keys, values)
+    ):
+        # A row value comparison is served as a single range of an index
+        columns = tuple_(*(column for column, _ in keys))
+        values = tuple_(*(literal(value) for value in values))
+        return columns > values if SortDirection.asc in directions else columns < values
+
+    clauses = []
+    for i, (column, direction) in enumerate(keys):
+        after = after_criterion(column, direction, values[i])
+        if after is None:
+            continue
+        equal = [equal_criterion(c, v) for (c, _), v in zip(keys[:i], values[:i])]
+        clauses.append(and_(*equal, after))
+
+    return or_(*clauses)
+
+
+def paginate_statement(
+    statement: Select,
+    model,
+    id_column,
+    sort_by: List[SortField],
+    max_items: Optional[int],
+    next_token: Optional[str],
+) -> Select:
+    """Sorts `statement` and selects the page that starts after `next_token`.
+
+    Pages are selected by seeking past the sort key of the last row of the
+    previous page, so later pages cost the same as the first one and do not
+    shift when rows are added. Integer tokens of earlier versions are read
+    as offsets. One row more than `max_items` is selected to tell whether
+    there is a next page.
+    """
+    keys = sort_keys(model, id_column, sort_by)
+    statement = statement.order_by(*order_by_clauses(keys))
+
+    if next_token and next_token.isdigit():
+        statement = statement.offset(int(next_token))
+    elif next_token:
+        values = decode_next_token(next_token, sort_by)
+        if len(values) != len(keys):
+            raise SchedulerError(f"Invalid next_token '{next_token}'.")
+        statement = statement.filter(seek_criterion(keys, values))
+
+    if max_items:
+        statement = statement.limit(max_items + 1)
+
+    return statement
+
+
+def next_page(
+    rows: List[Any], id_attribute: str, sort_by: List[SortField], max_items: Optional[int]
+) -> Tuple[List[Any], Optional[str]]:
+    """Returns the rows of the current page and the token for the next page, if any"""
+    if not max_items or len(rows) <= max_items:
+        return rows, None
+
+    rows = rows[:max_items]
+    last = rows[-1]
+    values = [
+        getattr(last, sort_field.name) for sort_field in sort_by if sort_field.name != id_attribute
+    ]
+    values.append(getattr(last, id_attribute))
+
+    return rows, encode_next_token(sort_by, values)
+
+
+class CountCache:
+    """Total counts of list queries, kept for `ttl` seconds.
+
+    Counts are keyed by the table and the filters of the query,
+    so every page of a listing shares the same entry.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._counts: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def key(self, model, query) -> str:
+        return f"{model.__tablename__}:{query.json(exclude=PAGE_FIELDS)}"
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._counts[key]
+                return None
+            return entry[1]
+
+    def put(self, key: str, count: int):
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= self.max_entries:
+                # Drops the entry that was counted first
+                del self._counts[min(self._counts, key=lambda k: self._counts[k][0])]
+            self._counts[key] = (time.monotonic(), count)
+
+    def clear(self):
+        with self._lock:
+            self._counts = {}
+
+
+def known_total_count(query, rows: List[Any], cache: CountCache, key: str) -> Optional[int]:
+    """Returns the total count of `query` if it is known without counting
+    rows, either because the first page holds all matching rows or from a
+    cached count when the query allows an estimate
+    """
+    if not query.next_token and (not query.max_items or len(rows) <= query.max_items):
+        return len(rows)
+    if query.count_mode == CountMode.estimated:
+        return cache.get(key)
+    return None
@@ -0,0 +1,223 @@
+import os
+from dataclasses import dataclass, field
+from typing import Collection, Dict, List, Optional, Tuple
+
+from sqlalchemy import Select, Subquery, and_, func, or_, select
+
+from jupyter_scheduler.models import Status
+from jupyter_scheduler.orm import Job
+from jupyter_scheduler.staging_store import STORE_DIRNAME
+
+# Jobs in these statuses do not change anymore and can be deleted
+FINISHED_STATUSES = [Status.COMPLETED, Status.FAILED, Status.STOPPED]
+
+
+@dataclass
+class RetentionReport:
+    deleted_jobs: int = 0
+    reclaimed_bytes: int = 0
+
+    def __add__(self, other: "RetentionReport") -> "RetentionReport":
+        return RetentionReport(
+            self.deleted_jobs + other.deleted_jobs, self.reclaimed_bytes + other.reclaimed_bytes
+        )
+
+    def __str__(self):
+        return f"deleted {self.deleted_jobs} jobs and reclaimed {self.reclaimed_bytes} bytes"
+
+
+# (device, inode) of a file with several links
+Inode = Tuple[int, int]
+
+
+@dataclass
+class DirectoryUsage:
+    """Sizes of the files under a directory. Files with a single link are
+    counted in `size`, files with several links, which are shared with other
+    directories, are listed in `linked` as (size, link count, links under the
+    directory) by inode.
+    """
+
+    size: int = 0
+    linked: Dict[Inode, Tuple[int, int, int]] = field(default_factory=dict)
+
+
+def directory_usage(path: str) -> DirectoryUsage:
+    usage = DirectoryUsage()
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if st.st_nlink <= 1:
+                usage.size += st.st_size
+                continue
+            inode = (st.st_dev, st.st_ino)
+            _, _, links = usage.linked.get(inode, (0, 0, 0))
+            usage.linked[inode] = (st.st_size, st.st_nlink, links + 1)
+    return usage
+
+
+def directory_size(path: str) -> int:
+    """Returns the size of the files under `path` that are freed when it is
+    removed, the files linked from elsewhere are not counted, 0 if it does not exist
+    """
+    usage = directory_usage(path)
+    return usage.size + sum(size for size, nlink, links in usage.linked.values() if links == nlink)
+
+
+@dataclass
+class StagingSizes:
+    # Bytes freed by removing each directory of the staging area, by name
+    directories: Dict[str, int]
+    # Bytes used by the staging area, files with several links are counted once
+    total: int
+
+
+class StagingUsage:
+    """Sizes of the directories in the staging area.
+
+    Files that are linked from several directories, such as the files of the
+    content-addressed store and hardlinked input files, are counted once in
+    the total. A directory is only counted the size of the linked files whose
+    other links are all in the store, which are freed when the directory is
+    removed and released from the store. Clones made with reflinks share
+    storage that cannot be seen from file metadata, they are counted in full.
+
+    Sizes of the `stable` directories, the directories of finished jobs which
+    do not change anymore, are kept between calls and only measured again
+    when their modification time changed. Other directories are measured on
+    every call, since their files can grow or change in subdirectories
+    without changing the modification time of the directory.
+    """
+
+    def __init__(self):
+        self._usages: Dict[str, Tuple[int, DirectoryUsage]] = {}
+
+    def sizes(self, staging_path: str, stable: Collection[str] = ()) -> StagingSizes:
+        usages: Dict[str, DirectoryUsage] = {}
+        known = {}
+        store_usage = DirectoryUsage()
+        if os.path.isdir(staging_path):
+            with os.scandir(staging_path) as entries:
+                for entry in entries:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    if entry.name == STORE_DIRNAME:
+                        store_usage = directory_usage(entry.path)
+                        continue
+                    mtime = entry.stat(follow_symlinks=False).st_mtime_ns
+                    cached = self._usages.get(entry.name)
+                    usage = (
+                        cached[1] if cached and cached[0] == mtime else directory_usage(entry.path)
+                    )
+                    usages[entry.name] = usage
+                    if entry.name in stable:
+                        known[entry.name] = (mtime, usage)
+        self._usages = known
+
+        store_links = {inode: links for inode, (_, _, links) in store_usage.linked.items()}
+        linked_sizes = {inode: size for inode, (size, _, _) in store_usage.linked.items()}
+        directories = {}
+        for name, usage in usages.items():
+            directories[name] = usage.size + sum(
+                size
+                for inode, (size, nlink, links) in usage.linked.items()
+                if links + store_links.get(inode, 0) == nlink
+            )
+            for inode, (size, _, _) in usage.linked.items():
+                linked_sizes[inode] = size
+
+        total = (
+            sum(usage.size for usage in usages.values())
+            + store_usage.size
+            + sum(linked_sizes.values())
+        )
+        return StagingSizes(directories, total)
+
+
+def ranked_jobs(*criteria) -> Subquery:
+    """Returns the ids of the jobs matching `criteria` with their rank within
+    their job definition, starting at 1 for the most recent job. Jobs created
+    without a job definition are ranked together.
+    """
+    rank = func.row_number().over(
+        partition_by=Job.job_definition_id, order_by=(Job.create_time.desc(), Job.job_id.desc())
+    )
+    return select(Job.job_id, rank.label("rank")).where(*criteria).subquery()
+
+
+def deletable_criteria(keep_failures: int) -> list:
+    """Returns the criteria of finished jobs, except for the last
+    `keep_failures` failed jobs of every job definition
+    """
+    criteria = [Job.status.in_(FINISHED_STATUSES)]
+    if keep_failures:
+        failures = ranked_jobs(Job.status == Status.FAILED)
+        criteria.append(
+            Job.job_id.not_in(select(failures.c.job_id).where(failures.c.rank <= keep_failures))
+        )
+    return criteria
+
+
+def expired_jobs_statement(created_before: int, keep_failures: int, limit: int) -> Select:
+    """Returns the ids of the oldest deletable jobs created before `created_before`"""
+    return (
+        select(Job.job_id)
+        .where(Job.create_time < created_before, *deletable_criteria(keep_failures))
+        .order_by(Job.create_time, Job.job_id)
+        .limit(limit)
+    )
+
+
+def excess_jobs_statement(max_jobs: int, keep_failures: int, limit: int) -> Select:
+    """Returns the ids of the oldest deletable jobs that are
+    not among the `max_jobs` most recent jobs of their job definition
+    """
+    ranked = ranked_jobs(Job.job_definition_id.is_not(None))
+    return (
+        select(Job.job_id)
+        .join(ranked, ranked.c.job_id == Job.job_id)
+        .where(ranked.c.rank > max_jobs, *deletable_criteria(keep_failures))
+        .order_by(Job.create_time, Job.job_id)
+        .limit(limit)
+    )
+
+
+def oldest_jobs_statement(
+    keep_failures: int, limit: int, after: Optional[Tuple[int, str]] = None
+) -> Select:
+    """Returns the ids and creation times of the oldest deletable jobs,
+    created after the (create time, job id) `after` when given
+    """
+    criteria = deletable_criteria(keep_failures)
+    if after:
+        create_time, job_id = after
+        criteria.append(
+            or_(
+                Job.create_time > create_time,
+                and_(Job.create_time == create_time, Job.job_id > job_id),
+            )
+        )
+    return (
+        select(Job.job_id, Job.create_time)
+        .where(*criteria)
+        .order_by(Job.create_time, Job.job_id)
+        .limit(limit)
+    )
+
+
+def select_until_reclaimed(job_ids: List[str], sizes: Dict[str, int], excess: int) -> List[str]:
+    """Returns the first of `job_ids` whose staging directories add up to `excess`
+    bytes, the jobs whose directories free nothing are skipped
+    """
+    selected = []
+    for job_id in job_ids:
+        if excess <= 0:
+            break
+        if sizes.get(job_id, 0) <= 0:
+            continue
+        selected.append(job_id)
+        excess -= sizes[job_id]
+    return selected
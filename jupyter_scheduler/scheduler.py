@@ -1,16 +1,34 @@
+import asyncio
 import multiprocessing as mp
 import os
 import random
 import shutil
-from typing import Dict, List, Optional, Type, Union
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
-import fsspec
 import psutil
 from jupyter_core.paths import jupyter_data_dir
 from jupyter_server.transutils import _i18n
 from jupyter_server.utils import to_os_path
-from sqlalchemy import and_, asc, desc, func
-from traitlets import Instance
+from sqlalchemy import Select, and_, asc, delete, exc, func, or_, select, update
+from sqlalchemy.orm import load_only
+from traitlets import Bool
+from traitlets import Dict as TDict
+from traitlets import Enum, Float, Instance, Integer
+from traitlets import List as TList
 from traitlets import Type as TType
 from traitlets import Unicode, default
 from traitlets.config import LoggingConfigurable
@@ -21,11 +39,21 @@ from jupyter_scheduler.exceptions import (
     InputUriError,
     SchedulerError,
 )
+from jupyter_scheduler.export import (
+    export_rows,
+    export_statement,
+    import_rows,
+    to_ndjson,
+)
+from jupyter_scheduler.kernel_pool import configure_kernel_pool
 from jupyter_scheduler.models import (
+    CountJobsByStatusQuery,
     CountJobsQuery,
+    CountMode,
     CreateJob,
     CreateJobDefinition,
     CreateJobFromDefinition,
+    CreateJobResult,
     DescribeJob,
     DescribeJobDefinition,
     JobFile,
@@ -33,17 +61,73 @@ from jupyter_scheduler.models import (
     ListJobDefinitionsResponse,
     ListJobsQuery,
     ListJobsResponse,
-    SortDirection,
     Status,
     UpdateJob,
     UpdateJobDefinition,
 )
-from jupyter_scheduler.orm import Job, JobDefinition, create_session
+from jupyter_scheduler.orm import (
+    Job,
+    JobDefinition,
+    JobDefinitionTag,
+    JobTag,
+    create_async_session,
+    create_session,
+    engine_options,
+    replace_tags,
+    replace_tags_statements,
+    run_with_engine_options,
+    tagged_with,
+)
+from jupyter_scheduler.pagination import (
+    CountCache,
+    count_statement,
+    known_total_count,
+    next_page,
+    paginate_statement,
+)
+from jupyter_scheduler.retention import (
+    FINISHED_STATUSES,
+    RetentionReport,
+    StagingUsage,
+    directory_size,
+    excess_jobs_statement,
+    expired_jobs_statement,
+    oldest_jobs_statement,
+    select_until_reclaimed,
+)
+from jupyter_scheduler.staging_store import StagingStore
+from jupyter_scheduler.status_counter import StatusCounter, status_counts
 from jupyter_scheduler.utils import (
+    COPY_STRATEGIES,
+    DEFAULT_COPY_BUFFER_SIZE,
+    DirectoryListings,
+    RecentTokens,
     copy_directory,
+    copy_file,
     create_output_directory,
     create_output_filename,
+    get_utc_timestamp,
+    is_local_path,
 )
+from jupyter_scheduler.workers import DEFAULT_PRELOAD_MODULES, WorkerPool
+
+# Job fields that are computed by `add_job_files` instead of being stored
+JOB_FILES_FIELDS = {"job_files", "downloaded"}
+
+# Job columns that `add_job_files` reads
+JOB_FILES_COLUMNS = {
+    "job_id",
+    "input_filename",
+    "create_time",
+    "output_formats",
+    "package_input_folder",
+    "packaged_files",
+}
+
+
+def is_idempotency_conflict(error: exc.IntegrityError, model: CreateJob) -> bool:
+    """Returns True if the insert of the job of `model` failed on the unique index of tokens"""
+    return bool(model.idempotency_token) and "idempotency_token" in str(error.orig)
 
 
 class BaseScheduler(LoggingConfigurable):
@@ -76,6 +160,49 @@ class BaseScheduler(LoggingConfigurable):
         ),
     )
 
+    copy_buffer_size = Integer(
+        default_value=DEFAULT_COPY_BUFFER_SIZE,
+        config=True,
+        help=_i18n(
+            """Size in bytes of the chunks in which input files are copied to the
+        staging location and job files are downloaded from it. Local files are
+        copied by the operating system without buffering where it is supported.
+        """
+        ),
+    )
+
+    staging_concurrency = Integer(
+        default_value=8,
+        config=True,
+        help=_i18n(
+            """Number of files that are copied at a time when a packaged input folder
+        is staged and when job files are downloaded. Files on remote filesystems
+        with an async fsspec implementation are transferred in batches of this size.
+        """
+        ),
+    )
+
+    max_concurrent_downloads = Integer(
+        default_value=4,
+        config=True,
+        help=_i18n(
+            """Maximum number of jobs whose files are downloaded from the staging
+        location at the same time, further downloads wait for one to finish.
+        """
+        ),
+    )
+
+    lazy_archive_extraction = Bool(
+        default_value=False,
+        config=True,
+        help=_i18n(
+            """When True, downloading the files of a job whose outputs are staged
+        in an archive extracts only the output files and the input notebook,
+        side-effect files are extracted when all files are requested.
+        """
+        ),
+    )
+
     @default("staging_path")
     def _default_staging_path(self):
         return os.path.join(jupyter_data_dir(), "scheduler_staging_area")
@@ -109,6 +236,19 @@ class BaseScheduler(LoggingConfigurable):
         """
         raise NotImplementedError("must be implemented by subclass")
 
+    def create_jobs(self, models: List[CreateJob]) -> List[CreateJobResult]:
+        """Creates a job for each model, returns the id of each new job
+        or the error that prevented its creation, in the order of `models`.
+        Subclasses can override this to create all jobs in a single transaction.
+        """
+        results = []
+        for model in models:
+            try:
+                results.append(CreateJobResult(job_id=self.create_job(model)))
+            except Exception as e:
+                results.append(CreateJobResult(error=str(e)))
+        return results
+
     def update_job(self, job_id: str, model: UpdateJob):
         """Updates job metadata in the persistence store,
         for example name, status etc. In case of status
@@ -124,6 +264,12 @@ class BaseScheduler(LoggingConfigurable):
         """Returns number of jobs filtered by query"""
         raise NotImplementedError("must be implemented by subclass")
 
+    def count_jobs_by_status(
+        self, query: Optional[CountJobsByStatusQuery] = None
+    ) -> Dict[Status, int]:
+        """Returns the number of jobs filtered by query for every status"""
+        raise NotImplementedError("must be implemented by subclass")
+
     def get_job(self, job_id: str, job_files: Optional[bool] = True) -> DescribeJob:
         """Returns job record for a single job.
 
@@ -153,6 +299,18 @@ class BaseScheduler(LoggingConfigurable):
 
         raise NotImplementedError("must be implemented by subclass")
 
+    def delete_jobs(self, job_ids: List[str]):
+        """Deletes the job records, stops the jobs that are running.
+        Subclasses can override this to delete all jobs at once.
+        """
+        for job_id in job_ids:
+            self.delete_job(job_id)
+
+    def stop_jobs(self, job_ids: List[str]):
+        """Stops the jobs that are queued or running"""
+        for job_id in job_ids:
+            self.stop_job(job_id)
+
     def create_job_definition(self, model: CreateJobDefinition) -> str:
         """Creates a new job definition record,
         consider this as the template for creating
@@ -184,6 +342,27 @@ class BaseScheduler(LoggingConfigurable):
         """Creates a new job based on a job definition"""
         raise NotImplementedError("must be implemented by subclass")
 
+    def export_jobs(self) -> Iterator[str]:
+        """Yields all job records as chunks of newline delimited JSON"""
+        raise NotImplementedError("must be implemented by subclass")
+
+    def import_jobs(self, lines: Iterable[str]) -> int:
+        """Inserts the job records of newline delimited JSON `lines`,
+        as returned by `export_jobs`, returns the number of jobs inserted
+        """
+        raise NotImplementedError("must be implemented by subclass")
+
+    def export_job_definitions(self) -> Iterator[str]:
+        """Yields all job definition records as chunks of newline delimited JSON"""
+        raise NotImplementedError("must be implemented by subclass")
+
+    def import_job_definitions(self, lines: Iterable[str]) -> int:
+        """Inserts the job definition records of newline delimited JSON `lines`,
+        as returned by `export_job_definitions`, returns the number of job
+        definitions inserted
+        """
+        raise NotImplementedError("must be implemented by subclass")
+
     def get_staging_paths(self, model: Union[DescribeJob, DescribeJobDefinition]) -> Dict[str, str]:
         """Returns full staging paths for all job files
 
@@ -230,7 +409,7 @@ class BaseScheduler(LoggingConfigurable):
         """
         raise NotImplementedError("must be implemented by subclass")
 
-    def file_exists(self, path: str):
+    def file_exists(self, path: str, listings: Optional[DirectoryListings] = None):
         """Returns True if the file exists, else returns False.
 
         API-style wrapper for os.path.isfile
@@ -239,6 +418,9 @@ class BaseScheduler(LoggingConfigurable):
         ----------
         path : string
             The relative path to the file (with '/' as separator)
+        listings : DirectoryListings, optional
+            Memoized directory listings to look up the file in,
+            instead of calling os.path.isfile
 
         Returns
         -------
@@ -250,9 +432,9 @@ class BaseScheduler(LoggingConfigurable):
         if not (os.path.abspath(os_path) + os.path.sep).startswith(root):
             return False
         else:
-            return os.path.isfile(os_path)
+            return listings.isfile(os_path) if listings else os.path.isfile(os_path)
 
-    def dir_exists(self, path: str):
+    def dir_exists(self, path: str, listings: Optional[DirectoryListings] = None):
         """Returns True if the directory exists, else returns False.
 
         API-style wrapper for os.path.isdir
@@ -261,6 +443,9 @@ class BaseScheduler(LoggingConfigurable):
         ----------
         path : string
             The relative path to the directory (with '/' as separator)
+        listings : DirectoryListings, optional
+            Memoized directory listings to look up the directory in,
+            instead of calling os.path.isdir
 
         Returns
         -------
@@ -272,7 +457,7 @@ class BaseScheduler(LoggingConfigurable):
         if not (os.path.abspath(os_path) + os.path.sep).startswith(root):
             return False
         else:
-            return os.path.isdir(os_path)
+            return listings.isdir(os_path) if listings else os.path.isdir(os_path)
 
     def get_job_filenames(self, model: DescribeJob) -> Dict[str, Union[str, List[str]]]:
         """Returns dictionary mapping output formats to
@@ -310,12 +495,16 @@ class BaseScheduler(LoggingConfigurable):
 
         return filenames
 
-    def add_job_files(self, model: DescribeJob):
+    def add_job_files(self, model: DescribeJob, listings: Optional[DirectoryListings] = None):
         """Adds `job_files` to the model, ensures job files
         are present in the local workspace. These should be
         added in `get_job` and `list_job` APIs once the rest
         of the model is populated.
+
+        Files are looked up in `listings` when passed, so that the
+        directories of a page of jobs are each read only once.
         """
+        listings = listings or DirectoryListings()
         mapping = self.environments_manager.output_formats_mapping()
         job_files = []
         output_filenames = self.get_job_filenames(model)
@@ -328,7 +517,7 @@ class BaseScheduler(LoggingConfigurable):
                 JobFile(
                     display_name=mapping[output_format],
                     file_format=output_format,
-                    file_path=output_path if self.file_exists(output_path) else None,
+                    file_path=output_path if self.file_exists(output_path, listings) else None,
                 )
             )
 
@@ -340,7 +529,7 @@ class BaseScheduler(LoggingConfigurable):
             JobFile(
                 display_name="Input",
                 file_format=format,
-                file_path=output_path if self.file_exists(output_path) else None,
+                file_path=output_path if self.file_exists(output_path, listings) else None,
             )
         )
 
@@ -350,7 +539,7 @@ class BaseScheduler(LoggingConfigurable):
                 JobFile(
                     display_name="Files",
                     file_format="files",
-                    file_path=output_dir if self.dir_exists(output_dir) else None,
+                    file_path=output_dir if self.dir_exists(output_dir, listings) else None,
                 )
             )
 
@@ -363,7 +552,7 @@ class BaseScheduler(LoggingConfigurable):
                 for packaged_file_rel_path in model.packaged_files
             ]
         model.downloaded = all(job_file.file_path for job_file in job_files) and all(
-            self.file_exists(file_path) for file_path in packaged_files
+            self.file_exists(file_path, listings) for file_path in packaged_files
         )
 
     def get_local_output_path(
@@ -399,6 +588,244 @@ class Scheduler(BaseScheduler):
 
     task_runner = Instance(allow_none=True, klass="jupyter_scheduler.task_runner.BaseTaskRunner")
 
+    max_concurrent_jobs = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Maximum number of jobs that can execute at the same time.
+        Jobs created above this limit are saved with the QUEUED status and
+        are started in creation order as running jobs finish. Queued jobs
+        are kept in the database and are started after a server restart.
+        Default value is 0, which means no limit.
+        """
+        ),
+    )
+
+    max_concurrent_jobs_per_compute_type = TDict(
+        key_trait=Unicode(),
+        value_trait=Integer(),
+        default_value={},
+        config=True,
+        help=_i18n(
+            """Maximum number of jobs that can execute at the same time
+        for a given compute type, for example {"gpu": 2}. Applied in
+        addition to `max_concurrent_jobs`.
+        """
+        ),
+    )
+
+    worker_pool_size = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Number of pre-started worker processes used to execute jobs.
+        Workers import the execution dependencies once and run jobs one
+        after the other, which avoids the interpreter start up cost for
+        each job. Jobs started while all workers are busy run in a new
+        process. Default value is 0, which starts a new process for each job.
+        """
+        ),
+    )
+
+    max_jobs_per_worker = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Number of jobs after which a pooled worker process is replaced
+        with a fresh one. Default value is 0, which never replaces workers.
+        """
+        ),
+    )
+
+    kernel_pool_size = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Number of idle kernels that each pooled worker process keeps
+        per kernelspec. Kernels are restarted after each job and reused by the
+        next job with the same kernelspec. Requires `worker_pool_size` to be
+        set. Default value is 0, which starts a new kernel for each job.
+        """
+        ),
+    )
+
+    kernel_pool_idle_ttl = Float(
+        default_value=600,
+        config=True,
+        help=_i18n(
+            """Seconds after which an idle pooled kernel is shut down,
+        0 keeps idle kernels for the lifetime of the worker process.
+        """
+        ),
+    )
+
+    kernel_pool_max_uses = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Number of jobs after which a pooled kernel is shut down instead
+        of being restarted and reused. Default value is 0, which means no limit.
+        """
+        ),
+    )
+
+    kernel_pool_prewarm = TList(
+        trait=Unicode(),
+        default_value=[],
+        config=True,
+        help=_i18n("Kernelspec names for which pooled kernels are started with each worker."),
+    )
+
+    job_queue_poll_interval = Float(
+        default_value=1.0,
+        config=True,
+        help=_i18n("The interval in seconds at which queued jobs are checked for dispatch."),
+    )
+
+    count_cache_ttl = Float(
+        default_value=30,
+        config=True,
+        help=_i18n(
+            """Seconds for which the total count of a job or job definition list
+        is reused by list requests with the `estimated` count mode.
+        """
+        ),
+    )
+
+    status_counts_ttl = Float(
+        default_value=60,
+        config=True,
+        help=_i18n(
+            """Seconds for which the job counts per status are served from memory.
+        The counts are kept current with the status changes made by this server
+        and are read from the database again when a job process exits. Set this
+        when other servers share the database, 0 always queries the database.
+        """
+        ),
+    )
+
+    export_batch_size = Integer(
+        default_value=1000,
+        config=True,
+        help=_i18n(
+            """Number of rows that job and job definition exports read at a time
+        and that imports insert with a single statement.
+        """
+        ),
+    )
+
+    copy_strategy = Enum(
+        values=list(COPY_STRATEGIES),
+        default_value="auto",
+        config=True,
+        help=_i18n(
+            """How packaged input folders are copied to a local staging location.
+        `reflink` clones files on filesystems with shared extents such as btrfs
+        and XFS, `hardlink` links the files that cannot be written to, `auto`
+        tries both in this order and `copy` always copies the bytes. Files are
+        copied where the chosen method is not supported.
+        """
+        ),
+    )
+
+    input_folder_exclude_files = TList(
+        trait=Unicode(),
+        default_value=[],
+        config=True,
+        help=_i18n(
+            """Glob patterns of the names of the files and directories that are
+        not staged with packaged input folders, such as `.git` or `*.log`.
+        """
+        ),
+    )
+
+    input_folder_max_bytes = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Maximum size in bytes of a packaged input folder, jobs and job
+        definitions whose input folder is larger fail before any file is staged.
+        0 means no limit.
+        """
+        ),
+    )
+
+    content_addressed_staging = Bool(
+        default_value=False,
+        config=True,
+        help=_i18n(
+            """Stores each distinct staged input file once under the `.store`
+        directory of a local staging location and populates the staging
+        directories of jobs and job definitions with read-only hardlinks to
+        the stored files, or copies where hardlinks are not supported.
+        """
+        ),
+    )
+
+    idempotency_token_ttl = Float(
+        default_value=60,
+        config=True,
+        help=_i18n(
+            """Seconds for which the idempotency tokens of created jobs are kept in
+        memory, so that resubmissions with the same token are rejected without
+        querying the database. 0 checks every token against the database only.
+        """
+        ),
+    )
+
+    retention_max_age = Float(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Seconds after their creation after which finished jobs are deleted
+        with their staging files. Default value is 0, which keeps jobs of any age.
+        """
+        ),
+    )
+
+    retention_max_jobs_per_definition = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Number of most recent jobs that are kept for each job definition,
+        older finished jobs are deleted. Default value is 0, which means no limit.
+        """
+        ),
+    )
+
+    retention_max_staging_bytes = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Total size in bytes of the staging area above which the oldest
+        finished jobs are deleted. Default value is 0, which means no limit.
+        """
+        ),
+    )
+
+    retention_keep_failures = Integer(
+        default_value=0,
+        config=True,
+        help=_i18n(
+            """Number of most recent failed jobs of each job definition that are
+        never deleted by the retention limits, jobs created without a job
+        definition are counted together.
+        """
+        ),
+    )
+
+    retention_interval = Float(
+        default_value=3600,
+        config=True,
+        help=_i18n("The interval in seconds at which the retention limits are applied."),
+    )
+
+    retention_batch_size = Integer(
+        default_value=100,
+        config=True,
+        help=_i18n("Number of jobs that the retention limits delete with a single statement."),
+    )
+
     def __init__(
         self,
         root_dir: str,
@@ -411,6 +838,34 @@ class Scheduler(BaseScheduler):
             root_dir=root_dir, environments_manager=environments_manager, config=config, **kwargs
         )
         self.db_url = db_url
+        self.count_cache = CountCache(ttl=self.count_cache_ttl)
+        self.status_counter = StatusCounter(ttl=self.status_counts_ttl)
+        self.staging_usage = StagingUsage()
+        self.recent_tokens = RecentTokens(ttl=self.idempotency_token_ttl)
+        self._staging_store = None
+        self._processes = {}
+        self._process_lock = threading.RLock()
+        self._cleanup_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="scheduler-cleanup"
+        )
+        self.worker_pool = None
+        if self.worker_pool_size:
+            initializer, initargs = None, ()
+            if self.kernel_pool_size:
+                initializer = configure_kernel_pool
+                initargs = (
+                    self.kernel_pool_size,
+                    self.kernel_pool_idle_ttl,
+                    self.kernel_pool_max_uses,
+                    self.kernel_pool_prewarm,
+                )
+            self.worker_pool = WorkerPool(
+                size=self.worker_pool_size,
+                max_jobs_per_worker=self.max_jobs_per_worker,
+                preload_modules=DEFAULT_PRELOAD_MODULES + [self.execution_manager_class.__module__],
+                initializer=initializer,
+                initargs=initargs,
+            )
         if self.task_runner_class:
             self.task_runner = self.task_runner_class(scheduler=self, config=config)
 
@@ -421,23 +876,131 @@ class Scheduler(BaseScheduler):
 
         return self._db_session
 
+    @property
+    def staging_store(self) -> Optional[StagingStore]:
+        """The store of staged files when `content_addressed_staging` is set
+        and the staging location is local, None otherwise
+        """
+        if not self.content_addressed_staging or not is_local_path(self.staging_path):
+            return None
+        if self._staging_store is None or self._staging_store.staging_path != self.staging_path:
+            self._staging_store = StagingStore(
+                self.staging_path,
+                self.copy_buffer_size,
+                self.copy_strategy,
+                self.staging_concurrency,
+            )
+        return self._staging_store
+
     def copy_input_file(self, input_uri: str, copy_to_path: str):
         """Copies the input file to the staging directory"""
         input_filepath = os.path.join(self.root_dir, input_uri)
-        with fsspec.open(input_filepath) as input_file:
-            with fsspec.open(copy_to_path, "wb") as output_file:
-                output_file.write(input_file.read())
+        if self.staging_store:
+            owner = os.path.basename(os.path.dirname(copy_to_path))
+            self.staging_store.stage_file(input_filepath, copy_to_path, owner)
+        else:
+            copy_file(input_filepath, copy_to_path, self.copy_buffer_size)
 
     def copy_input_folder(self, input_uri: str, nb_copy_to_path: str) -> List[str]:
         """Copies the input file along with the input directory to the staging directory, returns the list of copied files relative to the staging directory"""
         input_dir_path = os.path.dirname(os.path.join(self.root_dir, input_uri))
         staging_dir = os.path.dirname(nb_copy_to_path)
+        if self.staging_store:
+            return self.staging_store.stage_directory(
+                input_dir_path,
+                staging_dir,
+                os.path.basename(staging_dir),
+                self.input_folder_exclude_files,
+                self.input_folder_max_bytes,
+            )
         return copy_directory(
             source_dir=input_dir_path,
             destination_dir=staging_dir,
+            exclude_files=self.input_folder_exclude_files,
+            buffer_size=self.copy_buffer_size,
+            strategy=self.copy_strategy,
+            concurrency=self.staging_concurrency,
+            max_bytes=self.input_folder_max_bytes,
         )
 
-    def create_job(self, model: CreateJob) -> str:
+    def refresh_input(
+        self, job_definition: DescribeJobDefinition, input_uri: str, copy_to_path: str
+    ) -> Dict[str, Any]:
+        """Stages the new input of a job definition, with its input folder if the
+        job definition packages it, and returns the updated job definition fields
+        """
+        input_filename = os.path.basename(input_uri)
+        if not job_definition.package_input_folder:
+            self.copy_input_file(input_uri, copy_to_path)
+            return {"input_filename": input_filename}
+
+        copied_files = self.copy_input_folder(input_uri, copy_to_path)
+        return {
+            "input_filename": input_filename,
+            "packaged_files": [file for file in copied_files if file != input_filename],
+        }
+
+    def stage_new_input(
+        self, model: Union[CreateJob, CreateJobDefinition], staging_paths: Dict[str, str]
+    ) -> Optional[List[str]]:
+        """Copies the input of a new job or job definition to its staging directory,
+        returns its packaged files, None if it does not package its input folder
+        """
+        if not model.package_input_folder:
+            self.copy_input_file(model.input_uri, staging_paths["input"])
+            return None
+
+        copied_files = self.copy_input_folder(model.input_uri, staging_paths["input"])
+        input_notebook_filename = os.path.basename(model.input_uri)
+        return [file for file in copied_files if file != input_notebook_filename]
+
+    def new_job(self, model: CreateJob) -> Job:
+        """Returns the row of the job to insert for `model`"""
+        if not model.output_formats:
+            model.output_formats = []
+
+        return Job(**model.dict(exclude_none=True, exclude={"input_uri"}))
+
+    def check_insert_error(self, error: exc.IntegrityError, model: CreateJob):
+        """Raises IdempotencyTokenError if the job could not be inserted
+        because its idempotency token is used by another job
+        """
+        if is_idempotency_conflict(error, model):
+            self.recent_tokens.add(model.idempotency_token)
+            raise IdempotencyTokenError(model.idempotency_token) from error
+
+    def count_new_job(self, job: Job, model: CreateJob):
+        """Records the token and the status of a job that was inserted"""
+        if model.idempotency_token:
+            self.recent_tokens.add(model.idempotency_token)
+        self.status_counter.move(None, job.status)
+
+    def forget_new_job(self, status: Status, model: CreateJob, staging_paths: Dict[str, str]):
+        """Forgets the token, the status and the partially staged files of a
+        job that was deleted because its input could not be staged
+        """
+        self.status_counter.move(status, None)
+        if model.idempotency_token:
+            self.recent_tokens.discard(model.idempotency_token)
+        self.remove_staging_directories([os.path.dirname(staging_paths["input"])])
+
+    def discard_new_job(self, session, job: Job, model: CreateJob, staging_paths: Dict[str, str]):
+        """Deletes a job whose input could not be staged, with its partially staged files"""
+        status = job.status
+        session.delete(job)
+        session.commit()
+        self.forget_new_job(status, model, staging_paths)
+
+    def start_new_job(self, job: Job, staging_paths: Dict[str, str]):
+        """Queues the job when a concurrency limit is set, otherwise starts its process"""
+        if self.limits_concurrency:
+            self.status_counter.move(job.status, Status.QUEUED)
+            job.status = Status.QUEUED
+        else:
+            job.pid = self.start_counted_job_process(job.job_id, staging_paths, job.compute_type)
+
+    def validate_input(self, model: CreateJob):
+        """Raises an error if the input of the job cannot be executed"""
         if not model.job_definition_id and not self.file_exists(model.input_uri):
             raise InputUriError(model.input_uri)
 
@@ -449,115 +1012,641 @@ class Scheduler(BaseScheduler):
                     """
             )
 
-        with self.db_session() as session:
-            if model.idempotency_token:
-                job = (
-                    session.query(Job)
-                    .filter(Job.idempotency_token == model.idempotency_token)
-                    .first()
-                )
-                if job:
-                    raise IdempotencyTokenError(model.idempotency_token)
-
-            if not model.output_formats:
-                model.output_formats = []
+    def check_idempotency_token(self, model: CreateJob):
+        """Rejects the token of a job created in the last `idempotency_token_ttl`
+        seconds without querying the database, the unique index of tokens
+        rejects the other duplicates when the job is inserted
+        """
+        if model.idempotency_token and model.idempotency_token in self.recent_tokens:
+            raise IdempotencyTokenError(model.idempotency_token)
 
-            job = Job(**model.dict(exclude_none=True, exclude={"input_uri"}))
+    def create_job(self, model: CreateJob) -> str:
+        self.validate_input(model)
+        self.check_idempotency_token(model)
 
+        with self.db_session() as session:
+            job = self.new_job(model)
             session.add(job)
-            session.commit()
+            try:
+                session.commit()
+            except exc.IntegrityError as e:
+                session.rollback()
+                self.check_insert_error(e, model)
+                raise
+            self.count_new_job(job, model)
 
             staging_paths = self.get_staging_paths(DescribeJob.from_orm(job))
-            if model.package_input_folder:
-                copied_files = self.copy_input_folder(model.input_uri, staging_paths["input"])
-                input_notebook_filename = os.path.basename(model.input_uri)
-                job.packaged_files = [
-                    file for file in copied_files if file != input_notebook_filename
-                ]
+            try:
+                packaged_files = self.stage_new_input(model, staging_paths)
+            except Exception:
+                self.discard_new_job(session, job, model, staging_paths)
+                raise
+            if packaged_files is not None:
+                job.packaged_files = packaged_files
                 session.commit()
-            else:
-                self.copy_input_file(model.input_uri, staging_paths["input"])
-
-            # The MP context forces new processes to not be forked on Linux.
-            # This is necessary because `asyncio.get_event_loop()` is bugged in
-            # forked processes in Python versions below 3.12. This method is
-            # called by `jupyter_core` by `nbconvert` in the default executor.
-            #
-            # See: https://github.com/python/cpython/issues/66285
-            # See also: https://github.com/jupyter/jupyter_core/pull/362
-            mp_ctx = mp.get_context("spawn")
-            p = mp_ctx.Process(
-                target=self.execution_manager_class(
-                    job_id=job.job_id,
-                    staging_paths=staging_paths,
-                    root_dir=self.root_dir,
-                    db_url=self.db_url,
-                ).process
-            )
-            p.start()
-
-            job.pid = p.pid
-            session.commit()
 
             job_id = job.job_id
+            self.start_new_job(job, staging_paths)
+            session.commit()
+
+        if self.limits_concurrency:
+            self.dispatch_queued_jobs()
 
         return job_id
 
-    def update_job(self, job_id: str, model: UpdateJob):
+    def create_jobs(self, models: List[CreateJob]) -> List[CreateJobResult]:
+        """Creates the jobs of a batch in a single transaction.
+
+        Each distinct input is validated and read once, the staged input of
+        the first job is copied for the other jobs with the same input, and
+        the jobs are started or queued after all of them are committed.
+        """
+        results = [CreateJobResult() for _ in models]
+        pending = []
+
+        input_errors: Dict[tuple, Optional[str]] = {}
+        for i, model in enumerate(models):
+            key = (model.input_uri, bool(model.job_definition_id))
+            if key not in input_errors:
+                try:
+                    self.validate_input(model)
+                    input_errors[key] = None
+                except Exception as e:
+                    input_errors[key] = str(e)
+            if input_errors[key]:
+                results[i].error = input_errors[key]
+            else:
+                pending.append((i, model))
+
         with self.db_session() as session:
-            session.query(Job).filter(Job.job_id == job_id).update(model.dict(exclude_none=True))
+            tokens = [model.idempotency_token for _, model in pending if model.idempotency_token]
+            used_tokens = set(
+                session.scalars(
+                    select(Job.idempotency_token).filter(Job.idempotency_token.in_(tokens))
+                )
+                if tokens
+                else []
+            )
+
+            candidates = []
+            for i, model in pending:
+                if model.idempotency_token:
+                    if (
+                        model.idempotency_token in used_tokens
+                        or model.idempotency_token in self.recent_tokens
+                    ):
+                        results[i].error = str(IdempotencyTokenError(model.idempotency_token))
+                        continue
+                    used_tokens.add(model.idempotency_token)
+
+                if not model.output_formats:
+                    model.output_formats = []
+                candidates.append((i, model))
+
+            while True:
+                jobs = []
+                for i, model in candidates:
+                    job = Job(**model.dict(exclude_none=True, exclude={"input_uri"}))
+                    session.add(job)
+                    jobs.append((i, model, job))
+
+                # Assigns the job ids and create times that the staging paths are made of
+                try:
+                    session.flush()
+                    break
+                except exc.IntegrityError:
+                    # A job with one of the tokens was created since they were checked,
+                    # the jobs with these tokens are rejected and the others are added again
+                    session.rollback()
+                    candidate_tokens = [
+                        model.idempotency_token
+                        for _, model in candidates
+                        if model.idempotency_token
+                    ]
+                    conflicts = set(
+                        session.scalars(
+                            select(Job.idempotency_token).filter(
+                                Job.idempotency_token.in_(candidate_tokens)
+                            )
+                        )
+                    )
+                    if not conflicts:
+                        raise
+                    for i, model in candidates:
+                        if model.idempotency_token in conflicts:
+                            self.recent_tokens.add(model.idempotency_token)
+                            results[i].error = str(IdempotencyTokenError(model.idempotency_token))
+                    candidates = [
+                        (i, model)
+                        for i, model in candidates
+                        if model.idempotency_token not in conflicts
+                    ]
+
+            staged_inputs: Dict[tuple, str] = {}
+            created = []
+            for i, model, job in jobs:
+                staging_paths = self.get_staging_paths(DescribeJob.from_orm(job))
+                try:
+                    self.stage_input(model, job, staging_paths, staged_inputs)
+                except Exception as e:
+                    self.log.exception(e)
+                    results[i].error = str(e)
+                    session.delete(job)
+                    self.remove_staging_directories([os.path.dirname(staging_paths["input"])])
+                    continue
+
+                if self.limits_concurrency:
+                    job.status = Status.QUEUED
+                results[i].job_id = job.job_id
+                # Read before the commit expires the jobs, so that they are not loaded again
+                created.append(
+                    (job.job_id, job.status, job.idempotency_token, job.compute_type, staging_paths)
+                )
+
             session.commit()
+            for _, status, idempotency_token, _, _ in created:
+                if idempotency_token:
+                    self.recent_tokens.add(idempotency_token)
+                self.status_counter.move(None, status)
+
+            if not self.limits_concurrency and created:
+                pids = [
+                    {
+                        "job_id": job_id,
+                        "pid": self.start_counted_job_process(job_id, staging_paths, compute_type),
+                    }
+                    for job_id, _, _, compute_type, staging_paths in created
+                ]
+                session.execute(update(Job), pids)
+                session.commit()
 
-    def list_jobs(self, query: ListJobsQuery) -> ListJobsResponse:
+        if self.limits_concurrency and created:
+            self.dispatch_queued_jobs()
+
+        return results
+
+    def stage_input(
+        self, model: CreateJob, job: Job, staging_paths: Dict[str, str], staged_inputs: Dict
+    ):
+        """Copies the input of the job to the staging directory, from the
+        staged copy of an earlier job of the batch with the same input if any
+        """
+        key = (model.input_uri, bool(model.package_input_folder))
+        # The store links the files of every job to the same stored files
+        staged_input = None if self.staging_store else staged_inputs.get(key)
+        if model.package_input_folder:
+            if staged_input:
+                copied_files = copy_directory(
+                    source_dir=os.path.dirname(staged_input),
+                    destination_dir=os.path.dirname(staging_paths["input"]),
+                    buffer_size=self.copy_buffer_size,
+                    strategy=self.copy_strategy,
+                    concurrency=self.staging_concurrency,
+                )
+            else:
+                copied_files = self.copy_input_folder(model.input_uri, staging_paths["input"])
+            input_notebook_filename = os.path.basename(model.input_uri)
+            job.packaged_files = [file for file in copied_files if file != input_notebook_filename]
+        elif staged_input:
+            copy_file(staged_input, staging_paths["input"], self.copy_buffer_size)
+        else:
+            self.copy_input_file(model.input_uri, staging_paths["input"])
+
+        staged_inputs.setdefault(key, staging_paths["input"])
+
+    @property
+    def limits_concurrency(self) -> bool:
+        return bool(self.max_concurrent_jobs or self.max_concurrent_jobs_per_compute_type)
+
+    def start_job_process(
+        self, job_id: str, staging_paths: Dict[str, str], compute_type: Optional[str] = None
+    ) -> int:
+        """Starts execution of the job in a new process, returns the process id"""
+        # The MP context forces new processes to not be forked on Linux.
+        # This is necessary because `asyncio.get_event_loop()` is bugged in
+        # forked processes in Python versions below 3.12. This method is
+        # called by `jupyter_core` by `nbconvert` in the default executor.
+        #
+        # See: https://github.com/python/cpython/issues/66285
+        # See also: https://github.com/jupyter/jupyter_core/pull/362
+        target = partial(
+            run_with_engine_options,
+            dict(engine_options),
+            self.execution_manager_class(
+                job_id=job_id,
+                staging_paths=staging_paths,
+                root_dir=self.root_dir,
+                db_url=self.db_url,
+            ).process,
+        )
+
+        with self._process_lock:
+            if self.worker_pool:
+                # Pooled workers are started with the same spawn context
+                p = self.worker_pool.submit(target)
+            else:
+                mp_ctx = mp.get_context("spawn")
+                p = mp_ctx.Process(target=target)
+                p.start()
+
+            self._processes[job_id] = (p, compute_type)
+
+        return p.pid
+
+    def start_counted_job_process(
+        self,
+        job_id: str,
+        staging_paths: Dict[str, str],
+        compute_type: Optional[str] = None,
+        status: Status = Status.STOPPED,
+    ) -> int:
+        """Starts the job process and moves the job out of the stored
+        `status` count, it is counted as in progress while the process runs
+        """
+        with self._process_lock:
+            if not self.limits_concurrency:
+                # Without the job queue, exited processes are forgotten when new jobs start
+                self.reap_job_processes()
+            pid = self.start_job_process(job_id, staging_paths, compute_type)
+            self.status_counter.move(status, None)
+
+        return pid
+
+    def reap_job_processes(self):
+        """Forgets job processes that have exited, freeing their execution slots"""
+        with self._process_lock:
+            if self.worker_pool:
+                self.worker_pool.maintain()
+
+            for job_id, (process, _) in list(self._processes.items()):
+                if not process.is_alive():
+                    del self._processes[job_id]
+                    # The final status was written by the job process
+                    self.status_counter.invalidate()
+
+    def has_free_slot(self, compute_type: Optional[str] = None) -> bool:
+        """Returns True if a job with `compute_type` can start executing now"""
+        if self.max_concurrent_jobs and len(self._processes) >= self.max_concurrent_jobs:
+            return False
+
+        limit = self.max_concurrent_jobs_per_compute_type.get(compute_type) if compute_type else 0
+        if limit:
+            running = sum(1 for _, ct in self._processes.values() if ct == compute_type)
+            if running >= limit:
+                return False
+
+        return True
+
+    def free_slot_count(self) -> Optional[int]:
+        """Returns the number of jobs that can start executing now, or None
+        if only per compute type limits, or no limit, are set
+        """
+        if not self.max_concurrent_jobs:
+            return None
+        return max(self.max_concurrent_jobs - len(self._processes), 0)
+
+    def dispatch_queued_jobs(self):
+        """Starts queued jobs in creation order while execution slots are available"""
+        # Jobs can be created from handler threads while the job queue dispatches
+        with self._process_lock:
+            self.reap_job_processes()
+            after = None
+            while self.has_free_slot():
+                with self.db_session() as session:
+                    query = session.query(Job).filter(Job.status == Status.QUEUED)
+                    if after:
+                        # Jobs of compute types without a free slot are skipped
+                        query = query.filter(
+                            or_(
+                                Job.create_time > after[0],
+                                and_(Job.create_time == after[0], Job.job_id > after[1]),
+                            )
+                        )
+                    queued_jobs = (
+                        query.order_by(asc(Job.create_time), asc(Job.job_id))
+                        .limit(self.free_slot_count())
+                        .all()
+                    )
+                    if not queued_jobs:
+                        return
+
+                    for job in queued_jobs:
+                        after = (job.create_time, job.job_id)
+                        if not self.has_free_slot():
+                            return
+                        if not self.has_free_slot(job.compute_type):
+                            continue
+
+                        staging_paths = self.get_staging_paths(DescribeJob.from_orm(job))
+                        job.pid = self.start_counted_job_process(
+                            job.job_id, staging_paths, job.compute_type, Status.QUEUED
+                        )
+                        job.status = Status.IN_PROGRESS
+                        session.commit()
+
+    async def start_job_queue(self):
+        """Async method that is called by extension at server start, dispatches
+        the jobs left queued by an earlier server, and then, when a concurrency
+        limit is set, dispatches queued jobs every `job_queue_poll_interval` seconds
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.dispatch_queued_jobs)
+            except Exception as e:
+                self.log.exception(e)
+            if not self.limits_concurrency:
+                # Without a limit jobs start when they are created, nothing else is queued
+                return
+            await asyncio.sleep(self.job_queue_poll_interval)
+
+    @property
+    def retention_enabled(self) -> bool:
+        return bool(
+            self.retention_max_age
+            or self.retention_max_jobs_per_definition
+            or self.retention_max_staging_bytes
+        )
+
+    def apply_retention(self) -> RetentionReport:
+        """Deletes the finished jobs that exceed the retention limits,
+        `retention_batch_size` jobs at a time, and returns what was reclaimed
+        """
+        keep_failures = self.retention_keep_failures
+        batch_size = self.retention_batch_size
+        usage = None
+        if self.retention_max_staging_bytes:
+            with self.db_session() as session:
+                finished_job_ids = set(
+                    session.scalars(select(Job.job_id).where(Job.status.in_(FINISHED_STATUSES)))
+                )
+            usage = self.staging_usage.sizes(self.staging_path, finished_job_ids)
+        sizes = usage.directories if usage else {}
+
+        report = RetentionReport()
+        if self.retention_max_age:
+            created_before = get_utc_timestamp() - int(self.retention_max_age * 1000)
+            statement = expired_jobs_statement(created_before, keep_failures, batch_size)
+            report += self.delete_retained_jobs(statement, sizes)
+
+        if self.retention_max_jobs_per_definition:
+            statement = excess_jobs_statement(
+                self.retention_max_jobs_per_definition, keep_failures, batch_size
+            )
+            report += self.delete_retained_jobs(statement, sizes)
+
+        if self.retention_max_staging_bytes:
+            excess = usage.total - report.reclaimed_bytes - self.retention_max_staging_bytes
+            # Non-job directories, the content-addressed store and files linked from
+            # elsewhere are not freed by deleting jobs
+            excess = min(excess, sum(sizes.get(job_id, 0) for job_id in finished_job_ids))
+            if excess > 0:
+                report += self.delete_oldest_jobs(sizes, excess)
+
+        if self.staging_store:
+            self.staging_store.collect_garbage()
+
+        return report
+
+    def delete_retained_jobs(self, statement: Select, sizes: Dict[str, int]) -> RetentionReport:
+        """Deletes the jobs selected by `statement` one batch after the other,
+        until it selects no more jobs
+        """
+        report = RetentionReport()
+        while True:
+            with self.db_session() as session:
+                job_ids = session.scalars(statement).all()
+            if not job_ids:
+                break
+            report += self.delete_finished_jobs(job_ids, sizes)
+
+        return report
+
+    def delete_oldest_jobs(self, sizes: Dict[str, int], excess: int) -> RetentionReport:
+        """Deletes the oldest deletable jobs, one batch after the other, until their
+        staging directories add up to `excess` bytes. Jobs whose directories free
+        nothing are kept.
+        """
+        report = RetentionReport()
+        after = None
+        while report.reclaimed_bytes < excess:
+            with self.db_session() as session:
+                rows = session.execute(
+                    oldest_jobs_statement(
+                        self.retention_keep_failures, self.retention_batch_size, after
+                    )
+                ).all()
+            if not rows:
+                break
+            job_id, create_time = rows[-1]
+            after = (create_time, job_id)
+
+            job_ids = select_until_reclaimed(
+                [job_id for job_id, _ in rows], sizes, excess - report.reclaimed_bytes
+            )
+            if not job_ids:
+                continue
+            deleted = self.delete_finished_jobs(job_ids, sizes)
+            report += deleted
+            if not deleted.reclaimed_bytes:
+                break
+
+        return report
+
+    def delete_finished_jobs(self, job_ids: List[str], sizes: Dict[str, int]) -> RetentionReport:
+        """Deletes the finished jobs among `job_ids` along with their staging directories"""
+        reclaimed = sum(
+            (
+                sizes[job_id]
+                if job_id in sizes
+                else directory_size(os.path.join(self.staging_path, job_id))
+            )
+            for job_id in job_ids
+        )
+        # Waits for the staging directories to be removed before the next batch
+        self.delete_jobs_where(
+            and_(Job.job_id.in_(job_ids), Job.status.in_(FINISHED_STATUSES))
+        ).result()
+        return RetentionReport(len(job_ids), reclaimed)
+
+    async def start_retention(self):
+        """Async method that is called by extension at server start when retention
+        limits are set, applies them every `retention_interval` seconds
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                report = await loop.run_in_executor(None, self.apply_retention)
+                if report.deleted_jobs:
+                    self.log.info(f"Retention limits {report}.")
+            except Exception as e:
+                self.log.exception(e)
+            await asyncio.sleep(self.retention_interval)
+
+    def update_job(self, job_id: str, model: UpdateJob):
         with self.db_session() as session:
-            jobs = session.query(Job)
-
-            if query.status:
-                jobs = jobs.filter(Job.status == query.status)
-            if query.job_definition_id:
-                jobs = jobs.filter(Job.job_definition_id == query.job_definition_id)
-            if query.start_time:
-                jobs = jobs.filter(Job.start_time >= query.start_time)
-            if query.name:
-                jobs = jobs.filter(Job.name.like(f"{query.name}%"))
-            if query.tags:
-                jobs = jobs.filter(and_(Job.tags.contains(tag) for tag in query.tags))
-
-            total = jobs.count()
-
-            if query.sort_by:
-                for sort_field in query.sort_by:
-                    direction = desc if sort_field.direction == SortDirection.desc else asc
-                    jobs = jobs.order_by(direction(getattr(Job, sort_field.name)))
-            next_token = int(query.next_token) if query.next_token else 0
-            jobs = jobs.limit(query.max_items).offset(next_token)
-
-            jobs = jobs.all()
-
-        next_token = next_token + len(jobs)
-        if next_token >= total:
-            next_token = None
+            updates = model.dict(exclude_none=True)
+            session.query(Job).filter(Job.job_id == job_id).update(updates)
+            if "tags" in updates:
+                replace_tags(session, JobTag.job_id, job_id, updates["tags"])
+            session.commit()
 
+    def list_jobs_statement(self, query: ListJobsQuery) -> Select:
+        """Returns the select statement for jobs filtered by query, without sorting"""
+        statement = select(Job)
+
+        if query.status:
+            statement = statement.filter(Job.status == query.status)
+        if query.job_definition_id:
+            statement = statement.filter(Job.job_definition_id == query.job_definition_id)
+        if query.start_time:
+            statement = statement.filter(Job.start_time >= query.start_time)
+        if query.name:
+            statement = statement.filter(Job.name.like(f"{query.name}%"))
+        if query.tags:
+            statement = statement.filter(*tagged_with(Job.job_id, JobTag.job_id, query.tags))
+
+        columns = self.list_jobs_columns(query)
+        if columns:
+            statement = statement.options(load_only(*(getattr(Job, c) for c in columns)))
+
+        return statement
+
+    def list_jobs_columns(self, query: ListJobsQuery) -> Optional[List[str]]:
+        """Returns the names of the job columns to load for the fields
+        selected by query, or None when all columns are loaded
+        """
+        if not query.fields:
+            return None
+
+        unknown = set(query.fields) - set(DescribeJob.__fields__)
+        if unknown:
+            raise SchedulerError(f"Unknown job fields: {', '.join(sorted(unknown))}.")
+
+        # The sort columns are read to create the next page token
+        columns = {"job_id", *(sort_field.name for sort_field in query.sort_by)}
+        columns.update(query.fields)
+        if self.include_job_files(query):
+            columns.update(JOB_FILES_COLUMNS)
+
+        return sorted(columns & set(Job.__table__.columns.keys()))
+
+    def include_job_files(self, query: ListJobsQuery) -> bool:
+        return query.job_files and (not query.fields or bool(JOB_FILES_FIELDS & set(query.fields)))
+
+    def list_jobs_response(
+        self, jobs: List[Job], query: ListJobsQuery, total: Optional[int]
+    ) -> ListJobsResponse:
+        jobs, next_token = next_page(jobs, "job_id", query.sort_by, query.max_items)
+
+        columns = self.list_jobs_columns(query)
+        fields = {"job_id", *query.fields} if query.fields else None
+        include_job_files = self.include_job_files(query)
+        listings = DirectoryListings()
         jobs_list = []
         for job in jobs:
-            model = DescribeJob.from_orm(job)
-            self.add_job_files(model=model)
+            if columns:
+                # Loaded columns are not validated again, and only the
+                # selected fields are set on the model
+                model = DescribeJob.construct(
+                    **{column: getattr(job, column) for column in columns}
+                )
+            else:
+                model = DescribeJob.from_orm(job)
+            if include_job_files:
+                self.add_job_files(model=model, listings=listings)
+            if fields:
+                model = DescribeJob.construct(
+                    _fields_set=fields, **{field: getattr(model, field) for field in fields}
+                )
             jobs_list.append(model)
 
-        list_jobs_response = ListJobsResponse(
+        return ListJobsResponse(
             jobs=jobs_list,
             next_token=next_token,
             total_count=total,
         )
 
-        return list_jobs_response
+    def list_jobs(self, query: ListJobsQuery) -> ListJobsResponse:
+        statement = self.list_jobs_statement(query)
+        with self.db_session() as session:
+            jobs = session.scalars(
+                paginate_statement(
+                    statement, Job, Job.job_id, query.sort_by, query.max_items, query.next_token
+                )
+            ).all()
+
+            key = self.count_cache.key(Job, query)
+            total = known_total_count(query, jobs, self.count_cache, key)
+            if total is None and query.count_mode != CountMode.none:
+                total = session.scalar(count_statement(statement))
+                self.count_cache.put(key, total)
+
+        return self.list_jobs_response(jobs, query, total)
 
     def count_jobs(self, query: CountJobsQuery) -> int:
+        return self.count_jobs_by_status()[query.status]
+
+    def count_jobs_by_status_statement(self, query: CountJobsByStatusQuery) -> Select:
+        statement = select(Job.status, func.count()).group_by(Job.status)
+
+        if query.job_definition_id:
+            statement = statement.filter(Job.job_definition_id == query.job_definition_id)
+        if query.create_time_start:
+            statement = statement.filter(Job.create_time >= query.create_time_start)
+        if query.create_time_end:
+            statement = statement.filter(Job.create_time < query.create_time_end)
+
+        return statement
+
+    def uses_status_counter(self, query: CountJobsByStatusQuery) -> bool:
+        """Returns True if the counts of query are served from `status_counter`"""
+        return bool(self.status_counts_ttl) and not any(query.dict(exclude_none=True).values())
+
+    def cached_status_counts(self) -> Tuple[Optional[Dict[Status, int]], int, List[str]]:
+        """Returns the in-memory status counts if loaded, otherwise None along
+        with the version and the running jobs to load the counts with.
+
+        Jobs with a process started by this scheduler are counted as in
+        progress and are left out of the counts read from the database.
+        Exited processes are reaped first, so that the counts are loaded
+        again with the final status of their jobs.
+        """
+        with self._process_lock:
+            self.reap_job_processes()
+            counts = self.status_counter.get()
+            running_job_ids = list(self._processes)
+            if counts is not None:
+                counts[Status.IN_PROGRESS] += len(running_job_ids)
+            return counts, self.status_counter.version, running_job_ids
+
+    def load_status_counts(
+        self, rows, version: int, running_job_ids: List[str]
+    ) -> Dict[Status, int]:
+        counts = status_counts(rows)
+        self.status_counter.load(counts, version)
+        counts[Status.IN_PROGRESS] += len(running_job_ids)
+        return counts
+
+    def count_jobs_by_status(
+        self, query: Optional[CountJobsByStatusQuery] = None
+    ) -> Dict[Status, int]:
+        query = query or CountJobsByStatusQuery()
+        statement = self.count_jobs_by_status_statement(query)
+        if not self.uses_status_counter(query):
+            with self.db_session() as session:
+                return status_counts(session.execute(statement))
+
+        counts, version, running_job_ids = self.cached_status_counts()
+        if counts is not None:
+            return counts
+
+        if running_job_ids:
+            statement = statement.filter(Job.job_id.not_in(running_job_ids))
         with self.db_session() as session:
-            count = (
-                session.query(func.count(Job.job_id)).filter(Job.status == query.status).scalar()
+            return self.load_status_counts(
+                session.execute(statement).all(), version, running_job_ids
             )
-            return count if count else 0
 
     def get_job(self, job_id: str, job_files: Optional[bool] = True) -> DescribeJob:
         with self.db_session() as session:
@@ -580,16 +1669,24 @@ class Scheduler(BaseScheduler):
                 path = os.path.dirname(next(iter(staging_paths.values())))
                 if os.path.exists(path):
                     shutil.rmtree(path)
+                if self.staging_store:
+                    self.staging_store.release(os.path.basename(path))
 
             session.query(Job).filter(Job.job_id == job_id).delete()
+            replace_tags(session, JobTag.job_id, job_id)
             session.commit()
 
+        self.status_counter.invalidate()
+
     def stop_job(self, job_id):
         with self.db_session() as session:
             job_record = session.query(Job).filter(Job.job_id == job_id).one()
             job = DescribeJob.from_orm(job_record)
             process_id = job_record.pid
-            if process_id and job.status == Status.IN_PROGRESS:
+            if job.status == Status.QUEUED:
+                session.query(Job).filter(Job.job_id == job_id).update({"status": Status.STOPPED})
+                session.commit()
+            elif process_id and job.status == Status.IN_PROGRESS:
                 session.query(Job).filter(Job.job_id == job_id).update({"status": Status.STOPPING})
                 session.commit()
 
@@ -604,6 +1701,99 @@ class Scheduler(BaseScheduler):
                         session.commit()
                         break
 
+        self.status_counter.invalidate()
+
+    def delete_jobs(self, job_ids: List[str]):
+        self.delete_jobs_where(Job.job_id.in_(job_ids))
+
+    def stop_jobs(self, job_ids: List[str]):
+        with self.db_session() as session:
+            self.stop_jobs_where(session, Job.job_id.in_(job_ids))
+
+        self.status_counter.invalidate()
+
+    def stop_jobs_where(self, session, criterion):
+        """Stops the jobs matching `criterion`, queued jobs are stopped with a
+        single update and running jobs with a single pass over the child processes
+        """
+        session.execute(
+            update(Job)
+            .where(criterion, Job.status == Status.QUEUED)
+            .values(status=Status.STOPPED)
+            .execution_options(synchronize_session=False)
+        )
+        running = dict(
+            session.execute(
+                select(Job.pid, Job.job_id).where(
+                    criterion, Job.status == Status.IN_PROGRESS, Job.pid.is_not(None)
+                )
+            ).all()
+        )
+        if running:
+            session.execute(
+                update(Job)
+                .where(Job.job_id.in_(running.values()))
+                .values(status=Status.STOPPING)
+                .execution_options(synchronize_session=False)
+            )
+        session.commit()
+        if not running:
+            return
+
+        stopped_job_ids = []
+        for proc in psutil.Process().children(recursive=True):
+            if proc.pid in running:
+                try:
+                    proc.kill()
+                except psutil.NoSuchProcess:
+                    pass
+                stopped_job_ids.append(running[proc.pid])
+
+        if stopped_job_ids:
+            session.execute(
+                update(Job)
+                .where(Job.job_id.in_(stopped_job_ids))
+                .values(status=Status.STOPPED)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+
+    def delete_jobs_where(self, criterion):
+        """Deletes the jobs matching `criterion` with a single statement after
+        stopping the running ones, their staging directories are removed in the
+        background. Returns the future of the removal.
+        """
+        with self.db_session() as session:
+            self.stop_jobs_where(session, criterion)
+            job_ids = session.scalars(select(Job.job_id).where(criterion)).all()
+            session.execute(
+                delete(JobTag)
+                .where(JobTag.job_id.in_(select(Job.job_id).where(criterion)))
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(
+                delete(Job).where(criterion).execution_options(synchronize_session=False)
+            )
+            session.commit()
+
+        self.status_counter.invalidate()
+        return self.remove_staging_directories(
+            [os.path.join(self.staging_path, job_id) for job_id in job_ids]
+        )
+
+    def remove_staging_directories(self, paths: List[str]) -> Future:
+        """Removes the directories on a background thread"""
+
+        staging_store = self.staging_store
+
+        def remove():
+            for path in paths:
+                shutil.rmtree(path, ignore_errors=True)
+                if staging_store:
+                    staging_store.release(os.path.basename(path))
+
+        return self._cleanup_executor.submit(remove)
+
     def create_job_definition(self, model: CreateJobDefinition) -> str:
         with self.db_session() as session:
             if not self.file_exists(model.input_uri):
@@ -618,15 +1808,17 @@ class Scheduler(BaseScheduler):
             job_definition_schedule = job_definition.schedule
 
             staging_paths = self.get_staging_paths(DescribeJobDefinition.from_orm(job_definition))
-            if model.package_input_folder:
-                copied_files = self.copy_input_folder(model.input_uri, staging_paths["input"])
-                input_notebook_filename = os.path.basename(model.input_uri)
-                job_definition.packaged_files = [
-                    file for file in copied_files if file != input_notebook_filename
-                ]
+            try:
+                packaged_files = self.stage_new_input(model, staging_paths)
+            except Exception:
+                # A job definition without its input would be scheduled after a restart
+                session.delete(job_definition)
+                session.commit()
+                self.remove_staging_directories([os.path.dirname(staging_paths["input"])])
+                raise
+            if packaged_files is not None:
+                job_definition.packaged_files = packaged_files
                 session.commit()
-            else:
-                self.copy_input_file(model.input_uri, staging_paths["input"])
 
         if self.task_runner and job_definition_schedule:
             self.task_runner.add_job_definition(job_definition_id)
@@ -662,12 +1854,19 @@ class Scheduler(BaseScheduler):
                 new_input_filename = os.path.basename(model.input_uri)
                 staging_paths = self.get_staging_paths(describe_job_definition)
                 staging_directory = os.path.dirname(staging_paths["input"])
-                self.copy_input_file(
-                    model.input_uri, os.path.join(staging_directory, new_input_filename)
+                updates.update(
+                    self.refresh_input(
+                        describe_job_definition,
+                        model.input_uri,
+                        os.path.join(staging_directory, new_input_filename),
+                    )
                 )
-                updates["input_filename"] = new_input_filename
 
             filtered_query.update(updates)
+            if "tags" in updates:
+                replace_tags(
+                    session, JobDefinitionTag.job_definition_id, job_definition_id, updates["tags"]
+                )
             session.commit()
 
             schedule = (
@@ -680,11 +1879,9 @@ class Scheduler(BaseScheduler):
             self.task_runner.update_job_definition(job_definition_id, model)
 
     def delete_job_definition(self, job_definition_id: str):
-        with self.db_session() as session:
-            jobs = session.query(Job).filter(Job.job_definition_id == job_definition_id)
-            for job in jobs:
-                self.delete_job(job.job_id)
+        self.delete_jobs_where(Job.job_definition_id == job_definition_id)
 
+        with self.db_session() as session:
             schedule = (
                 session.query(JobDefinition.schedule)
                 .filter(JobDefinition.job_definition_id == job_definition_id)
@@ -694,6 +1891,7 @@ class Scheduler(BaseScheduler):
             session.query(JobDefinition).filter(
                 JobDefinition.job_definition_id == job_definition_id
             ).delete()
+            replace_tags(session, JobDefinitionTag.job_definition_id, job_definition_id)
             session.commit()
 
         if self.task_runner and schedule:
@@ -709,37 +1907,34 @@ class Scheduler(BaseScheduler):
 
         return DescribeJobDefinition.from_orm(job_definition)
 
-    def list_job_definitions(self, query: ListJobDefinitionsQuery) -> ListJobDefinitionsResponse:
-        with self.db_session() as session:
-            definitions = session.query(JobDefinition)
-
-            if query.create_time:
-                definitions = definitions.filter(JobDefinition.create_time >= query.create_time)
-            if query.name:
-                definitions = definitions.filter(JobDefinition.name.like(f"{query.name}%"))
-            if query.tags:
-                definitions = definitions.filter(
-                    and_(JobDefinition.tags.contains(tag) for tag in query.tags)
+    def list_job_definitions_statement(self, query: ListJobDefinitionsQuery) -> Select:
+        """Returns the select statement for job definitions filtered by query, without sorting"""
+        statement = select(JobDefinition)
+
+        if query.create_time:
+            statement = statement.filter(JobDefinition.create_time >= query.create_time)
+        if query.name:
+            statement = statement.filter(JobDefinition.name.like(f"{query.name}%"))
+        if query.tags:
+            statement = statement.filter(
+                *tagged_with(
+                    JobDefinition.job_definition_id, JobDefinitionTag.job_definition_id, query.tags
                 )
+            )
 
-            total = definitions.count()
-
-            if query.sort_by:
-                for sort_field in query.sort_by:
-                    direction = desc if sort_field.direction == SortDirection.desc else asc
-                    definitions = definitions.order_by(
-                        direction(getattr(JobDefinition, sort_field.name))
-                    )
-            next_token = int(query.next_token) if query.next_token else 0
-            definitions = definitions.limit(query.max_items).offset(next_token)
-
-            definitions = definitions.all()
+        return statement
 
-        next_token = next_token + len(definitions)
-        if next_token >= total:
-            next_token = None
+    def list_job_definitions_response(
+        self,
+        definitions: List[JobDefinition],
+        query: ListJobDefinitionsQuery,
+        total: Optional[int],
+    ) -> ListJobDefinitionsResponse:
+        definitions, next_token = next_page(
+            definitions, "job_definition_id", query.sort_by, query.max_items
+        )
 
-        list_response = ListJobDefinitionsResponse(
+        return ListJobDefinitionsResponse(
             job_definitions=[
                 DescribeJobDefinition.from_orm(definition) for definition in definitions or []
             ],
@@ -747,7 +1942,27 @@ class Scheduler(BaseScheduler):
             total_count=total,
         )
 
-        return list_response
+    def list_job_definitions(self, query: ListJobDefinitionsQuery) -> ListJobDefinitionsResponse:
+        statement = self.list_job_definitions_statement(query)
+        with self.db_session() as session:
+            definitions = session.scalars(
+                paginate_statement(
+                    statement,
+                    JobDefinition,
+                    JobDefinition.job_definition_id,
+                    query.sort_by,
+                    query.max_items,
+                    query.next_token,
+                )
+            ).all()
+
+            key = self.count_cache.key(JobDefinition, query)
+            total = known_total_count(query, definitions, self.count_cache, key)
+            if total is None and query.count_mode != CountMode.none:
+                total = session.scalar(count_statement(statement))
+                self.count_cache.put(key, total)
+
+        return self.list_job_definitions_response(definitions, query, total)
 
     def create_job_from_definition(self, job_definition_id: str, model: CreateJobFromDefinition):
         job_id = None
@@ -760,6 +1975,40 @@ class Scheduler(BaseScheduler):
 
         return job_id
 
+    def export_jobs(self) -> Iterator[str]:
+        with self.db_session() as session:
+            yield from export_rows(session, Job, Job.job_id, self.export_batch_size)
+
+    def import_jobs(self, lines: Iterable[str]) -> int:
+        with self.db_session() as session:
+            count = import_rows(session, Job, JobTag.job_id, lines, self.export_batch_size)
+            session.commit()
+
+        self.count_cache.clear()
+        self.status_counter.invalidate()
+        return count
+
+    def export_job_definitions(self) -> Iterator[str]:
+        with self.db_session() as session:
+            yield from export_rows(
+                session, JobDefinition, JobDefinition.job_definition_id, self.export_batch_size
+            )
+
+    def import_job_definitions(self, lines: Iterable[str]) -> int:
+        with self.db_session() as session:
+            count = import_rows(
+                session,
+                JobDefinition,
+                JobDefinitionTag.job_definition_id,
+                lines,
+                self.export_batch_size,
+            )
+            session.commit()
+
+        self.count_cache.clear()
+        self.status_counter.invalidate()
+        return count
+
     def get_staging_paths(self, model: Union[DescribeJob, DescribeJobDefinition]) -> Dict[str, str]:
         staging_paths = {}
         if not model:
@@ -812,6 +2061,327 @@ class ArchivingScheduler(Scheduler):
         return staging_paths
 
 
+class AsyncScheduler(Scheduler):
+    """Scheduler that implements the job and job definition
+    APIs with coroutines backed by the SQLAlchemy asyncio engine,
+    so concurrent requests share one connection pool instead of
+    each holding a thread and a synchronous session.
+
+    Requires the `aiosqlite` package for SQLite or `asyncpg`
+    for PostgreSQL database urls. Job execution, the job queue
+    and the task runner still use synchronous sessions, and file
+    copies run in the default thread pool of the event loop.
+
+    Usage
+    -----
+    >> jupyter lab --SchedulerApp.scheduler_class=jupyter_scheduler.scheduler.AsyncScheduler
+    """
+
+    _async_db_session = None
+
+    @property
+    def async_db_session(self):
+        if not self._async_db_session:
+            self._async_db_session = create_async_session(self.db_url)
+
+        return self._async_db_session
+
+    async def dispose(self):
+        """Closes the connections of the async engine, called when the server stops"""
+        if self._async_db_session:
+            await self._async_db_session.kw["bind"].dispose()
+            self._async_db_session = None
+
+    async def run_sync(self, func, *args, **kwargs):
+        """Runs a blocking function in the default executor of the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+    async def create_job(self, model: CreateJob) -> str:
+        await self.run_sync(self.validate_input, model)
+        self.check_idempotency_token(model)
+
+        async with self.async_db_session() as session:
+            job = self.new_job(model)
+            session.add(job)
+            try:
+                await session.commit()
+            except exc.IntegrityError as e:
+                await session.rollback()
+                self.check_insert_error(e, model)
+                raise
+            self.count_new_job(job, model)
+
+            staging_paths = self.get_staging_paths(DescribeJob.from_orm(job))
+            try:
+                packaged_files = await self.run_sync(self.stage_new_input, model, staging_paths)
+            except Exception:
+                status = job.status
+                await session.delete(job)
+                await session.commit()
+                await self.run_sync(self.forget_new_job, status, model, staging_paths)
+                raise
+            if packaged_files is not None:
+                job.packaged_files = packaged_files
+                await session.commit()
+
+            job_id = job.job_id
+            await self.run_sync(self.start_new_job, job, staging_paths)
+            await session.commit()
+
+        if self.limits_concurrency:
+            await self.run_sync(self.dispatch_queued_jobs)
+
+        return job_id
+
+    async def update_job(self, job_id: str, model: UpdateJob):
+        async with self.async_db_session() as session:
+            updates = model.dict(exclude_none=True)
+            await session.execute(update(Job).filter(Job.job_id == job_id).values(**updates))
+            if "tags" in updates:
+                for statement in replace_tags_statements(JobTag.job_id, job_id, updates["tags"]):
+                    await session.execute(statement)
+            await session.commit()
+
+    async def list_jobs(self, query: ListJobsQuery) -> ListJobsResponse:
+        statement = self.list_jobs_statement(query)
+        async with self.async_db_session() as session:
+            jobs = (
+                await session.scalars(
+                    paginate_statement(
+                        statement, Job, Job.job_id, query.sort_by, query.max_items, query.next_token
+                    )
+                )
+            ).all()
+
+            key = self.count_cache.key(Job, query)
+            total = known_total_count(query, jobs, self.count_cache, key)
+            if total is None and query.count_mode != CountMode.none:
+                total = await session.scalar(count_statement(statement))
+                self.count_cache.put(key, total)
+
+        return self.list_jobs_response(jobs, query, total)
+
+    async def count_jobs(self, query: CountJobsQuery) -> int:
+        return (await self.count_jobs_by_status())[query.status]
+
+    async def count_jobs_by_status(
+        self, query: Optional[CountJobsByStatusQuery] = None
+    ) -> Dict[Status, int]:
+        query = query or CountJobsByStatusQuery()
+        statement = self.count_jobs_by_status_statement(query)
+        if not self.uses_status_counter(query):
+            async with self.async_db_session() as session:
+                return status_counts((await session.execute(statement)).all())
+
+        counts, version, running_job_ids = self.cached_status_counts()
+        if counts is not None:
+            return counts
+
+        if running_job_ids:
+            statement = statement.filter(Job.job_id.not_in(running_job_ids))
+        async with self.async_db_session() as session:
+            return self.load_status_counts(
+                (await session.execute(statement)).all(), version, running_job_ids
+            )
+
+    async def get_job(self, job_id: str, job_files: Optional[bool] = True) -> DescribeJob:
+        async with self.async_db_session() as session:
+            job_record = (await session.scalars(select(Job).filter(Job.job_id == job_id))).one()
+
+        model = DescribeJob.from_orm(job_record)
+        if job_files:
+            self.add_job_files(model=model)
+
+        return model
+
+    async def create_job_definition(self, model: CreateJobDefinition) -> str:
+        if not await self.run_sync(self.file_exists, model.input_uri):
+            raise InputUriError(model.input_uri)
+
+        async with self.async_db_session() as session:
+            job_definition = JobDefinition(**model.dict(exclude_none=True, exclude={"input_uri"}))
+            session.add(job_definition)
+            await session.commit()
+
+            staging_paths = self.get_staging_paths(DescribeJobDefinition.from_orm(job_definition))
+            try:
+                packaged_files = await self.run_sync(self.stage_new_input, model, staging_paths)
+            except Exception:
+                # A job definition without its input would be scheduled after a restart
+                await session.delete(job_definition)
+                await session.commit()
+                await self.run_sync(
+                    self.remove_staging_directories, [os.path.dirname(staging_paths["input"])]
+                )
+                raise
+            if packaged_files is not None:
+                job_definition.packaged_files = packaged_files
+                await session.commit()
+
+        if self.task_runner and job_definition.schedule:
+            # The task runner reads the job definition with a synchronous session
+            await self.run_sync(
+                self.task_runner.add_job_definition, job_definition.job_definition_id
+            )
+
+        return job_definition.job_definition_id
+
+    async def update_job_definition(self, job_definition_id: str, model: UpdateJobDefinition):
+        async with self.async_db_session() as session:
+            job_definition = (
+                await session.scalars(
+                    select(JobDefinition).filter(
+                        JobDefinition.job_definition_id == job_definition_id
+                    )
+                )
+            ).one()
+            describe_job_definition = DescribeJobDefinition.from_orm(job_definition)
+
+            if (
+                (
+                    not model.input_uri
+                    or (
+                        model.input_uri
+                        and describe_job_definition.input_filename
+                        == os.path.basename(model.input_uri)
+                    )
+                )
+                and describe_job_definition.schedule == model.schedule
+                and describe_job_definition.timezone == model.timezone
+                and (model.active == None or describe_job_definition.active == model.active)
+            ):
+                return
+
+            updates = model.dict(exclude_none=True, exclude={"input_uri"})
+
+            if model.input_uri:
+                new_input_filename = os.path.basename(model.input_uri)
+                staging_paths = self.get_staging_paths(describe_job_definition)
+                staging_directory = os.path.dirname(staging_paths["input"])
+                updates.update(
+                    await self.run_sync(
+                        self.refresh_input,
+                        describe_job_definition,
+                        model.input_uri,
+                        os.path.join(staging_directory, new_input_filename),
+                    )
+                )
+
+            for key, value in updates.items():
+                setattr(job_definition, key, value)
+            await session.commit()
+
+        if self.task_runner and job_definition.schedule:
+            await self.run_sync(self.task_runner.update_job_definition, job_definition_id, model)
+
+    async def delete_job_definition(self, job_definition_id: str):
+        await self.run_sync(self.delete_jobs_where, Job.job_definition_id == job_definition_id)
+
+        async with self.async_db_session() as session:
+            schedule = await session.scalar(
+                select(JobDefinition.schedule).filter(
+                    JobDefinition.job_definition_id == job_definition_id
+                )
+            )
+
+            await session.execute(
+                delete(JobDefinition).filter(JobDefinition.job_definition_id == job_definition_id)
+            )
+            for statement in replace_tags_statements(
+                JobDefinitionTag.job_definition_id, job_definition_id
+            ):
+                await session.execute(statement)
+            await session.commit()
+
+        if self.task_runner and schedule:
+            await self.run_sync(self.task_runner.delete_job_definition, job_definition_id)
+
+    async def get_job_definition(self, job_definition_id: str) -> DescribeJobDefinition:
+        async with self.async_db_session() as session:
+            job_definition = (
+                await session.scalars(
+                    select(JobDefinition).filter(
+                        JobDefinition.job_definition_id == job_definition_id
+                    )
+                )
+            ).one()
+
+        return DescribeJobDefinition.from_orm(job_definition)
+
+    async def list_job_definitions(
+        self, query: ListJobDefinitionsQuery
+    ) -> ListJobDefinitionsResponse:
+        statement = self.list_job_definitions_statement(query)
+        async with self.async_db_session() as session:
+            definitions = (
+                await session.scalars(
+                    paginate_statement(
+                        statement,
+                        JobDefinition,
+                        JobDefinition.job_definition_id,
+                        query.sort_by,
+                        query.max_items,
+                        query.next_token,
+                    )
+                )
+            ).all()
+
+            key = self.count_cache.key(JobDefinition, query)
+            total = known_total_count(query, definitions, self.count_cache, key)
+            if total is None and query.count_mode != CountMode.none:
+                total = await session.scalar(count_statement(statement))
+                self.count_cache.put(key, total)
+
+        return self.list_job_definitions_response(definitions, query, total)
+
+    async def create_job_from_definition(
+        self, job_definition_id: str, model: CreateJobFromDefinition
+    ):
+        job_id = None
+        definition = await self.get_job_definition(job_definition_id)
+        if definition:
+            input_uri = self.get_staging_paths(definition)["input"]
+            attributes = definition.dict(exclude={"schedule", "timezone"}, exclude_none=True)
+            attributes = {**attributes, **model.dict(exclude_none=True), "input_uri": input_uri}
+            job_id = await self.create_job(CreateJob(**attributes))
+
+        return job_id
+
+    async def export_table(self, model, id_column) -> AsyncIterator[str]:
+        async with self.async_db_session() as session:
+            result = await session.stream(
+                export_statement(model, id_column, self.export_batch_size)
+            )
+            async for rows in result.partitions():
+                yield to_ndjson(rows)
+
+    async def import_table(self, model, tag_column, lines: Iterable[str]) -> int:
+        async with self.async_db_session() as session:
+            count = await session.run_sync(
+                import_rows, model, tag_column, lines, self.export_batch_size
+            )
+            await session.commit()
+
+        self.count_cache.clear()
+        self.status_counter.invalidate()
+        return count
+
+    async def export_jobs(self) -> AsyncIterator[str]:
+        async for chunk in self.export_table(Job, Job.job_id):
+            yield chunk
+
+    async def import_jobs(self, lines: Iterable[str]) -> int:
+        return await self.import_table(Job, JobTag.job_id, lines)
+
+    async def export_job_definitions(self) -> AsyncIterator[str]:
+        async for chunk in self.export_table(JobDefinition, JobDefinition.job_definition_id):
+            yield chunk
+
+    async def import_job_definitions(self, lines: Iterable[str]) -> int:
+        return await self.import_table(JobDefinition, JobDefinitionTag.job_definition_id, lines)
+
+
 class SchedulerWithErrors(Scheduler):
     """
     Use only for testing exceptions, not to be used in production
@@ -871,6 +2441,18 @@ class SchedulerWithErrors(Scheduler):
         else:
             super().stop_job(job_id)
 
+    def delete_jobs(self, job_ids: List[str]):
+        if self._should_raise_error():
+            raise SchedulerError("Failed delete jobs because of a deliberate exception.")
+        else:
+            super().delete_jobs(job_ids)
+
+    def stop_jobs(self, job_ids: List[str]):
+        if self._should_raise_error():
+            raise SchedulerError("Failed stop jobs because of a deliberate exception.")
+        else:
+            super().stop_jobs(job_ids)
+
     def create_job_definition(self, model: CreateJobDefinition) -> str:
         if self._should_raise_error():
             raise SchedulerError("Failed create job definition because of a deliberate exception.")
@@ -0,0 +1,251 @@
+import hashlib
+import os
+import shutil
+import stat
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from jupyter_scheduler.utils import (
+    DEFAULT_COPY_BUFFER_SIZE,
+    FileCopier,
+    copy_file,
+    list_directory,
+)
+
+# Name of the directory of the store in the staging area
+STORE_DIRNAME = ".store"
+
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def hash_file(path: str, buffer_size: int = DEFAULT_COPY_BUFFER_SIZE) -> str:
+    """Returns the SHA-256 hex digest of the file at `path`, read in chunks of `buffer_size`"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+def file_key(st: os.stat_result) -> Tuple[int, int, int, int]:
+    """Returns the key of the digest of a file, which changes when the file is modified"""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class StagingStore:
+    """Content-addressed store of the files staged for jobs and job definitions.
+
+    Every distinct file content is stored once as a read-only blob named after
+    its hash, and staging directories are populated from the blobs with the
+    `FileCopier` of `strategy`, with clones or hardlinks of the blobs where
+    the filesystem supports them. The directories
+    that reference a blob are recorded as empty files under `refs/<digest>/`
+    and listed in `owners/<name>`, a blob is removed when the last directory
+    that references it is released.
+
+    Parameters
+    ----------
+    staging_path : str
+        Local staging area, the store is kept in its `.store` directory
+    buffer_size : int
+        Size of the chunks in which files are hashed and copied
+    strategy : str
+        Copy strategy of the files placed in staging directories
+    concurrency : int
+        Number of files of a directory that are staged at a time
+    """
+
+    # Number of file digests that are kept, the least recently used are evicted
+    max_cached_digests = 10000
+
+    def __init__(
+        self,
+        staging_path: str,
+        buffer_size: int = DEFAULT_COPY_BUFFER_SIZE,
+        strategy: str = "auto",
+        concurrency: int = 1,
+    ):
+        self.staging_path = staging_path
+        self.root = os.path.join(staging_path, STORE_DIRNAME)
+        self.buffer_size = buffer_size
+        self.copier = FileCopier(strategy, buffer_size, concurrency)
+        # Digests by (device, inode, size, modification time), so that files that
+        # were staged from the store or did not change since they were hashed
+        # are not read again
+        self._digests: "OrderedDict[Tuple[int, int, int, int], str]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def refs_path(self, digest: str) -> str:
+        return os.path.join(self.root, "refs", digest)
+
+    def owner_path(self, owner: str) -> str:
+        return os.path.join(self.root, "owners", owner)
+
+    def digest(self, path: str) -> str:
+        key = file_key(os.stat(path))
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest:
+                self._digests.move_to_end(key)
+                return digest
+
+        digest = hash_file(path, self.buffer_size)
+        self.cache_digest(key, digest)
+        return digest
+
+    def cache_digest(self, key: Tuple[int, int, int, int], digest: str):
+        with self._lock:
+            self._digests[key] = digest
+            self._digests.move_to_end(key)
+            while len(self._digests) > self.max_cached_digests:
+                self._digests.popitem(last=False)
+
+    def add(self, path: str, owner: str) -> str:
+        """Stores the content of the file at `path` if it is not stored yet and
+        references it from the staging directory `owner`, returns its digest.
+
+        The reference is recorded under the same lock as the lookup of the blob,
+        so that the blob cannot be removed by the release of another staging
+        directory before it is placed. The file is hashed and copied outside of
+        the lock, so that files are added concurrently.
+        """
+        digest = self.digest(path)
+        blob = self.blob_path(digest)
+        partial_blob = None
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            partial_blob = f"{blob}.{uuid.uuid4().hex}.partial"
+            copy_file(path, partial_blob, self.buffer_size)
+            os.chmod(partial_blob, READ_ONLY)
+
+        with self._lock:
+            if partial_blob:
+                if os.path.exists(blob):
+                    # Stored by another thread while the file was copied
+                    os.remove(partial_blob)
+                else:
+                    os.replace(partial_blob, blob)
+                    self.cache_digest(file_key(os.stat(blob)), digest)
+            elif not os.path.exists(blob):
+                # Removed by a release since it was looked up
+                return self.add(path, owner)
+            self.add_ref(digest, owner)
+        return digest
+
+    def place(self, blob: str, destination: str):
+        """Populates `destination` with the content of `blob`"""
+        self.copier.copy(blob, destination)
+        if not os.path.samefile(blob, destination):
+            # Clones and copies are not shared and can be written to by the job
+            os.chmod(destination, os.stat(destination).st_mode | stat.S_IWUSR)
+
+    def stage_file(self, source: str, destination: str, owner: str):
+        """Stages the file at `source` to `destination` through the store,
+        `owner` is the name of the staging directory of `destination`
+        """
+        # The staging directory exists before it references blobs, so that
+        # `collect_garbage` does not release it as a removed directory
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        digest = self.add(source, owner)
+        if os.path.lexists(destination):
+            os.remove(destination)
+        self.place(self.blob_path(digest), destination)
+
+    def stage_directory(
+        self,
+        source_dir: str,
+        destination_dir: str,
+        owner: str,
+        exclude_files: Optional[List[str]] = None,
+        max_bytes: int = 0,
+    ) -> List[str]:
+        """Stages the files under `source_dir` to `destination_dir` through the store,
+        except for the files matching `exclude_files`, and returns the paths of the
+        staged files relative to `destination_dir`. See `list_directory`.
+        """
+        _, staged_files = list_directory(source_dir, exclude_files, max_bytes)
+
+        def stage(rel_path: str):
+            self.stage_file(
+                os.path.join(source_dir, rel_path), os.path.join(destination_dir, rel_path), owner
+            )
+
+        if self.copier.concurrency > 1 and len(staged_files) > 1:
+            with ThreadPoolExecutor(min(self.copier.concurrency, len(staged_files))) as executor:
+                list(executor.map(stage, staged_files))
+        else:
+            for rel_path in staged_files:
+                stage(rel_path)
+
+        return staged_files
+
+    def add_ref(self, digest: str, owner: str):
+        refs = self.refs_path(digest)
+        ref = os.path.join(refs, owner)
+        if os.path.exists(ref):
+            return
+        os.makedirs(refs, exist_ok=True)
+        open(ref, "w").close()
+        os.makedirs(os.path.dirname(self.owner_path(owner)), exist_ok=True)
+        with open(self.owner_path(owner), "a") as f:
+            f.write(digest + "\n")
+
+    def refcount(self, digest: str) -> int:
+        """Returns the number of staging directories that reference the blob"""
+        refs = self.refs_path(digest)
+        return len(os.listdir(refs)) if os.path.isdir(refs) else 0
+
+    def release(self, owner: str) -> int:
+        """Drops the references of the staging directory `owner`, removes
+        the blobs that are not referenced anymore and returns their size
+        """
+        reclaimed = 0
+        with self._lock:
+            try:
+                with open(self.owner_path(owner)) as f:
+                    digests = set(f.read().split())
+            except FileNotFoundError:
+                return 0
+
+            for digest in digests:
+                refs = self.refs_path(digest)
+                try:
+                    os.remove(os.path.join(refs, owner))
+                except FileNotFoundError:
+                    pass
+                if self.refcount(digest):
+                    continue
+                shutil.rmtree(refs, ignore_errors=True)
+                blob = self.blob_path(digest)
+                try:
+                    st = os.stat(blob)
+                    os.remove(blob)
+                except FileNotFoundError:
+                    continue
+                reclaimed += st.st_size
+                # The inode of the blob can be reused by another file
+                self._digests.pop(file_key(st), None)
+            os.remove(self.owner_path(owner))
+
+        return reclaimed
+
+    def collect_garbage(self) -> int:
+        """Releases the staging directories that were removed without being
+        released, returns the size of the removed blobs
+        """
+        owners_dir = os.path.join(self.root, "owners")
+        if not os.path.isdir(owners_dir):
+            return 0
+        return sum(
+            self.release(owner)
+            for owner in os.listdir(owners_dir)
+            if not os.path.isdir(os.path.join(self.staging_path, owner))
+        )
@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from jupyter_scheduler.models import Status
+
+
+def status_counts(rows: Iterable[Tuple[str, int]]) -> Dict[Status, int]:
+    """Returns the job count of every status from (status, count) rows"""
+    counts = {status: 0 for status in Status}
+    for status, count in rows:
+        counts[Status(status)] += count
+    return counts
+
+
+class StatusCounter:
+    """In-memory job counts per status.
+
+    Counts are loaded with a single grouped count query and are then
+    kept current with the status changes the scheduler makes, so that
+    reading them does not query the database. Changes made by other
+    processes are picked up when the counts are invalidated, or at
+    the latest `ttl` seconds after they were loaded.
+
+    Parameters
+    ----------
+    ttl : float
+        Seconds after which loaded counts are read from the database again
+    """
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._counts: Optional[Dict[Status, int]] = None
+        self._loaded_at = 0.0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Incremented on every change, read before querying the counts to load"""
+        return self._version
+
+    def get(self) -> Optional[Dict[Status, int]]:
+        """Returns the counts, or None if they need to be loaded"""
+        with self._lock:
+            if self._counts is None or time.monotonic() - self._loaded_at > self.ttl:
+                return None
+            return dict(self._counts)
+
+    def load(self, counts: Dict[Status, int], version: int):
+        """Sets the counts of a query that started at `version`, counts are
+        discarded if they changed while the query ran
+        """
+        with self._lock:
+            if version != self._version:
+                return
+            self._counts = dict(counts)
+            self._loaded_at = time.monotonic()
+
+    def move(self, from_status: Optional[Status], to_status: Optional[Status]):
+        """Moves one job from `from_status` to `to_status`, None
+        stands for a job that is added to or removed from the counts
+        """
+        with self._lock:
+            self._version += 1
+            if self._counts is None:
+                return
+            if from_status:
+                self._counts[Status(from_status)] = max(self._counts[Status(from_status)] - 1, 0)
+            if to_status:
+                self._counts[Status(to_status)] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._counts = None
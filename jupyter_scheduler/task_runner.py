@@ -1,4 +1,6 @@
 import asyncio
+import inspect
+import threading
 from dataclasses import dataclass
 from datetime import datetime
 from heapq import heappop, heappush
@@ -8,6 +10,7 @@ import traitlets
 from jupyter_server.transutils import _i18n
 from sqlalchemy import Boolean, Column, Integer, String, create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from traitlets.config import LoggingConfigurable
 
 from jupyter_scheduler.models import CreateJob, UpdateJobDefinition
@@ -98,7 +101,13 @@ class PriorityQueue:
 class Cache:
     def __init__(self) -> None:
         self.cache_url = "sqlite://"
-        engine = create_engine(self.cache_url, echo=False)
+        # A single connection, so that every thread sees the same in-memory database
+        engine = create_engine(
+            self.cache_url,
+            echo=False,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
         Base.metadata.create_all(engine)
         self.session = sessionmaker(bind=engine)
 
@@ -186,7 +195,9 @@ class BaseTaskRunner(LoggingConfigurable):
 class TaskRunner(BaseTaskRunner):
     """Default task runner that maintains a job definition cache and a
     priority queue, and polls the queue every `poll_interval` seconds
-    for new jobs to create.
+    for new jobs to create. The queue is processed in a thread of the
+    event loop's default executor, so that creating jobs does not block
+    the server.
     """
 
     def __init__(self, scheduler, config=None) -> None:
@@ -195,6 +206,9 @@ class TaskRunner(BaseTaskRunner):
         self.db_session = scheduler.db_session
         self.cache = Cache()
         self.queue = PriorityQueue()
+        # Guards the cache and the queue, which are updated from handler threads
+        self.lock = threading.RLock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
 
     def compute_next_run_time(self, schedule: str, timezone: Optional[str] = None):
         return compute_next_run_time(schedule, timezone)
@@ -205,22 +219,23 @@ class TaskRunner(BaseTaskRunner):
 
         for definition in definitions:
             next_run_time = self.compute_next_run_time(definition.schedule, definition.timezone)
-            self.cache.put(
-                DescribeJobDefinitionCache(
-                    job_definition_id=definition.job_definition_id,
-                    next_run_time=next_run_time,
-                    active=definition.active,
-                    timezone=definition.timezone,
-                    schedule=definition.schedule,
-                )
-            )
-            if definition.active:
-                self.queue.push(
-                    JobDefinitionTask(
+            with self.lock:
+                self.cache.put(
+                    DescribeJobDefinitionCache(
                         job_definition_id=definition.job_definition_id,
                         next_run_time=next_run_time,
+                        active=definition.active,
+                        timezone=definition.timezone,
+                        schedule=definition.schedule,
                     )
                 )
+                if definition.active:
+                    self.queue.push(
+                        JobDefinitionTask(
+                            job_definition_id=definition.job_definition_id,
+                            next_run_time=next_run_time,
+                        )
+                    )
 
     def add_job_definition(self, job_definition_id: str):
         with self.db_session() as session:
@@ -232,60 +247,72 @@ class TaskRunner(BaseTaskRunner):
 
         next_run_time = self.compute_next_run_time(definition.schedule, definition.timezone)
 
-        self.cache.put(
-            DescribeJobDefinitionCache(
-                job_definition_id=definition.job_definition_id,
-                active=definition.active,
-                next_run_time=next_run_time,
-                timezone=definition.timezone,
-                schedule=definition.schedule,
-            )
-        )
-        if definition.active:
-            self.queue.push(
-                JobDefinitionTask(
-                    job_definition_id=definition.job_definition_id, next_run_time=next_run_time
+        with self.lock:
+            self.cache.put(
+                DescribeJobDefinitionCache(
+                    job_definition_id=definition.job_definition_id,
+                    active=definition.active,
+                    next_run_time=next_run_time,
+                    timezone=definition.timezone,
+                    schedule=definition.schedule,
                 )
             )
+            if definition.active:
+                self.queue.push(
+                    JobDefinitionTask(
+                        job_definition_id=definition.job_definition_id, next_run_time=next_run_time
+                    )
+                )
 
     def update_job_definition(self, job_definition_id: str, model: UpdateJobDefinition):
-        cache = self.cache.get(job_definition_id)
-        schedule = model.schedule or cache.schedule
-        timezone = model.timezone or cache.timezone
-        active = model.active if model.active is not None else cache.active
-        cached_next_run_time = cache.next_run_time
-        next_run_time = self.compute_next_run_time(schedule, timezone)
-
-        self.cache.update(
-            job_definition_id,
-            UpdateJobDefinitionCache(
-                timezone=timezone, next_run_time=next_run_time, active=active, schedule=schedule
-            ),
-        )
+        with self.lock:
+            cache = self.cache.get(job_definition_id)
+            schedule = model.schedule or cache.schedule
+            timezone = model.timezone or cache.timezone
+            active = model.active if model.active is not None else cache.active
+            cached_next_run_time = cache.next_run_time
+            next_run_time = self.compute_next_run_time(schedule, timezone)
+
+            self.cache.update(
+                job_definition_id,
+                UpdateJobDefinitionCache(
+                    timezone=timezone, next_run_time=next_run_time, active=active, schedule=schedule
+                ),
+            )
 
-        next_run_time_changed = cached_next_run_time != next_run_time and active
-        resumed_job = model.active and not cache.active
+            next_run_time_changed = cached_next_run_time != next_run_time and active
+            resumed_job = model.active and not cache.active
 
-        if next_run_time_changed or resumed_job:
-            self.log.debug("Updating queue...")
-            task = JobDefinitionTask(
-                job_definition_id=job_definition_id, next_run_time=next_run_time
-            )
-            self.queue.push(task)
-            self.log.debug(f"Updated queue, {task}")
+            if next_run_time_changed or resumed_job:
+                self.log.debug("Updating queue...")
+                task = JobDefinitionTask(
+                    job_definition_id=job_definition_id, next_run_time=next_run_time
+                )
+                self.queue.push(task)
+                self.log.debug(f"Updated queue, {task}")
 
     def delete_job_definition(self, job_definition_id: str):
-        self.cache.delete(job_definition_id)
+        with self.lock:
+            self.cache.delete(job_definition_id)
+
+    def call_scheduler(self, func, *args):
+        """Calls a scheduler method from the thread that processes the queue,
+        the coroutine methods of an async scheduler run on the event loop
+        """
+        if inspect.iscoroutinefunction(func):
+            return asyncio.run_coroutine_threadsafe(func(*args), self.loop).result()
+        return func(*args)
 
     def create_job(self, job_definition_id: str):
-        definition = self.scheduler.get_job_definition(job_definition_id)
+        definition = self.call_scheduler(self.scheduler.get_job_definition, job_definition_id)
         if definition and definition.active:
             input_uri = self.scheduler.get_staging_paths(definition)["input"]
-            self.scheduler.create_job(
+            self.call_scheduler(
+                self.scheduler.create_job,
                 CreateJob(
                     **definition.dict(exclude={"schedule", "timezone"}, exclude_none=True),
                     input_uri=input_uri,
-                )
+                ),
             )
 
     def compute_time_diff(self, queue_run_time: int, timezone: str):
@@ -294,33 +321,38 @@ class TaskRunner(BaseTaskRunner):
 
     def process_queue(self):
         self.log.debug(self.queue)
-        while not self.queue.isempty():
-            task = self.queue.peek()
-            cache = self.cache.get(task.job_definition_id)
+        while True:
+            with self.lock:
+                if self.queue.isempty():
+                    break
+                task = self.queue.peek()
+                cache = self.cache.get(task.job_definition_id)
 
-            if not cache:
-                self.queue.pop()
-                continue
+                if not cache:
+                    self.queue.pop()
+                    continue
 
-            cache_run_time = cache.next_run_time
-            queue_run_time = task.next_run_time
+                cache_run_time = cache.next_run_time
+                queue_run_time = task.next_run_time
 
-            if not cache.active or queue_run_time != cache_run_time:
-                self.queue.pop()
-                continue
-
-            time_diff = self.compute_time_diff(queue_run_time, cache.timezone)
-
-            # if run time is in future
-            if time_diff < 0:
-                break
-            else:
-                try:
-                    self.create_job(task.job_definition_id)
-                except Exception as e:
-                    self.log.exception(e)
+                if not cache.active or queue_run_time != cache_run_time:
+                    self.queue.pop()
+                    continue
+
+                time_diff = self.compute_time_diff(queue_run_time, cache.timezone)
+
+                # if run time is in future
+                if time_diff < 0:
+                    break
                 self.queue.pop()
-                run_time = self.compute_next_run_time(cache.schedule, cache.timezone)
+
+            # Jobs are created without holding the lock, handlers can update the queue meanwhile
+            try:
+                self.create_job(task.job_definition_id)
+            except Exception as e:
+                self.log.exception(e)
+            run_time = self.compute_next_run_time(cache.schedule, cache.timezone)
+            with self.lock:
                 self.cache.update(
                     task.job_definition_id, UpdateJobDefinitionCache(next_run_time=run_time)
                 )
@@ -331,7 +363,8 @@ class TaskRunner(BaseTaskRunner):
                 )
 
     async def start(self):
-        self.populate_cache()
+        self.loop = asyncio.get_running_loop()
+        await self.loop.run_in_executor(None, self.populate_cache)
         while True:
-            self.process_queue()
+            await self.loop.run_in_executor(None, self.process_queue)
             await asyncio.sleep(self.poll_interval)
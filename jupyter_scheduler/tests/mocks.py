@@ -24,6 +24,17 @@ class MockExecutionManager(ExecutionManager):
         }
 
 
+class MockDatabaseWriterExecutionManager(ExecutionManager):
+    """Writes to the job record repeatedly to simulate the database load of a running job"""
+
+    def execute(self):
+        for i in range(10):
+            self.update_job({"packaged_files": [f"file_{i}.txt"]})
+
+    def supported_features(cls) -> Dict[JobFeature, bool]:
+        return {}
+
+
 class MockEnvironmentManager(EnvironmentManager):
     def list_environments(self) -> List[RuntimeEnvironment]:
         file_extensions = ["ipynb"]
@@ -0,0 +1,102 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+from jupyter_scheduler.archive import (
+    add_file,
+    copy_member,
+    extract_members,
+    index_path,
+    read_index,
+    write_index,
+)
+from jupyter_scheduler.job_files_manager import Downloader
+
+FILES = {
+    "helloworld-1.html": b"<html>hello world</html>",
+    "helloworld.ipynb": b"{}",
+    "side-effect.csv": os.urandom(64 * 1024),
+}
+
+
+@pytest.fixture(params=["tar.gz", "tar"])
+def archive(request, tmp_path):
+    """Archive of the staging directory of a job, with the member index written on creation"""
+    staging_dir = tmp_path / "staging" / "job-1"
+    staging_dir.mkdir(parents=True)
+    for name, content in FILES.items():
+        (staging_dir / name).write_bytes(content)
+
+    archive_format = request.param
+    archive_path = str(staging_dir / f"helloworld.{archive_format}")
+    fh = io.BytesIO()
+    index = {}
+    with tarfile.open(fileobj=fh, mode="w:gz" if archive_format == "tar.gz" else "w") as tar:
+        for name in FILES:
+            add_file(tar, str(staging_dir / name), name, index)
+    with open(archive_path, "wb") as f:
+        f.write(fh.getvalue())
+    write_index(archive_path, index)
+
+    return archive_format, archive_path
+
+
+def test_copy_member(archive, tmp_path):
+    archive_format, archive_path = archive
+    index = read_index(archive_path)
+
+    for name, content in FILES.items():
+        destination = tmp_path / "output" / name
+        copy_member(archive_path, name, str(destination), index, archive_format == "tar.gz", 4096)
+        assert content == destination.read_bytes()
+
+
+def test_extract_members(archive, tmp_path):
+    archive_format, archive_path = archive
+    index = read_index(archive_path)
+    os.remove(index_path(archive_path))
+    output_dir = tmp_path / "output"
+
+    extracted = extract_members(
+        archive_path, str(output_dir), ["helloworld-1.html"], archive_format == "tar.gz"
+    )
+
+    assert ["helloworld-1.html"] == extracted
+    assert ["helloworld-1.html"] == os.listdir(output_dir)
+    # Reading stopped before the end of the archive
+    assert read_index(archive_path) is None
+
+    extracted = extract_members(
+        archive_path, str(output_dir), compressed=archive_format == "tar.gz"
+    )
+
+    assert list(FILES) == extracted
+    assert index == read_index(archive_path)
+
+
+@pytest.mark.parametrize("extract_all_files", [True, False])
+def test_downloader_lazy_extraction(archive, tmp_path, extract_all_files):
+    archive_format, archive_path = archive
+    staging_dir = os.path.dirname(archive_path)
+    output_dir = tmp_path / "output"
+    downloader = Downloader(
+        output_formats=["html"],
+        output_filenames={"html": "helloworld-1.html", "input": "helloworld.ipynb"},
+        staging_paths={
+            archive_format: archive_path,
+            "html": os.path.join(staging_dir, "helloworld-1.html"),
+            "input": os.path.join(staging_dir, "helloworld.ipynb"),
+        },
+        output_dir=str(output_dir),
+        redownload=False,
+        extract_all_files=extract_all_files,
+    )
+
+    downloader.download()
+
+    expected_files = list(FILES) if extract_all_files else ["helloworld-1.html", "helloworld.ipynb"]
+    assert sorted(expected_files) == sorted(os.listdir(output_dir))
+    for name in expected_files:
+        assert FILES[name] == (output_dir / name).read_bytes()
@@ -1,11 +1,14 @@
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Tuple
 
 import pytest
 
 from jupyter_scheduler.executors import DefaultExecutionManager
+from jupyter_scheduler.models import Status
 from jupyter_scheduler.orm import Job
+from jupyter_scheduler.tests.mocks import MockDatabaseWriterExecutionManager
 
 
 @pytest.fixture
@@ -58,3 +61,29 @@ def test_add_side_effects_files(
 
     job = jp_scheduler_db.query(Job).filter(Job.job_id == job_id).one()
     assert side_effect_file_name in job.packaged_files
+
+
+def test_concurrent_execution_managers(jp_scheduler_db_url, jp_scheduler_root_dir, jp_scheduler_db):
+    jobs = [Job(runtime_environment_name="abc", input_filename="input.ipynb") for _ in range(30)]
+    jp_scheduler_db.add_all(jobs)
+    jp_scheduler_db.commit()
+    job_ids = [job.job_id for job in jobs]
+
+    managers = [
+        MockDatabaseWriterExecutionManager(
+            job_id=job_id,
+            root_dir=str(jp_scheduler_root_dir),
+            db_url=jp_scheduler_db_url,
+            staging_paths={},
+        )
+        for job_id in job_ids
+    ]
+    with ThreadPoolExecutor(max_workers=len(managers)) as executor:
+        for future in [executor.submit(manager.process) for manager in managers]:
+            future.result()
+
+    jp_scheduler_db.expire_all()
+    for job_id in job_ids:
+        job = jp_scheduler_db.get(Job, job_id)
+        assert Status.COMPLETED == job.status
+        assert ["file_9.txt"] == job.packaged_files
@@ -1,4 +1,6 @@
+import asyncio
 import json
+import threading
 from unittest.mock import patch
 
 import pytest
@@ -11,7 +13,10 @@ from jupyter_scheduler.exceptions import (
 )
 from jupyter_scheduler.handlers import compute_sort_model
 from jupyter_scheduler.models import (
+    CountJobsByStatusQuery,
     CountJobsQuery,
+    CreateJob,
+    CreateJobResult,
     DescribeJob,
     ListJobsQuery,
     ListJobsResponse,
@@ -112,6 +117,30 @@ async def test_post_jobs_for_unexpected_error(jp_fetch):
         assert expected_http_error(e, 500, "Unexpected error occurred during creation of job.")
 
 
+async def test_post_batch_jobs(jp_fetch):
+    job = {
+        "name": "job_a",
+        "input_uri": "notebook_a.ipynb",
+        "runtime_environment_name": "env_a",
+    }
+    payload = [job, {"name": "job_b"}, job]
+    with patch("jupyter_scheduler.scheduler.Scheduler.create_jobs") as mock_create_jobs:
+        mock_create_jobs.return_value = [
+            CreateJobResult(job_id="job-1"),
+            CreateJobResult(error="Input path 'notebook_a.ipynb' does not exist."),
+        ]
+        response = await jp_fetch(
+            "scheduler", "batch", "jobs", method="POST", body=json.dumps(payload)
+        )
+
+        mock_create_jobs.assert_called_once_with([CreateJob(**job), CreateJob(**job)])
+        assert response.code == 200
+        results = json.loads(response.body)["results"]
+        assert {"job_id": "job-1"} == results[0]
+        assert "input_uri" in results[1]["error"]
+        assert {"error": "Input path 'notebook_a.ipynb' does not exist."} == results[2]
+
+
 async def test_get_jobs_for_single_job(jp_fetch):
     with patch("jupyter_scheduler.scheduler.Scheduler.get_job") as mock_get_job:
         job_id = "542e0fac-1274-4a78-8340-a850bdb559c8"
@@ -239,6 +268,69 @@ async def test_get_jobs(jp_fetch, params, list_query, jobs_list):
         assert actual_job["name"] == expected_job["name"]
 
 
+async def test_get_jobs_fields(jp_fetch):
+    job = DescribeJob.construct(
+        _fields_set={"job_id", "name", "status"},
+        job_id="542e0fac-1274-4a78-8340-a850bdb559c8",
+        name="job_a",
+        status=Status.COMPLETED,
+    )
+    with patch("jupyter_scheduler.scheduler.Scheduler.list_jobs") as mock_list_jobs:
+        mock_list_jobs.return_value = ListJobsResponse(jobs=[job], total_count=1)
+        response = await jp_fetch(
+            "scheduler", "jobs", method="GET", params=[("fields", "name"), ("fields", "status")]
+        )
+
+        mock_list_jobs.assert_called_once_with(ListJobsQuery(tags=[], fields=["name", "status"]))
+        assert {
+            "jobs": [
+                {
+                    "job_id": "542e0fac-1274-4a78-8340-a850bdb559c8",
+                    "name": "job_a",
+                    "status": "COMPLETED",
+                }
+            ],
+            "total_count": 1,
+        } == json.loads(response.body)
+
+
+async def test_list_jobs_not_blocked_by_create_job(jp_fetch):
+    create_started = threading.Event()
+    release_create = threading.Event()
+
+    def blocked_create_job(model):
+        create_started.set()
+        # Times out instead of hanging the test if the handler blocks the event loop
+        release_create.wait(timeout=10)
+        return "542e0fac-1274-4a78-8340-a850bdb559c8"
+
+    payload = {
+        "input_uri": "notebook_a.ipynb",
+        "runtime_environment_name": "env_a",
+        "name": "job_a",
+    }
+    with patch("jupyter_scheduler.scheduler.Scheduler.create_job") as mock_create_job:
+        with patch("jupyter_scheduler.scheduler.Scheduler.list_jobs") as mock_list_jobs:
+            mock_create_job.side_effect = blocked_create_job
+            mock_list_jobs.return_value = ListJobsResponse(jobs=[], total_count=0)
+
+            create = asyncio.ensure_future(
+                jp_fetch("scheduler", "jobs", method="POST", body=json.dumps(payload))
+            )
+            try:
+                assert await asyncio.get_running_loop().run_in_executor(
+                    None, create_started.wait, 10
+                )
+                responses = await asyncio.gather(*[jp_fetch("scheduler", "jobs") for _ in range(5)])
+
+                # The list requests finished while create_job was still blocked
+                assert not create.done()
+                assert all(response.code == 200 for response in responses)
+            finally:
+                release_create.set()
+            assert (await create).code == 200
+
+
 async def test_get_job_for_scheduler_error(jp_fetch):
     with patch("jupyter_scheduler.scheduler.Scheduler.get_job") as mock_get_job:
         mock_get_job.side_effect = SchedulerError("Scheduler error")
@@ -411,16 +503,69 @@ async def test_delete_job_for_unexpected_error(jp_fetch):
 
 
 async def test_batch_delete(jp_fetch):
-    with patch("jupyter_scheduler.scheduler.Scheduler.delete_job") as mock_delete_job:
+    with patch("jupyter_scheduler.scheduler.Scheduler.delete_jobs") as mock_delete_jobs:
         job_id = "542e0fac-1274-4a78-8340-a850bdb559c8"
         response = await jp_fetch(
             "scheduler", "batch", "jobs", method="DELETE", params={"job_id": job_id}
         )
 
-        mock_delete_job.assert_called_once_with(job_id)
+        mock_delete_jobs.assert_called_once_with([job_id])
         assert response.code == 204
 
 
+async def test_batch_stop(jp_fetch):
+    with patch("jupyter_scheduler.scheduler.Scheduler.stop_jobs") as mock_stop_jobs:
+        response = await jp_fetch(
+            "scheduler",
+            "batch",
+            "jobs",
+            "stop",
+            method="POST",
+            body="",
+            params=[("job_id", "job-a"), ("job_id", "job-b")],
+        )
+
+        mock_stop_jobs.assert_called_once_with(["job-a", "job-b"])
+        assert response.code == 204
+
+
+async def test_download_files_wait(jp_fetch):
+    with patch(
+        "jupyter_scheduler.job_files_manager.JobFilesManager.wait_for_download"
+    ) as mock_wait_for_download:
+        response = await jp_fetch(
+            "scheduler",
+            "jobs",
+            "542e0fac-1274-4a78-8340-a850bdb559c8",
+            "download_files",
+            method="GET",
+            params={"wait": "true"},
+        )
+
+        mock_wait_for_download.assert_called_once_with(
+            job_id="542e0fac-1274-4a78-8340-a850bdb559c8", redownload=False, all_files=False
+        )
+        assert response.code == 204
+
+
+async def test_download_files_status(jp_fetch):
+    job_id = "542e0fac-1274-4a78-8340-a850bdb559c8"
+    with patch(
+        "jupyter_scheduler.job_files_manager.JobFilesManager.download_status"
+    ) as mock_download_status:
+        mock_download_status.return_value = Status.IN_PROGRESS
+        response = await jp_fetch("scheduler", "jobs", job_id, "download_files", "status")
+
+        mock_download_status.assert_called_once_with(job_id)
+        assert response.code == 200
+        assert {"status": "IN_PROGRESS"} == json.loads(response.body)
+
+        mock_download_status.return_value = None
+        with pytest.raises(HTTPClientError) as e:
+            await jp_fetch("scheduler", "jobs", job_id, "download_files", "status")
+        assert expected_http_error(e, 404)
+
+
 async def test_jobs_count(jp_fetch):
     with patch("jupyter_scheduler.scheduler.Scheduler.count_jobs") as mock_count_jobs:
         mock_count_jobs.return_value = 10
@@ -434,6 +579,23 @@ async def test_jobs_count(jp_fetch):
         assert {"count": 10} == body
 
 
+async def test_jobs_count_by_status(jp_fetch):
+    with patch("jupyter_scheduler.scheduler.Scheduler.count_jobs_by_status") as mock_count:
+        mock_count.return_value = {Status.IN_PROGRESS: 2, Status.COMPLETED: 5}
+        response = await jp_fetch(
+            "scheduler",
+            "jobs",
+            "count_by_status",
+            method="GET",
+            params={"job_definition_id": "definition-a", "create_time_start": "10"},
+        )
+
+        mock_count.assert_called_once_with(
+            CountJobsByStatusQuery(job_definition_id="definition-a", create_time_start=10)
+        )
+        assert {"counts": {"IN_PROGRESS": 2, "COMPLETED": 5}} == json.loads(response.body)
+
+
 async def test_list_runtime_environments(jp_fetch):
     response = await jp_fetch("scheduler", "runtime_environments", method="GET")
 
@@ -677,3 +839,30 @@ async def test_delete_job_definition_for_unexpected_error(jp_fetch):
         assert expected_http_error(
             e, 500, "Unexpected error occurred while deleting the job definition."
         )
+
+
+async def test_export_and_import_job_definitions(jp_fetch):
+    definitions = [
+        {
+            "job_definition_id": f"definition-{i}",
+            "name": f"definition {i}",
+            "input_filename": "helloworld.ipynb",
+            "runtime_environment_name": "environment-a",
+            "tags": ["a"],
+        }
+        for i in range(3)
+    ]
+    body = "".join(json.dumps(definition) + "\n" for definition in definitions)
+    response = await jp_fetch("scheduler", "job_definitions", "import", method="POST", body=body)
+    assert {"count": 3} == json.loads(response.body)
+
+    response = await jp_fetch("scheduler", "job_definitions", "export")
+    assert "application/x-ndjson" == response.headers["Content-Type"]
+    exported = [json.loads(line) for line in response.body.decode().splitlines()]
+    assert definitions == [
+        {key: definition[key] for key in definitions[0]} for definition in exported
+    ]
+
+    with pytest.raises(HTTPClientError) as e:
+        await jp_fetch("scheduler", "job_definitions", "import", method="POST", body=body)
+    assert e.value.code == 500
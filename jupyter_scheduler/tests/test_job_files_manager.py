@@ -1,15 +1,19 @@
+import asyncio
 import filecmp
 import os
 import shutil
 import tarfile
+import threading
 import time
+from functools import partial
 from pathlib import Path
+from unittest import mock
 from unittest.mock import patch
 
 import pytest
 
 from jupyter_scheduler.job_files_manager import Downloader, JobFilesManager
-from jupyter_scheduler.models import DescribeJob, JobFile
+from jupyter_scheduler.models import DescribeJob, JobFile, Status
 
 
 async def test_copy_from_staging():
@@ -41,23 +45,148 @@ async def test_copy_from_staging():
     }
     output_dir = "jobs/1"
     with patch("jupyter_scheduler.job_files_manager.Downloader") as mock_downloader:
-        with patch("jupyter_scheduler.job_files_manager.Process") as mock_process:
-            with patch("jupyter_scheduler.scheduler.Scheduler") as mock_scheduler:
-                mock_scheduler.get_job.return_value = job
-                mock_scheduler.get_staging_paths.return_value = staging_paths
-                mock_scheduler.get_local_output_path.return_value = output_dir
-                mock_scheduler.get_job_filenames.return_value = job_filenames
-                manager = JobFilesManager(scheduler=mock_scheduler)
-                await manager.copy_from_staging(1)
-
-                mock_downloader.assert_called_once_with(
-                    output_formats=job.output_formats,
-                    output_filenames=job_filenames,
-                    staging_paths=staging_paths,
-                    output_dir=output_dir,
-                    redownload=False,
-                    include_staging_files=None,
-                )
+        with patch("jupyter_scheduler.scheduler.Scheduler") as mock_scheduler:
+            mock_scheduler.get_job.return_value = job
+            mock_scheduler.get_staging_paths.return_value = staging_paths
+            mock_scheduler.get_local_output_path.return_value = output_dir
+            mock_scheduler.get_job_filenames.return_value = job_filenames
+            mock_scheduler.copy_buffer_size = 4096
+            mock_scheduler.staging_concurrency = 4
+            mock_scheduler.max_concurrent_downloads = 2
+            mock_scheduler.lazy_archive_extraction = False
+            manager = JobFilesManager(scheduler=mock_scheduler)
+            await manager.wait_for_download(1)
+
+            mock_downloader.assert_called_once_with(
+                output_formats=job.output_formats,
+                output_filenames=job_filenames,
+                staging_paths=staging_paths,
+                output_dir=output_dir,
+                redownload=False,
+                include_staging_files=None,
+                buffer_size=4096,
+                concurrency=4,
+                extract_all_files=True,
+            )
+            mock_downloader.return_value.download.assert_called_once_with()
+            assert Status.COMPLETED == manager.download_status(1)
+
+
+async def test_copy_from_staging_is_single_flight():
+    started = threading.Event()
+    release = threading.Event()
+
+    def download():
+        started.set()
+        release.wait(5)
+
+    with patch("jupyter_scheduler.job_files_manager.Downloader") as mock_downloader:
+        with patch("jupyter_scheduler.scheduler.Scheduler") as mock_scheduler:
+            mock_scheduler.max_concurrent_downloads = 2
+            mock_downloader.return_value.download.side_effect = download
+            manager = JobFilesManager(scheduler=mock_scheduler)
+
+            first = await manager.copy_from_staging("1")
+            started.wait(5)
+            second = await manager.copy_from_staging("1")
+
+            assert first is second
+            assert Status.IN_PROGRESS == manager.download_status("1")
+            release.set()
+            await asyncio.wrap_future(first)
+
+            mock_downloader.assert_called_once()
+            assert Status.COMPLETED == manager.download_status("1")
+            assert manager.download_status("2") is None
+
+
+async def test_copy_from_staging_redownload_after_pending_download():
+    release = threading.Event()
+    calls = []
+
+    def download(redownload):
+        calls.append(("start", redownload))
+        if not redownload:
+            release.wait(5)
+        calls.append(("end", redownload))
+
+    def create_downloader(**kwargs):
+        downloader = mock.MagicMock()
+        downloader.download.side_effect = partial(download, kwargs["redownload"])
+        return downloader
+
+    with patch("jupyter_scheduler.job_files_manager.Downloader") as mock_downloader:
+        with patch("jupyter_scheduler.scheduler.Scheduler") as mock_scheduler:
+            mock_scheduler.max_concurrent_downloads = 2
+            mock_downloader.side_effect = create_downloader
+            manager = JobFilesManager(scheduler=mock_scheduler)
+
+            first = await manager.copy_from_staging("1")
+            second = await manager.copy_from_staging("1", redownload=True)
+            # A download that overwrites the files is not joined by a later request
+            assert second is await manager.copy_from_staging("1")
+
+            assert first is not second
+            assert not second.done()
+            release.set()
+            await asyncio.wrap_future(second)
+
+            assert calls == [("start", False), ("end", False), ("start", True), ("end", True)]
+            assert Status.COMPLETED == manager.download_status("1")
+
+
+async def test_copy_from_staging_all_files_after_selective_extraction():
+    release = threading.Event()
+    extracted = []
+
+    def download(extract_all_files):
+        if not extract_all_files:
+            release.wait(5)
+        extracted.append(extract_all_files)
+
+    def create_downloader(**kwargs):
+        downloader = mock.MagicMock()
+        downloader.download.side_effect = partial(download, kwargs["extract_all_files"])
+        return downloader
+
+    with patch("jupyter_scheduler.job_files_manager.Downloader") as mock_downloader:
+        with patch("jupyter_scheduler.scheduler.Scheduler") as mock_scheduler:
+            mock_scheduler.max_concurrent_downloads = 2
+            mock_scheduler.lazy_archive_extraction = True
+            mock_downloader.side_effect = create_downloader
+            manager = JobFilesManager(scheduler=mock_scheduler)
+
+            selective = await manager.copy_from_staging("1")
+            all_files = await manager.copy_from_staging("1", all_files=True)
+            # The extraction of all files also extracts the selected ones
+            assert all_files is await manager.copy_from_staging("1")
+
+            assert selective is not all_files
+            release.set()
+            await asyncio.wrap_future(all_files)
+
+            assert extracted == [False, True]
+            assert [False, True] == [
+                call.kwargs["extract_all_files"] for call in mock_downloader.call_args_list
+            ]
+
+
+async def test_copy_from_staging_logs_download_error():
+    with patch("jupyter_scheduler.job_files_manager.Downloader") as mock_downloader:
+        with patch("jupyter_scheduler.scheduler.Scheduler") as mock_scheduler:
+            mock_scheduler.max_concurrent_downloads = 2
+            error = OSError("No space left on device")
+            mock_downloader.return_value.download.side_effect = error
+            manager = JobFilesManager(scheduler=mock_scheduler)
+
+            future = await manager.copy_from_staging("1")
+            with pytest.raises(OSError):
+                await asyncio.wrap_future(future)
+
+            assert Status.FAILED == manager.download_status("1")
+            mock_scheduler.log.error.assert_called_once_with(
+                "Failed to download the files of job 1", exc_info=error
+            )
 
 
 @pytest.fixture
@@ -0,0 +1,104 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from jupyter_scheduler.kernel_pool import (
+    KernelPool,
+    configure_kernel_pool,
+    get_kernel_pool,
+)
+from jupyter_scheduler.tests.utils import wait_for
+from jupyter_scheduler.workers import WorkerPool
+
+
+def mock_kernel_manager_factory(language="python"):
+    def factory(kernel_name):
+        km = MagicMock()
+        km.kernel_spec.language = language
+        km.is_alive.return_value = True
+        return km
+
+    return factory
+
+
+def acquire_kernels():
+    """Acquires and releases two kernels in the kernel pool of a worker"""
+    kernel_pool = get_kernel_pool()
+    kernel_pool.kernel_manager_factory = mock_kernel_manager_factory()
+    for cwd in ["/job-1", "/job-2"]:
+        kernel_pool.release(kernel_pool.acquire("python3", cwd=cwd))
+
+
+@pytest.fixture
+def kernel_pool():
+    return KernelPool(size=1, kernel_manager_factory=mock_kernel_manager_factory())
+
+
+def test_acquire_reuses_released_kernel(kernel_pool):
+    kernel = kernel_pool.acquire("python3", cwd="/job-1")
+    kernel_pool.release(kernel)
+    reused_kernel = kernel_pool.acquire("python3", cwd="/job-2")
+
+    assert reused_kernel is kernel
+    kernel.km.restart_kernel.assert_called_once_with(now=True)
+    kernel.km.client.return_value.execute_interactive.assert_called_once()
+    assert "/job-2" in kernel.km.client.return_value.execute_interactive.call_args[0][0]
+    assert kernel_pool.stats() == {"hits": 1, "misses": 1, "idle": 0}
+
+
+def test_acquire_is_keyed_by_kernel_name(kernel_pool):
+    kernel = kernel_pool.acquire("python3", cwd="/job-1")
+    kernel_pool.release(kernel)
+    other_kernel = kernel_pool.acquire("other", cwd="/job-2")
+
+    assert other_kernel is not kernel
+    assert kernel_pool.stats() == {"hits": 0, "misses": 2, "idle": 1}
+
+
+def test_release_discards_kernel_after_max_uses():
+    kernel_pool = KernelPool(
+        size=1, max_uses=1, kernel_manager_factory=mock_kernel_manager_factory()
+    )
+    kernel = kernel_pool.acquire("python3", cwd="/job-1")
+    kernel_pool.release(kernel)
+
+    kernel.km.shutdown_kernel.assert_called_once_with(now=True)
+    assert kernel_pool.stats()["idle"] == 0
+
+
+def test_release_discards_kernel_for_unsupported_language():
+    kernel_pool = KernelPool(size=1, kernel_manager_factory=mock_kernel_manager_factory("r"))
+    kernel = kernel_pool.acquire("ir", cwd="/job-1")
+    kernel_pool.release(kernel)
+
+    kernel.km.shutdown_kernel.assert_called_once_with(now=True)
+    assert kernel_pool.stats()["idle"] == 0
+
+
+def test_evict_idle_kernels():
+    kernel_pool = KernelPool(
+        size=1, idle_ttl=60, kernel_manager_factory=mock_kernel_manager_factory()
+    )
+    kernel = kernel_pool.acquire("python3", cwd="/job-1")
+    kernel_pool.release(kernel)
+    kernel.last_used -= 120
+    kernel_pool.evict_idle()
+
+    kernel.km.shutdown_kernel.assert_called_once_with(now=True)
+    assert kernel_pool.stats()["idle"] == 0
+
+
+def test_worker_pool_reports_kernel_pool_stats():
+    pool = WorkerPool(
+        size=1, preload_modules=["json"], initializer=configure_kernel_pool, initargs=(1,)
+    )
+    try:
+        wait_for(pool.submit(acquire_kernels))
+        wait_for(pool.submit(acquire_kernels))
+
+        assert {"kernel_pool_hits": 3, "kernel_pool_misses": 1} == pool.stats()
+    finally:
+        pool.shutdown(timeout=30)
+
+    # The counters of the workers are kept after they exit
+    assert {"kernel_pool_hits": 3, "kernel_pool_misses": 1} == pool.stats()
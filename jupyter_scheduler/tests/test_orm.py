@@ -1,14 +1,25 @@
 from typing import Type
+from unittest.mock import MagicMock, patch
 
 import pytest
-from sqlalchemy import Column, Integer, String, inspect
+from sqlalchemy import Column, Index, Integer, String, insert, inspect, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import DeclarativeMeta, sessionmaker
 
 from jupyter_scheduler.orm import (
+    Job,
+    JobTag,
+    create_async_session,
     create_session,
     create_tables,
     declarative_base,
+    dispose_engines,
     generate_uuid,
+    get_async_db_url,
+    get_async_engine,
+    get_engine,
+    get_pool_stats,
+    retry_on_db_lock,
 )
 
 
@@ -71,3 +82,174 @@ def test_create_tables_with_new_column(jp_scheduler_db_url, initial_db, updated_
     assert hasattr(updated_job, "new_column")
     assert updated_job.runtime_environment_name == "abc"
     assert updated_job.input_filename == "input.ipynb"
+
+
+def test_get_engine_is_shared(jp_scheduler_db_url):
+    engine = get_engine(jp_scheduler_db_url)
+    assert engine is get_engine(jp_scheduler_db_url)
+    assert engine is create_session(jp_scheduler_db_url)().bind
+
+    with create_session(jp_scheduler_db_url)() as session:
+        session.execute(text("SELECT 1"))
+    with create_session(jp_scheduler_db_url)() as session:
+        session.execute(text("SELECT 1"))
+
+    stats = get_pool_stats(jp_scheduler_db_url)
+    assert 1 == stats["connections_created"]
+    assert 1 == stats["checkedin"]
+    assert 0 == stats["checkedout"]
+
+    dispose_engines()
+    assert {} == get_pool_stats(jp_scheduler_db_url)
+
+
+async def test_async_engine_is_shared_and_disposed(jp_scheduler_db_url):
+    pytest.importorskip("aiosqlite")
+    engine = get_async_engine(jp_scheduler_db_url)
+    assert engine is create_async_session(jp_scheduler_db_url).kw["bind"]
+    assert engine is not get_engine(jp_scheduler_db_url)
+
+    async with create_async_session(jp_scheduler_db_url)() as session:
+        assert 30000 == await session.scalar(text("PRAGMA busy_timeout"))
+    async with create_async_session(jp_scheduler_db_url)() as session:
+        await session.execute(text("SELECT 1"))
+
+    async_db_url = get_async_db_url(jp_scheduler_db_url)
+    assert 1 == get_pool_stats(async_db_url)["connections_created"]
+
+    dispose_engines()
+    assert {} == get_pool_stats(async_db_url)
+    assert engine is not get_async_engine(jp_scheduler_db_url)
+    dispose_engines()
+
+
+def test_get_engine_in_child_process(jp_scheduler_db_url):
+    engine = get_engine(jp_scheduler_db_url)
+    with patch("jupyter_scheduler.orm.os.getpid", return_value=-1):
+        child_engine = get_engine(jp_scheduler_db_url)
+
+    assert child_engine is not engine
+    dispose_engines()
+
+
+def test_sqlite_pragmas(jp_scheduler_db_url):
+    with get_engine(jp_scheduler_db_url).connect() as connection:
+        assert "wal" == connection.execute(text("PRAGMA journal_mode")).scalar()
+        assert 30000 == connection.execute(text("PRAGMA busy_timeout")).scalar()
+        # NORMAL
+        assert 1 == connection.execute(text("PRAGMA synchronous")).scalar()
+    dispose_engines()
+
+
+def test_retry_on_db_lock():
+    locked = OperationalError("UPDATE jobs", {}, Exception("database is locked"))
+    func = MagicMock(side_effect=[locked, locked, "updated"])
+    with patch("jupyter_scheduler.orm.time.sleep") as mock_sleep:
+        assert "updated" == retry_on_db_lock(func, retries=2)
+    assert 3 == func.call_count
+    assert 2 == mock_sleep.call_count
+
+    func = MagicMock(side_effect=locked)
+    with patch("jupyter_scheduler.orm.time.sleep"), pytest.raises(OperationalError):
+        retry_on_db_lock(func, retries=2)
+    assert 3 == func.call_count
+
+    func = MagicMock(side_effect=OperationalError("UPDATE jobs", {}, Exception("disk I/O error")))
+    with pytest.raises(OperationalError):
+        retry_on_db_lock(func)
+    assert 1 == func.call_count
+
+
+def test_create_tables_with_new_index(jp_scheduler_db_url, initial_db):
+    TestBase, Session, initial_job_id = initial_db
+
+    class MockIndexedJob(TestBase):
+        __tablename__ = "jobs"
+        __table_args__ = (
+            Index("ix_jobs_new_column", "new_column"),
+            {"extend_existing": True},
+        )
+        job_id = Column(String(36), primary_key=True, default=generate_uuid)
+        runtime_environment_name = Column(String(256), nullable=False)
+        input_filename = Column(String(256), nullable=False)
+        new_column = Column("new_column", Integer)
+
+    create_tables(db_url=jp_scheduler_db_url, Base=TestBase)
+
+    session = Session()
+    indexes = inspect(session.bind).get_indexes("jobs")
+    assert [{"name": "ix_jobs_new_column", "column_names": ["new_column"]}] == [
+        {"name": index["name"], "column_names": index["column_names"]} for index in indexes
+    ]
+    session.close()
+
+
+def test_create_tables_backfills_tags(jp_scheduler_db_url):
+    create_tables(db_url=jp_scheduler_db_url)
+    engine = get_engine(jp_scheduler_db_url)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Job),
+            [
+                {
+                    "job_id": "job-1",
+                    "runtime_environment_name": "a",
+                    "input_filename": "a.ipynb",
+                    "tags": ["x", "y"],
+                },
+                {
+                    "job_id": "job-2",
+                    "runtime_environment_name": "a",
+                    "input_filename": "a.ipynb",
+                    "tags": None,
+                },
+            ],
+        )
+        JobTag.__table__.drop(connection)
+
+    create_tables(db_url=jp_scheduler_db_url)
+
+    with create_session(jp_scheduler_db_url)() as session:
+        tags = session.query(JobTag.job_id, JobTag.tag).order_by(JobTag.tag).all()
+    assert [("job-1", "x"), ("job-1", "y")] == tags
+    dispose_engines()
+
+
+def test_create_tables_clears_duplicate_idempotency_tokens(jp_scheduler_db_url, caplog):
+    create_tables(db_url=jp_scheduler_db_url)
+    engine = get_engine(jp_scheduler_db_url)
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ux_jobs_idempotency_token"))
+        connection.execute(
+            insert(Job),
+            [
+                {
+                    "job_id": f"job-{i}",
+                    "runtime_environment_name": "a",
+                    "input_filename": "a.ipynb",
+                    "idempotency_token": token,
+                    "create_time": create_time,
+                }
+                for i, (token, create_time) in enumerate(
+                    [("a", 3), ("a", 4), ("b", 1), (None, 2), ("a", 2)]
+                )
+            ],
+        )
+
+    create_tables(db_url=jp_scheduler_db_url)
+
+    index_names = {index["name"] for index in inspect(engine).get_indexes("jobs")}
+    assert "ux_jobs_idempotency_token" in index_names
+    with create_session(jp_scheduler_db_url)() as session:
+        tokens = session.query(Job.job_id, Job.idempotency_token).order_by(Job.job_id).all()
+    # The token is kept on the most recent job
+    assert [
+        ("job-0", None),
+        ("job-1", "a"),
+        ("job-2", "b"),
+        ("job-3", None),
+        ("job-4", None),
+    ] == tokens
+    assert "Cleared the idempotency token of 2 jobs" in caplog.text
+    assert "Duplicated tokens: a." in caplog.text
+    dispose_engines()
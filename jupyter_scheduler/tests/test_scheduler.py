@@ -1,21 +1,44 @@
 """Tests for scheduler"""
 
+import asyncio
+import os
 import shutil
+import threading
 from pathlib import Path
 from unittest import mock
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
+from sqlalchemy import event
 
+from jupyter_scheduler.exceptions import (
+    IdempotencyTokenError,
+    InputFolderTooLargeError,
+    SchedulerError,
+)
 from jupyter_scheduler.models import (
+    DEFAULT_SORT,
+    CountJobsByStatusQuery,
+    CountJobsQuery,
+    CountMode,
     CreateJob,
     CreateJobDefinition,
+    DescribeJob,
+    EmailNotifications,
     ListJobDefinitionsQuery,
+    ListJobsQuery,
     SortDirection,
     SortField,
+    Status,
     UpdateJobDefinition,
 )
-from jupyter_scheduler.orm import Job, JobDefinition
+from jupyter_scheduler.orm import Job, JobDefinition, JobDefinitionTag, JobTag
+from jupyter_scheduler.pagination import encode_next_token
+from jupyter_scheduler.retention import StagingUsage
+from jupyter_scheduler.scheduler import AsyncScheduler, Scheduler
+from jupyter_scheduler.staging_store import STORE_DIRNAME
+from jupyter_scheduler.tests.mocks import MockEnvironmentManager
+from jupyter_scheduler.utils import RecentTokens, get_utc_timestamp
 
 
 @pytest.fixture
@@ -33,7 +56,7 @@ def root_dir_with_input_folder(static_test_files_dir, jp_scheduler_root_dir):
 
 
 def test_create_job_definition(jp_scheduler):
-    with patch("jupyter_scheduler.scheduler.fsspec") as mock_fsspec:
+    with patch("jupyter_scheduler.scheduler.copy_file") as mock_copy_file:
         with patch("jupyter_scheduler.scheduler.Scheduler.file_exists") as mock_file_exists:
             mock_file_exists.return_value = True
             job_definition_id = jp_scheduler.create_job_definition(
@@ -99,6 +122,226 @@ def test_create_job_with_input_folder(jp_scheduler, root_dir_with_input_folder):
         assert "a/b/helloworld.txt" in job.packaged_files
 
 
+def test_create_jobs(jp_scheduler, root_dir_with_input_folder):
+    def create_job(**kwargs):
+        return CreateJob(
+            input_uri=str(root_dir_with_input_folder),
+            runtime_environment_name="default",
+            output_formats=["ipynb"],
+            package_input_folder=True,
+            **kwargs,
+        )
+
+    models = [
+        create_job(name="job 1", idempotency_token="token-1"),
+        create_job(name="job 2"),
+        CreateJob(input_uri="missing.ipynb", runtime_environment_name="default", name="job 3"),
+        create_job(name="job 4", idempotency_token="token-1"),
+    ]
+    with patch.object(
+        jp_scheduler, "copy_input_folder", wraps=jp_scheduler.copy_input_folder
+    ) as mock_copy_input_folder:
+        with patch.object(jp_scheduler, "start_job_process", return_value=1234):
+            results = jp_scheduler.create_jobs(models)
+
+    assert [bool(result.job_id) for result in results] == [True, True, False, False]
+    assert "missing.ipynb" in results[2].error
+    assert "token-1" in results[3].error
+    # The input folder is read once for both jobs
+    assert mock_copy_input_folder.call_count == 1
+
+    with jp_scheduler.db_session() as session:
+        jobs = session.query(Job).order_by(Job.name).all()
+        assert ["job 1", "job 2"] == [job.name for job in jobs]
+        for job, result in zip(jobs, results):
+            assert result.job_id == job.job_id
+            assert 1234 == job.pid
+            assert "a/b/helloworld.txt" in job.packaged_files
+            staging_paths = jp_scheduler.get_staging_paths(DescribeJob.from_orm(job))
+            assert os.path.isfile(staging_paths["input"])
+
+
+def test_create_jobs_token_conflict_at_flush(
+    jp_scheduler, jp_scheduler_db, root_dir_with_notebook, tmp_path
+):
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    models = [
+        CreateJob(
+            input_uri=root_dir_with_notebook,
+            runtime_environment_name="default",
+            name=f"job {i}",
+            idempotency_token=token,
+        )
+        for i, token in enumerate(["token-1", None, "token-2"])
+    ]
+
+    def create_conflicting_job(session, flush_context, instances):
+        # Another server creates a job with token-2 after the tokens were checked
+        jp_scheduler_db.add(
+            Job(
+                job_id="other-job",
+                name="other job",
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                idempotency_token="token-2",
+            )
+        )
+        jp_scheduler_db.commit()
+
+    event.listen(jp_scheduler.db_session, "before_flush", create_conflicting_job, once=True)
+    with patch.object(jp_scheduler, "start_job_process", return_value=1234):
+        results = jp_scheduler.create_jobs(models)
+
+    assert results[0].job_id and results[1].job_id
+    assert not results[0].error and not results[1].error
+    assert not results[2].job_id
+    assert str(IdempotencyTokenError("token-2")) == results[2].error
+    jp_scheduler_db.expire_all()
+    assert ["job 0", "job 1", "other job"] == [
+        job.name for job in jp_scheduler_db.query(Job).order_by(Job.name)
+    ]
+
+
+def test_create_jobs_statement_count(jp_scheduler, root_dir_with_notebook, tmp_path):
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    engine = jp_scheduler.db_session.kw["bind"]
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def create_jobs(count: int) -> int:
+        statements.clear()
+        models = [
+            CreateJob(
+                input_uri=root_dir_with_notebook,
+                runtime_environment_name="default",
+                name=f"job {i}",
+                idempotency_token=f"{count}-{i}",
+            )
+            for i in range(count)
+        ]
+        with patch.object(jp_scheduler, "start_job_process", return_value=1234):
+            results = jp_scheduler.create_jobs(models)
+        assert all(result.job_id for result in results)
+        return len(statements)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        # The number of statements does not grow with the number of jobs
+        assert create_jobs(2) == create_jobs(50)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    with jp_scheduler.db_session() as session:
+        assert 52 == session.query(Job).filter(Job.pid == 1234).count()
+
+
+def test_create_jobs_with_content_addressed_staging(
+    jp_scheduler, root_dir_with_input_folder, tmp_path
+):
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    jp_scheduler.content_addressed_staging = True
+    model = CreateJob(
+        input_uri=str(root_dir_with_input_folder),
+        runtime_environment_name="default",
+        name="import hello world",
+        output_formats=["ipynb"],
+        package_input_folder=True,
+    )
+    with patch.object(jp_scheduler, "start_job_process", return_value=1234):
+        job_ids = [jp_scheduler.create_job(model) for _ in range(2)]
+
+    staged_files = [
+        os.path.join(jp_scheduler.staging_path, job_id, "a", "b", "helloworld.txt")
+        for job_id in job_ids
+    ]
+    assert os.path.samefile(*staged_files)
+
+    jp_scheduler.delete_jobs_where(Job.job_id.in_(job_ids)).result()
+
+    blobs_dir = Path(jp_scheduler.staging_path) / ".store" / "blobs"
+    assert [] == [path for path in blobs_dir.rglob("*") if path.is_file()]
+
+
+def test_create_jobs_with_input_folder_too_large(
+    jp_scheduler, root_dir_with_input_folder, tmp_path
+):
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    jp_scheduler.input_folder_max_bytes = 1
+    model = CreateJob(
+        input_uri=str(root_dir_with_input_folder),
+        runtime_environment_name="default",
+        name="import hello world",
+        output_formats=["ipynb"],
+        package_input_folder=True,
+    )
+    with patch.object(jp_scheduler, "start_job_process", return_value=1234):
+        results = jp_scheduler.create_jobs([model])
+
+    input_dir = os.path.join(jp_scheduler.root_dir, root_dir_with_input_folder.parent)
+    assert str(InputFolderTooLargeError(input_dir, 1)) == results[0].error
+    assert results[0].job_id is None
+    with jp_scheduler.db_session() as session:
+        assert 0 == session.query(Job).count()
+
+
+@pytest.mark.parametrize(
+    "create, model_class, orm_class",
+    [("create_job", CreateJob, Job), ("create_job_definition", CreateJobDefinition, JobDefinition)],
+)
+def test_create_with_input_folder_too_large(
+    jp_scheduler, root_dir_with_input_folder, tmp_path, create, model_class, orm_class
+):
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    jp_scheduler.input_folder_max_bytes = 10
+    model = model_class(
+        input_uri=str(root_dir_with_input_folder),
+        runtime_environment_name="default",
+        name="import hello world",
+        output_formats=["ipynb"],
+        package_input_folder=True,
+        schedule="* * * * *",
+    )
+    with patch.object(jp_scheduler, "start_job_process", return_value=1234):
+        with pytest.raises(InputFolderTooLargeError):
+            getattr(jp_scheduler, create)(model)
+
+    with jp_scheduler.db_session() as session:
+        assert 0 == session.query(orm_class).count()
+    jp_scheduler._cleanup_executor.submit(lambda: None).result()
+    assert [] == list(Path(jp_scheduler.staging_path).glob("*"))
+
+
+def test_update_job_definition_refreshes_input_folder(
+    jp_scheduler, root_dir_with_input_folder, jp_scheduler_root_dir, tmp_path
+):
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    jp_scheduler.input_folder_exclude_files = ["*.log"]
+    job_definition_id = jp_scheduler.create_job_definition(
+        CreateJobDefinition(
+            input_uri=str(root_dir_with_input_folder),
+            runtime_environment_name="default",
+            name="import hello world",
+            output_formats=["ipynb"],
+            package_input_folder=True,
+        )
+    )
+    input_dir = jp_scheduler_root_dir / root_dir_with_input_folder.parent
+    (input_dir / "data.csv").write_text("a,b")
+    (input_dir / "run.log").write_text("log")
+
+    with patch("jupyter_scheduler.scheduler.Scheduler.task_runner"):
+        jp_scheduler.update_job_definition(
+            job_definition_id,
+            UpdateJobDefinition(input_uri=str(root_dir_with_input_folder), schedule="0 * * * *"),
+        )
+
+    with jp_scheduler.db_session() as session:
+        definition = session.get(JobDefinition, job_definition_id)
+        assert ["a/b/helloworld.txt", "data.csv"] == sorted(definition.packaged_files)
+
+
 job_definition_1 = {
     "job_definition_id": "f4f8c8a9-f539-429a-b69e-b567f578646e",
     "name": "hello world 1",
@@ -172,7 +415,9 @@ def load_job_definitions(jp_scheduler_db):
             {
                 "job_definitions": [job_definition_3, job_definition_2],
                 "total_count": 3,
-                "next_token": "2",
+                "next_token": encode_next_token(
+                    [DEFAULT_SORT], [2, job_definition_2["job_definition_id"]]
+                ),
             },
         ),
         (
@@ -187,6 +432,99 @@ def test_list_job_definitions(jp_scheduler, load_job_definitions, list_query, ex
     assert expected_response == response
 
 
+@pytest.mark.parametrize(
+    "sort_by",
+    [
+        [SortField(name="create_time", direction=SortDirection.desc)],
+        [SortField(name="name", direction=SortDirection.asc)],
+        [
+            SortField(name="schedule", direction=SortDirection.desc),
+            SortField(name="create_time", direction=SortDirection.asc),
+        ],
+        [SortField(name="tags", direction=SortDirection.asc)],
+    ],
+)
+def test_list_job_definitions_pages(jp_scheduler, jp_scheduler_db, sort_by):
+    for i in range(7):
+        jp_scheduler_db.add(
+            JobDefinition(
+                **{
+                    **job_definition_1,
+                    "job_definition_id": f"definition-{i}",
+                    "name": f"definition {i % 3}",
+                    "schedule": None if i % 2 else "* * * * *",
+                    "create_time": i % 4,
+                    "tags": None if i % 3 else [str(i)],
+                }
+            )
+        )
+    jp_scheduler_db.commit()
+
+    query = ListJobDefinitionsQuery(sort_by=sort_by, max_items=None)
+    expected_ids = [
+        definition.job_definition_id
+        for definition in jp_scheduler.list_job_definitions(query).job_definitions
+    ]
+
+    ids, next_token = [], None
+    while True:
+        query = ListJobDefinitionsQuery(sort_by=sort_by, max_items=2, next_token=next_token)
+        list_response = jp_scheduler.list_job_definitions(query)
+        ids.extend(definition.job_definition_id for definition in list_response.job_definitions)
+        next_token = list_response.next_token
+        if not next_token:
+            break
+        # Rows added after the first page do not shift later pages
+        jp_scheduler_db.add(
+            JobDefinition(
+                **{
+                    **job_definition_1,
+                    "job_definition_id": f"new-definition-{len(ids)}",
+                    "name": "a",
+                    "create_time": 100,
+                }
+            )
+        )
+        jp_scheduler_db.commit()
+
+    assert 7 == len(expected_ids)
+    assert expected_ids == [id for id in ids if not id.startswith("new-")]
+
+
+def test_list_job_definitions_invalid_token(jp_scheduler, load_job_definitions):
+    list_response = jp_scheduler.list_job_definitions(ListJobDefinitionsQuery(max_items=1))
+    sort_by = [SortField(name="name", direction=SortDirection.asc)]
+
+    with pytest.raises(SchedulerError):
+        jp_scheduler.list_job_definitions(
+            ListJobDefinitionsQuery(sort_by=sort_by, next_token=list_response.next_token)
+        )
+    with pytest.raises(SchedulerError):
+        jp_scheduler.list_job_definitions(ListJobDefinitionsQuery(next_token="not-a-token"))
+
+
+def test_list_job_definitions_count_mode(jp_scheduler, jp_scheduler_db, load_job_definitions):
+    def total_count(count_mode, max_items=2, **kwargs):
+        query = ListJobDefinitionsQuery(max_items=max_items, count_mode=count_mode, **kwargs)
+        return jp_scheduler.list_job_definitions(query).total_count
+
+    assert 3 == total_count(CountMode.estimated)
+    assert total_count(CountMode.none) is None
+
+    jp_scheduler_db.add(JobDefinition(**{**job_definition_1, "job_definition_id": "definition-4"}))
+    jp_scheduler_db.commit()
+
+    assert 3 == total_count(CountMode.estimated)
+    assert 4 == total_count(CountMode.exact)
+    assert 4 == total_count(CountMode.estimated)
+    assert 2 == total_count(CountMode.estimated, name="hello world 1")
+
+    # A first page that holds all rows is counted without a count query
+    with patch("jupyter_scheduler.scheduler.count_statement") as mock_count_statement:
+        assert 4 == total_count(CountMode.exact, max_items=10)
+        mock_count_statement.assert_not_called()
+
+
 def test_get_job_definition(jp_scheduler, load_job_definitions):
     definition = jp_scheduler.get_job_definition(job_definition_1["job_definition_id"])
     assert job_definition_1 == definition.dict(exclude_none=True)
@@ -240,3 +578,863 @@ def test_delete_job_definition(jp_scheduler, load_job_definitions, jp_scheduler_
     jp_scheduler.delete_job_definition(job_definition_id)
     definition = jp_scheduler_db.get(JobDefinition, job_definition_id)
     assert not definition
+
+
+@pytest.fixture
+def root_dir_with_notebook(static_test_files_dir, jp_scheduler_root_dir):
+    shutil.copy2(static_test_files_dir / "helloworld.ipynb", jp_scheduler_root_dir)
+    return "helloworld.ipynb"
+
+
+def test_create_job_with_used_idempotency_token(jp_scheduler, root_dir_with_notebook):
+    model = CreateJob(
+        input_uri=root_dir_with_notebook,
+        runtime_environment_name="default",
+        name="job a",
+        output_formats=["ipynb"],
+        idempotency_token="token-a",
+    )
+    with patch.object(jp_scheduler, "start_job_process", return_value=1234):
+        jp_scheduler.create_job(model)
+
+        # Rejected by the recent tokens, then by the unique index of tokens
+        with patch.object(
+            Scheduler, "db_session", new_callable=mock.PropertyMock
+        ) as mock_db_session:
+            with pytest.raises(IdempotencyTokenError):
+                jp_scheduler.create_job(model)
+            mock_db_session.assert_not_called()
+
+        jp_scheduler.recent_tokens = RecentTokens(ttl=0)
+        with pytest.raises(IdempotencyTokenError):
+            jp_scheduler.create_job(model)
+
+    with jp_scheduler.db_session() as session:
+        assert 1 == session.query(Job).count()
+
+
+def test_create_job_queues_above_concurrency_limit(jp_scheduler, root_dir_with_notebook):
+    jp_scheduler.max_concurrent_jobs = 1
+    with patch("jupyter_scheduler.scheduler.mp") as mock_mp:
+        process = mock_mp.get_context.return_value.Process.return_value
+        process.pid = 1234
+        process.is_alive.return_value = True
+
+        job_ids = [
+            jp_scheduler.create_job(
+                CreateJob(
+                    input_uri=root_dir_with_notebook,
+                    runtime_environment_name="default",
+                    name=f"job {i}",
+                )
+            )
+            for i in range(2)
+        ]
+
+        with jp_scheduler.db_session() as session:
+            first, second = [session.get(Job, job_id) for job_id in job_ids]
+            assert first.status == Status.IN_PROGRESS
+            assert first.pid == 1234
+            assert second.status == Status.QUEUED
+            assert second.pid is None
+
+        process.is_alive.return_value = False
+        jp_scheduler.dispatch_queued_jobs()
+
+        with jp_scheduler.db_session() as session:
+            second = session.get(Job, job_ids[1])
+            assert second.status == Status.IN_PROGRESS
+            assert second.pid == 1234
+
+
+def test_create_job_reaps_exited_processes_without_limit(jp_scheduler, root_dir_with_notebook):
+    with patch("jupyter_scheduler.scheduler.mp") as mock_mp:
+        process = mock_mp.get_context.return_value.Process.return_value
+        process.pid = 1234
+        process.is_alive.return_value = False
+
+        for i in range(3):
+            jp_scheduler.create_job(
+                CreateJob(
+                    input_uri=root_dir_with_notebook,
+                    runtime_environment_name="default",
+                    name=f"job {i}",
+                )
+            )
+
+    # The processes of the previous jobs exited, only the last one is tracked
+    assert 1 == len(jp_scheduler._processes)
+
+
+def test_queued_jobs_dispatched_after_restart(jp_scheduler, jp_scheduler_db, jp_scheduler_db_url):
+    jp_scheduler_db.add(
+        Job(
+            job_id="queued-job",
+            name="queued job",
+            runtime_environment_name="default",
+            input_filename="helloworld.ipynb",
+            status=Status.QUEUED,
+            output_formats=[],
+        )
+    )
+    jp_scheduler_db.commit()
+
+    restarted_scheduler = Scheduler(
+        db_url=jp_scheduler_db_url,
+        root_dir=jp_scheduler.root_dir,
+        environments_manager=jp_scheduler.environments_manager,
+        max_concurrent_jobs=2,
+    )
+    with patch("jupyter_scheduler.scheduler.mp") as mock_mp:
+        mock_mp.get_context.return_value.Process.return_value.pid = 5678
+        restarted_scheduler.dispatch_queued_jobs()
+
+    jp_scheduler_db.expire_all()
+    job = jp_scheduler_db.get(Job, "queued-job")
+    assert job.status == Status.IN_PROGRESS
+    assert job.pid == 5678
+
+
+async def test_queued_jobs_dispatched_once_at_start_without_limit(jp_scheduler, jp_scheduler_db):
+    jp_scheduler_db.add(
+        Job(
+            job_id="queued-job",
+            name="queued job",
+            runtime_environment_name="default",
+            input_filename="helloworld.ipynb",
+            status=Status.QUEUED,
+            output_formats=[],
+        )
+    )
+    jp_scheduler_db.commit()
+
+    with patch("jupyter_scheduler.scheduler.mp") as mock_mp:
+        mock_mp.get_context.return_value.Process.return_value.pid = 5678
+        # Returns after one dispatch instead of polling
+        await asyncio.wait_for(jp_scheduler.start_job_queue(), timeout=10)
+
+    jp_scheduler_db.expire_all()
+    job = jp_scheduler_db.get(Job, "queued-job")
+    assert job.status == Status.IN_PROGRESS
+    assert job.pid == 5678
+
+
+def test_dispatch_skips_compute_types_without_free_slot(jp_scheduler, jp_scheduler_db):
+    jp_scheduler.max_concurrent_jobs = 2
+    jp_scheduler.max_concurrent_jobs_per_compute_type = {"gpu": 1}
+    running = mock.MagicMock()
+    running.is_alive.return_value = True
+    jp_scheduler._processes["running-job"] = (running, "gpu")
+    for create_time, (job_id, compute_type) in enumerate(
+        [("gpu-job-1", "gpu"), ("gpu-job-2", "gpu"), ("cpu-job", "cpu")]
+    ):
+        jp_scheduler_db.add(
+            Job(
+                job_id=job_id,
+                name=job_id,
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                status=Status.QUEUED,
+                compute_type=compute_type,
+                create_time=create_time,
+                output_formats=[],
+            )
+        )
+    jp_scheduler_db.commit()
+
+    with patch("jupyter_scheduler.scheduler.mp") as mock_mp:
+        process = mock_mp.get_context.return_value.Process.return_value
+        process.pid = 1234
+        process.is_alive.return_value = True
+        jp_scheduler.dispatch_queued_jobs()
+
+    jp_scheduler_db.expire_all()
+    statuses = {
+        job.job_id: job.status
+        for job in jp_scheduler_db.query(Job).filter(Job.job_id != "running-job")
+    }
+    assert statuses == {
+        "gpu-job-1": Status.QUEUED,
+        "gpu-job-2": Status.QUEUED,
+        "cpu-job": Status.IN_PROGRESS,
+    }
+
+
+def test_per_compute_type_concurrency_limit(jp_scheduler):
+    jp_scheduler.max_concurrent_jobs_per_compute_type = {"gpu": 1}
+    process = mock.MagicMock()
+    process.is_alive.return_value = True
+    jp_scheduler._processes["job-1"] = (process, "gpu")
+
+    assert not jp_scheduler.has_free_slot("gpu")
+    assert jp_scheduler.has_free_slot("cpu")
+    assert jp_scheduler.has_free_slot()
+
+
+def test_stop_queued_job(jp_scheduler, jp_scheduler_db):
+    jp_scheduler_db.add(
+        Job(
+            job_id="queued-job",
+            name="queued job",
+            runtime_environment_name="default",
+            input_filename="helloworld.ipynb",
+            status=Status.QUEUED,
+        )
+    )
+    jp_scheduler_db.commit()
+
+    jp_scheduler.stop_job("queued-job")
+
+    jp_scheduler_db.expire_all()
+    assert jp_scheduler_db.get(Job, "queued-job").status == Status.STOPPED
+
+
+def add_jobs_to_delete(jp_scheduler, jp_scheduler_db, tmp_path):
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    statuses = [Status.COMPLETED, Status.QUEUED, Status.IN_PROGRESS]
+    for i, status in enumerate(statuses):
+        jp_scheduler_db.add(
+            Job(
+                job_id=f"job-{i}",
+                name=f"job {i}",
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                job_definition_id="definition-a" if i else None,
+                status=status,
+                pid=1000 + i,
+                tags=["a"],
+            )
+        )
+        staging_dir = Path(jp_scheduler.staging_path) / f"job-{i}"
+        staging_dir.mkdir(parents=True)
+        (staging_dir / "helloworld.ipynb").write_text("{}")
+    jp_scheduler_db.commit()
+
+
+def test_stop_jobs(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_jobs_to_delete(jp_scheduler, jp_scheduler_db, tmp_path)
+    running_process = mock.Mock(pid=1002)
+    other_process = mock.Mock(pid=4242)
+    with patch("jupyter_scheduler.scheduler.psutil.Process") as mock_process:
+        mock_process.return_value.children.return_value = [other_process, running_process]
+        jp_scheduler.stop_jobs(["job-0", "job-1", "job-2"])
+
+    running_process.kill.assert_called_once()
+    other_process.kill.assert_not_called()
+    jp_scheduler_db.expire_all()
+    statuses = [jp_scheduler_db.get(Job, f"job-{i}").status for i in range(3)]
+    assert [Status.COMPLETED, Status.STOPPED, Status.STOPPED] == statuses
+
+
+def test_delete_jobs(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_jobs_to_delete(jp_scheduler, jp_scheduler_db, tmp_path)
+    running_process = mock.Mock(pid=1002)
+    with patch("jupyter_scheduler.scheduler.psutil.Process") as mock_process:
+        mock_process.return_value.children.return_value = [running_process]
+        jp_scheduler.delete_jobs_where(Job.job_id.in_(["job-0", "job-2"])).result()
+
+    running_process.kill.assert_called_once()
+    jp_scheduler_db.expire_all()
+    assert ["job-1"] == [job.job_id for job in jp_scheduler_db.query(Job)]
+    assert ["job-1"] == [tag.job_id for tag in jp_scheduler_db.query(JobTag)]
+    staging_path = Path(jp_scheduler.staging_path)
+    assert ["job-1"] == sorted(path.name for path in staging_path.iterdir())
+
+
+def test_delete_job_definition_deletes_jobs(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_jobs_to_delete(jp_scheduler, jp_scheduler_db, tmp_path)
+    with patch("jupyter_scheduler.scheduler.psutil.Process"):
+        with patch.object(jp_scheduler, "remove_staging_directories") as mock_remove:
+            jp_scheduler.delete_job_definition("definition-a")
+
+    jp_scheduler_db.expire_all()
+    assert ["job-0"] == [job.job_id for job in jp_scheduler_db.query(Job)]
+    mock_remove.assert_called_once_with(
+        [os.path.join(jp_scheduler.staging_path, job_id) for job_id in ["job-1", "job-2"]]
+    )
+
+
+def add_retention_jobs(jp_scheduler, jp_scheduler_db, tmp_path):
+    """Adds 4 jobs of 2 definitions, one per hour, ending with the most recent one"""
+    jp_scheduler.staging_path = str(tmp_path / "staging")
+    now = get_utc_timestamp()
+    jobs = [
+        ("job-0", "definition-a", Status.FAILED),
+        ("job-1", "definition-a", Status.COMPLETED),
+        ("job-2", "definition-b", Status.COMPLETED),
+        ("job-3", "definition-a", Status.IN_PROGRESS),
+    ]
+    for i, (job_id, job_definition_id, status) in enumerate(jobs):
+        jp_scheduler_db.add(
+            Job(
+                job_id=job_id,
+                name=job_id,
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                job_definition_id=job_definition_id,
+                status=status,
+                create_time=now - (len(jobs) - i) * 3600 * 1000,
+            )
+        )
+        staging_dir = Path(jp_scheduler.staging_path) / job_id
+        staging_dir.mkdir(parents=True)
+        (staging_dir / "helloworld.ipynb").write_bytes(b"x" * 100)
+    jp_scheduler_db.commit()
+
+
+def remaining_job_ids(jp_scheduler_db):
+    jp_scheduler_db.expire_all()
+    return [job.job_id for job in jp_scheduler_db.query(Job).order_by(Job.job_id)]
+
+
+def test_apply_retention_max_age(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_retention_jobs(jp_scheduler, jp_scheduler_db, tmp_path)
+    jp_scheduler.retention_max_age = 2.5 * 3600
+    jp_scheduler.retention_keep_failures = 1
+    jp_scheduler.retention_batch_size = 1
+
+    report = jp_scheduler.apply_retention()
+
+    assert 1 == report.deleted_jobs
+    assert 100 == report.reclaimed_bytes
+    assert ["job-0", "job-2", "job-3"] == remaining_job_ids(jp_scheduler_db)
+    assert not (Path(jp_scheduler.staging_path) / "job-1").exists()
+
+
+def test_apply_retention_max_jobs_per_definition(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_retention_jobs(jp_scheduler, jp_scheduler_db, tmp_path)
+    jp_scheduler.retention_max_jobs_per_definition = 1
+
+    report = jp_scheduler.apply_retention()
+
+    # The running job is the most recent of definition-a
+    assert 2 == report.deleted_jobs
+    assert ["job-2", "job-3"] == remaining_job_ids(jp_scheduler_db)
+
+
+def test_apply_retention_max_staging_bytes(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_retention_jobs(jp_scheduler, jp_scheduler_db, tmp_path)
+    jp_scheduler.retention_max_staging_bytes = 250
+
+    report = jp_scheduler.apply_retention()
+
+    assert 2 == report.deleted_jobs
+    assert 200 == report.reclaimed_bytes
+    assert ["job-2", "job-3"] == remaining_job_ids(jp_scheduler_db)
+
+    # Nothing is deleted when the staging area is below the limit
+    assert 0 == jp_scheduler.apply_retention().deleted_jobs
+
+
+def test_apply_retention_max_staging_bytes_linked_files(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_retention_jobs(jp_scheduler, jp_scheduler_db, tmp_path)
+    staging_path = Path(jp_scheduler.staging_path)
+    # Each input is linked from the content-addressed store, job-0 and job-1 also
+    # share a second file with the running job-3
+    (staging_path / STORE_DIRNAME).mkdir()
+    (staging_path / STORE_DIRNAME / "shared").write_bytes(b"y" * 1000)
+    for job_id in ["job-0", "job-1", "job-2", "job-3"]:
+        notebook = staging_path / job_id / "helloworld.ipynb"
+        os.link(notebook, staging_path / STORE_DIRNAME / job_id)
+        if job_id != "job-2":
+            os.link(staging_path / STORE_DIRNAME / "shared", staging_path / job_id / "shared")
+    jp_scheduler.retention_max_staging_bytes = 1250
+
+    report = jp_scheduler.apply_retention()
+
+    # The staging area holds 1400 bytes, deleting job-0 and job-1 frees their inputs
+    # only, the shared file is still linked from job-3
+    assert 2 == report.deleted_jobs
+    assert 200 == report.reclaimed_bytes
+    assert ["job-2", "job-3"] == remaining_job_ids(jp_scheduler_db)
+
+
+def test_apply_retention_max_staging_bytes_nothing_to_free(jp_scheduler, jp_scheduler_db, tmp_path):
+    add_retention_jobs(jp_scheduler, jp_scheduler_db, tmp_path)
+    staging_path = Path(jp_scheduler.staging_path)
+    # A directory that is not a job, and inputs of job-0 and job-1 linked from outside
+    (staging_path / "other").mkdir()
+    (staging_path / "other" / "data.csv").write_bytes(b"z" * 1000)
+    (tmp_path / "elsewhere").mkdir()
+    for job_id in ["job-0", "job-1"]:
+        os.link(staging_path / job_id / "helloworld.ipynb", tmp_path / "elsewhere" / job_id)
+    jp_scheduler.retention_max_staging_bytes = 250
+    # Batches of jobs that free nothing are skipped
+    jp_scheduler.retention_batch_size = 1
+
+    report = jp_scheduler.apply_retention()
+
+    # Only job-2 frees space, the jobs whose directories free nothing are kept
+    assert 1 == report.deleted_jobs
+    assert 100 == report.reclaimed_bytes
+    assert ["job-0", "job-1", "job-3"] == remaining_job_ids(jp_scheduler_db)
+
+    assert 0 == jp_scheduler.apply_retention().deleted_jobs
+    assert ["job-0", "job-1", "job-3"] == remaining_job_ids(jp_scheduler_db)
+
+
+def test_staging_usage_measures_unfinished_jobs(tmp_path):
+    staging_dir = tmp_path / "job-1"
+    staging_dir.mkdir()
+    (staging_dir / "output").mkdir()
+    usage = StagingUsage()
+    assert 0 == usage.sizes(str(tmp_path), ["job-2"]).directories["job-1"]
+
+    # Files written in a subdirectory do not change the modification time of the job directory
+    (staging_dir / "output" / "helloworld.ipynb").write_bytes(b"x" * 100)
+
+    assert 100 == usage.sizes(str(tmp_path), ["job-2"]).total
+
+
+def query_plan(jp_scheduler, statement) -> str:
+    engine = jp_scheduler.db_session.kw["bind"]
+    compiled = statement.compile(engine)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_name_filter_uses_index(jp_scheduler, jp_scheduler_db):
+    # Case-insensitive prefix matches are answered with the NOCASE name indexes
+    statement = jp_scheduler.list_jobs_statement(ListJobsQuery(name="Hello"))
+    assert "USING INDEX ix_jobs_name" in query_plan(jp_scheduler, statement)
+
+    statement = jp_scheduler.list_job_definitions_statement(ListJobDefinitionsQuery(name="Hello"))
+    assert "USING INDEX ix_job_definitions_name" in query_plan(jp_scheduler, statement)
+
+
+def test_list_jobs_job_files(jp_scheduler, jp_scheduler_db):
+    for i in range(3):
+        jp_scheduler_db.add(
+            Job(
+                job_id=f"job-{i}",
+                name=f"job {i}",
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                output_formats=["ipynb", "html"],
+                package_input_folder=True,
+                packaged_files=["data/a.csv", "data/b.csv"],
+                create_time=1,
+            )
+        )
+    jp_scheduler_db.commit()
+
+    job = jp_scheduler.get_job("job-0", job_files=False)
+    output_dir = Path(jp_scheduler.get_local_output_path(job))
+    (output_dir / "data").mkdir(parents=True)
+    for filename in jp_scheduler.get_job_filenames(job).values():
+        for path in filename if isinstance(filename, list) else [filename]:
+            (output_dir / path).touch()
+
+    with patch("os.scandir", wraps=os.scandir) as mock_scandir:
+        jobs = {job.job_id: job for job in jp_scheduler.list_jobs(ListJobsQuery()).jobs}
+    # The output directory of each job, their parent and the packaged data folder
+    assert 5 == mock_scandir.call_count
+
+    assert jobs["job-0"].downloaded
+    assert all(job_file.file_path for job_file in jobs["job-0"].job_files)
+    assert jobs["job-0"] == jp_scheduler.get_job("job-0")
+    assert not jobs["job-1"].downloaded
+    assert not any(job_file.file_path for job_file in jobs["job-1"].job_files)
+
+    for job in jp_scheduler.list_jobs(ListJobsQuery(job_files=False)).jobs:
+        assert not job.job_files
+        assert not job.downloaded
+
+
+def test_list_jobs_fields(jp_scheduler, jp_scheduler_db):
+    for i in range(3):
+        jp_scheduler_db.add(
+            Job(
+                job_id=f"job-{i}",
+                name=f"job {i}",
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                output_formats=["ipynb"],
+                parameters={"a": "1"},
+                status=Status.COMPLETED,
+                create_time=i,
+            )
+        )
+    jp_scheduler_db.commit()
+
+    query = ListJobsQuery(fields=["name", "status"], max_items=2)
+    list_response = jp_scheduler.list_jobs(query)
+    assert [
+        {"job_id": "job-2", "name": "job 2", "status": Status.COMPLETED},
+        {"job_id": "job-1", "name": "job 1", "status": Status.COMPLETED},
+    ] == [job.dict(exclude_unset=True) for job in list_response.jobs]
+
+    query = ListJobsQuery(fields=["name", "status"], next_token=list_response.next_token)
+    assert ["job-0"] == [job.job_id for job in jp_scheduler.list_jobs(query).jobs]
+
+    query = ListJobsQuery(fields=["parameters", "job_files"])
+    for job in jp_scheduler.list_jobs(query).jobs:
+        assert {"job_id", "parameters", "job_files"} == job.__fields_set__
+        assert [None, None] == [job_file.file_path for job_file in job.job_files]
+
+    with pytest.raises(SchedulerError):
+        jp_scheduler.list_jobs(ListJobsQuery(fields=["name", "pid"]))
+
+
+def test_export_and_import_job_definitions(jp_scheduler, jp_scheduler_db, load_job_definitions):
+    jp_scheduler_db.add(
+        JobDefinition(
+            **{
+                **job_definition_1,
+                "job_definition_id": "definition-4",
+                "email_notifications": EmailNotifications(on_failure=["a@b.c"]),
+            }
+        )
+    )
+    jp_scheduler_db.commit()
+    query = ListJobDefinitionsQuery(max_items=None)
+    expected_definitions = jp_scheduler.list_job_definitions(query).job_definitions
+
+    jp_scheduler.export_batch_size = 3
+    chunks = list(jp_scheduler.export_job_definitions())
+    assert [3, 1] == [len(chunk.splitlines()) for chunk in chunks]
+
+    jp_scheduler_db.query(JobDefinition).delete()
+    jp_scheduler_db.commit()
+    assert 4 == jp_scheduler.import_job_definitions("".join(chunks).splitlines())
+
+    assert expected_definitions == jp_scheduler.list_job_definitions(query).job_definitions
+    assert "".join(chunks) == "".join(jp_scheduler.export_job_definitions())
+    assert '"on_failure": ["a@b.c"]' in "".join(chunks)
+    assert [job_definition_2["job_definition_id"]] == [
+        definition.job_definition_id
+        for definition in jp_scheduler.list_job_definitions(
+            ListJobDefinitionsQuery(tags=["tag_2"])
+        ).job_definitions
+    ]
+
+    with pytest.raises(SchedulerError):
+        jp_scheduler.import_job_definitions(chunks[-1].splitlines())
+    with pytest.raises(SchedulerError):
+        jp_scheduler.import_job_definitions(['{"name": "no id"}'])
+    assert 4 == jp_scheduler_db.query(JobDefinition).count()
+
+
+def test_export_and_import_jobs(jp_scheduler, jp_scheduler_db):
+    for i in range(5):
+        jp_scheduler_db.add(
+            Job(
+                job_id=f"job-{i}",
+                name=f"job {i}",
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                output_formats=["ipynb"],
+                parameters={"a": str(i)},
+                tags=[f"tag-{i % 2}"],
+            )
+        )
+    jp_scheduler_db.commit()
+    exported = "".join(jp_scheduler.export_jobs())
+
+    jp_scheduler_db.query(Job).delete()
+    jp_scheduler_db.commit()
+
+    assert 5 == jp_scheduler.import_jobs(exported.splitlines())
+    assert exported == "".join(jp_scheduler.export_jobs())
+    assert ["job-1", "job-3"] == sorted(
+        job.job_id for job in jp_scheduler.list_jobs(ListJobsQuery(tags=["tag-1"])).jobs
+    )
+
+
+def test_count_jobs_by_status(jp_scheduler, jp_scheduler_db):
+    statuses = [Status.COMPLETED, Status.COMPLETED, Status.FAILED, Status.IN_PROGRESS]
+    for i, status in enumerate(statuses):
+        jp_scheduler_db.add(
+            Job(
+                job_id=f"job-{i}",
+                name=f"job {i}",
+                runtime_environment_name="default",
+                input_filename="helloworld.ipynb",
+                job_definition_id="definition-a" if i % 2 else None,
+                status=status,
+                create_time=i,
+            )
+        )
+    jp_scheduler_db.commit()
+
+    counts = jp_scheduler.count_jobs_by_status()
+    assert {Status.COMPLETED: 2, Status.FAILED: 1, Status.IN_PROGRESS: 1} == {
+        status: count for status, count in counts.items() if count
+    }
+    assert set(Status) == set(counts)
+
+    def nonzero_counts(**kwargs):
+        counts = jp_scheduler.count_jobs_by_status(CountJobsByStatusQuery(**kwargs))
+        return {status: count for status, count in counts.items() if count}
+
+    assert {Status.COMPLETED: 1, Status.IN_PROGRESS: 1} == nonzero_counts(
+        job_definition_id="definition-a"
+    )
+    assert {Status.COMPLETED: 1, Status.FAILED: 1} == nonzero_counts(
+        create_time_start=1, create_time_end=3
+    )
+
+
+def test_status_counter_job_finished_without_limit(
+    jp_scheduler, jp_scheduler_db, root_dir_with_notebook
+):
+    with patch("jupyter_scheduler.scheduler.mp") as mock_mp:
+        process = mock_mp.get_context.return_value.Process.return_value
+        process.pid = 1234
+        process.is_alive.return_value = True
+        job_id = jp_scheduler.create_job(
+            CreateJob(
+                input_uri=root_dir_with_notebook, runtime_environment_name="default", name="job"
+            )
+        )
+
+    assert 1 == jp_scheduler.count_jobs_by_status()[Status.IN_PROGRESS]
+
+    # The job process writes the final status and exits, no other job is started
+    jp_scheduler_db.get(Job, job_id).status = Status.COMPLETED
+    jp_scheduler_db.commit()
+    process.is_alive.return_value = False
+
+    counts = jp_scheduler.count_jobs_by_status()
+    assert 0 == counts[Status.IN_PROGRESS]
+    assert 1 == counts[Status.COMPLETED]
+
+
+def test_status_counter(jp_scheduler, jp_scheduler_db):
+    jp_scheduler_db.add(
+        Job(
+            job_id="job-1",
+            name="job 1",
+            runtime_environment_name="default",
+            input_filename="helloworld.ipynb",
+            status=Status.IN_PROGRESS,
+        )
+    )
+    jp_scheduler_db.commit()
+    assert 1 == jp_scheduler.count_jobs(CountJobsQuery())
+
+    # Counts are served from memory once loaded
+    with patch.object(Scheduler, "db_session", side_effect=AssertionError):
+        assert 1 == jp_scheduler.count_jobs(CountJobsQuery())
+
+    def start_job_process(job_id, staging_paths, compute_type=None):
+        process = mock.MagicMock(pid=1234)
+        jp_scheduler._processes[job_id] = (process, compute_type)
+        return process.pid
+
+    # The created job is counted as in progress while its process runs
+    jp_scheduler_db.add(
+        Job(
+            job_id="job-2",
+            name="job 2",
+            runtime_environment_name="default",
+            input_filename="helloworld.ipynb",
+            status=Status.STOPPED,
+        )
+    )
+    jp_scheduler_db.commit()
+    jp_scheduler.status_counter.move(None, Status.STOPPED)
+    with patch.object(jp_scheduler, "start_job_process", side_effect=start_job_process):
+        jp_scheduler.start_counted_job_process("job-2", {})
+    counts = jp_scheduler.count_jobs_by_status()
+    assert 2 == counts[Status.IN_PROGRESS]
+    assert 0 == counts[Status.STOPPED]
+
+    jp_scheduler.status_counter.invalidate()
+    assert counts == jp_scheduler.count_jobs_by_status()
+
+    # The final status is read from the database once the process exits
+    jp_scheduler_db.get(Job, "job-2").status = Status.COMPLETED
+    jp_scheduler_db.commit()
+    jp_scheduler._processes["job-2"][0].is_alive.return_value = False
+    jp_scheduler.reap_job_processes()
+    counts = jp_scheduler.count_jobs_by_status()
+    assert 1 == counts[Status.IN_PROGRESS]
+    assert 1 == counts[Status.COMPLETED]
+
+
+@pytest.fixture
+def jp_async_scheduler(
+    jp_scheduler_db_url, jp_scheduler_root_dir, jp_scheduler_db, jp_asyncio_loop
+):
+    pytest.importorskip("aiosqlite")
+    scheduler = AsyncScheduler(
+        db_url=jp_scheduler_db_url,
+        root_dir=str(jp_scheduler_root_dir),
+        environments_manager=MockEnvironmentManager(),
+    )
+    yield scheduler
+    jp_asyncio_loop.run_until_complete(scheduler.dispose())
+
+
+async def test_async_create_and_get_job(
+    jp_async_scheduler, root_dir_with_notebook, jp_scheduler_db
+):
+    with patch("jupyter_scheduler.scheduler.mp") as mock_mp:
+        mock_mp.get_context.return_value.Process.return_value.pid = 1234
+        job_id = await jp_async_scheduler.create_job(
+            CreateJob(
+                input_uri=root_dir_with_notebook,
+                runtime_environment_name="default",
+                name="hello world",
+            )
+        )
+
+    job = await jp_async_scheduler.get_job(job_id, job_files=False)
+    assert job.job_id == job_id
+    assert job.name == "hello world"
+    assert jp_scheduler_db.get(Job, job_id).pid == 1234
+
+    list_response = await jp_async_scheduler.list_jobs(ListJobsQuery(name="hello"))
+    assert [job_id] == [job.job_id for job in list_response.jobs]
+    assert 1 == list_response.total_count
+
+
+async def test_async_create_job_definition_off_event_loop(
+    jp_async_scheduler, root_dir_with_notebook
+):
+    threads = {}
+
+    def record_thread(name, result=None):
+        def call(*args):
+            threads[name] = threading.get_ident()
+            return result
+
+        return call
+
+    with patch.object(
+        jp_async_scheduler, "file_exists", side_effect=record_thread("file_exists", True)
+    ):
+        with patch.object(
+            jp_async_scheduler.task_runner,
+            "add_job_definition",
+            side_effect=record_thread("add_job_definition"),
+        ):
+            await jp_async_scheduler.create_job_definition(
+                CreateJobDefinition(
+                    input_uri=root_dir_with_notebook,
+                    runtime_environment_name="default",
+                    name="hello world",
+                    output_formats=["ipynb"],
+                    schedule="0 0 * * *",
+                )
+            )
+
+    # The blocking calls ran in the executor instead of on the event loop
+    assert {"file_exists", "add_job_definition"} == set(threads)
+    assert threading.get_ident() not in threads.values()
+
+
+async def test_async_list_job_definitions(jp_async_scheduler, load_job_definitions):
+    query = ListJobDefinitionsQuery(max_items=2)
+    list_response = await jp_async_scheduler.list_job_definitions(query)
+    assert list_response == Scheduler.list_job_definitions(jp_async_scheduler, query)
+    assert 2 == len(list_response.job_definitions)
+    assert list_response.next_token
+
+    definition = await jp_async_scheduler.get_job_definition(job_definition_1["job_definition_id"])
+    assert job_definition_1 == definition.dict(exclude_none=True)
+
+
+async def test_async_update_and_delete_job_definition(
+    jp_async_scheduler, load_job_definitions, jp_scheduler_db
+):
+    job_definition_id = job_definition_2["job_definition_id"]
+    with patch("jupyter_scheduler.scheduler.Scheduler.task_runner"):
+        await jp_async_scheduler.update_job_definition(
+            job_definition_id, UpdateJobDefinition(active=False)
+        )
+        assert not jp_scheduler_db.get(JobDefinition, job_definition_id).active
+
+        await jp_async_scheduler.delete_job_definition(job_definition_id)
+
+    jp_scheduler_db.expire_all()
+    assert not jp_scheduler_db.get(JobDefinition, job_definition_id)
+
+
+async def test_async_task_runner_create_job(jp_async_scheduler, load_job_definitions):
+    task_runner = jp_async_scheduler.task_runner
+    task_runner.loop = asyncio.get_running_loop()
+    job_definition_id = job_definition_1["job_definition_id"]
+
+    staging_paths = {"input": "helloworld_1.ipynb"}
+    with patch.object(jp_async_scheduler, "get_staging_paths", return_value=staging_paths):
+        with patch.object(jp_async_scheduler, "create_job", AsyncMock()) as mock_create_job:
+            # Called from the queue thread, the scheduler coroutines run on the event loop
+            await task_runner.loop.run_in_executor(None, task_runner.create_job, job_definition_id)
+
+    mock_create_job.assert_awaited_once()
+    assert job_definition_id == mock_create_job.await_args.args[0].job_definition_id
+
+
+async def test_async_export_and_import_job_definitions(
+    jp_async_scheduler, load_job_definitions, jp_scheduler_db
+):
+    chunks = [chunk async for chunk in jp_async_scheduler.export_job_definitions()]
+    assert chunks == list(Scheduler.export_job_definitions(jp_async_scheduler))
+
+    jp_scheduler_db.query(JobDefinition).delete()
+    jp_scheduler_db.commit()
+    assert 3 == await jp_async_scheduler.import_job_definitions("".join(chunks).splitlines())
+    assert 2 == jp_scheduler_db.query(JobDefinitionTag).count()
+
+
+def test_list_job_definitions_by_tags(jp_scheduler, jp_scheduler_db):
+    jp_scheduler_db.add(JobDefinition(**{**job_definition_1, "tags": ["abc", "team-a"]}))
+    jp_scheduler_db.add(JobDefinition(**{**job_definition_2, "tags": ["a", "team-a"]}))
+    jp_scheduler_db.commit()
+
+    def list_ids(tags):
+        definitions = jp_scheduler.list_job_definitions(ListJobDefinitionsQuery(tags=tags))
+        return [definition.job_definition_id for definition in definitions.job_definitions]
+
+    assert [job_definition_2["job_definition_id"]] == list_ids(["a"])
+    assert [job_definition_2["job_definition_id"]] == list_ids(["a", "team-a"])
+    assert [] == list_ids(["abc", "a"])
+
+    with patch("jupyter_scheduler.scheduler.Scheduler.task_runner"):
+        jp_scheduler.update_job_definition(
+            job_definition_1["job_definition_id"], UpdateJobDefinition(tags=["a"], schedule="")
+        )
+    assert sorted(
+        [job_definition_1["job_definition_id"], job_definition_2["job_definition_id"]]
+    ) == sorted(list_ids(["a"]))
+
+    jp_scheduler.delete_job_definition(job_definition_2["job_definition_id"])
+    assert (
+        not jp_scheduler_db.query(JobDefinitionTag)
+        .filter(JobDefinitionTag.job_definition_id == job_definition_2["job_definition_id"])
+        .all()
+    )
+
+
+@pytest.mark.parametrize(
+    "create, model_class, orm_class",
+    [("create_job", CreateJob, Job), ("create_job_definition", CreateJobDefinition, JobDefinition)],
+)
+async def test_async_create_with_input_folder_too_large(
+    jp_async_scheduler,
+    root_dir_with_input_folder,
+    jp_scheduler_db,
+    tmp_path,
+    create,
+    model_class,
+    orm_class,
+):
+    jp_async_scheduler.staging_path = str(tmp_path / "staging")
+    jp_async_scheduler.input_folder_max_bytes = 10
+    model = model_class(
+        input_uri=str(root_dir_with_input_folder),
+        runtime_environment_name="default",
+        name="import hello world",
+        output_formats=["ipynb"],
+        package_input_folder=True,
+        schedule="* * * * *",
+    )
+    with patch.object(jp_async_scheduler, "start_job_process", return_value=1234):
+        with pytest.raises(InputFolderTooLargeError):
+            await getattr(jp_async_scheduler, create)(model)
+
+    assert 0 == jp_scheduler_db.query(orm_class).count()
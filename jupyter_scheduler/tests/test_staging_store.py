@@ -0,0 +1,140 @@
+import os
+import stat
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from jupyter_scheduler.staging_store import StagingStore, file_key, hash_file
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    input_dir = tmp_path / "input"
+    (input_dir / "data").mkdir(parents=True)
+    (input_dir / "notebook.ipynb").write_text("{}")
+    (input_dir / "data" / "a.csv").write_text("a,b\n1,2\n")
+    return input_dir
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StagingStore(str(tmp_path / "staging"), strategy="hardlink")
+
+
+def test_stage_directory(store, input_dir):
+    staging_dirs = [os.path.join(store.staging_path, owner) for owner in ["job-1", "job-2"]]
+    for staging_dir in staging_dirs:
+        staged_files = store.stage_directory(
+            str(input_dir), staging_dir, os.path.basename(staging_dir)
+        )
+        assert ["data/a.csv", "notebook.ipynb"] == sorted(staged_files)
+
+    digest = hash_file(str(input_dir / "data" / "a.csv"))
+    blob = store.blob_path(digest)
+    assert 2 == store.refcount(digest)
+    for staging_dir in staging_dirs:
+        staged_file = os.path.join(staging_dir, "data", "a.csv")
+        assert "a,b\n1,2\n" == Path(staged_file).read_text()
+        assert os.path.samefile(blob, staged_file)
+    assert not os.stat(blob).st_mode & stat.S_IWUSR
+
+
+def test_release(store, input_dir):
+    for owner in ["job-1", "job-2"]:
+        store.stage_file(
+            str(input_dir / "notebook.ipynb"),
+            os.path.join(store.staging_path, owner, "notebook.ipynb"),
+            owner,
+        )
+    digest = hash_file(str(input_dir / "notebook.ipynb"))
+
+    assert 0 == store.release("job-1")
+    assert os.path.exists(store.blob_path(digest))
+    assert 1 == store.refcount(digest)
+
+    assert 2 == store.release("job-2")
+    assert not os.path.exists(store.blob_path(digest))
+    assert 0 == store.refcount(digest)
+
+
+def test_cached_digests_are_bounded(store, input_dir):
+    store.max_cached_digests = 2
+    store.stage_directory(str(input_dir), os.path.join(store.staging_path, "job-1"), "job-1")
+    # The digests of two source files and their two blobs were computed
+    assert 2 == len(store._digests)
+
+
+def test_release_forgets_digest_of_removed_blob(store, input_dir):
+    store.stage_file(
+        str(input_dir / "notebook.ipynb"),
+        os.path.join(store.staging_path, "job-1", "notebook.ipynb"),
+        "job-1",
+    )
+    blob_key = file_key(os.stat(store.blob_path(hash_file(str(input_dir / "notebook.ipynb")))))
+    assert blob_key in store._digests
+
+    store.release("job-1")
+    assert blob_key not in store._digests
+
+
+def test_collect_garbage(store, input_dir):
+    staging_dir = os.path.join(store.staging_path, "job-1")
+    store.stage_directory(str(input_dir), staging_dir, "job-1")
+    digest = hash_file(str(input_dir / "notebook.ipynb"))
+
+    assert 0 == store.collect_garbage()
+    assert os.path.exists(store.blob_path(digest))
+
+    for root, dirs, files in os.walk(staging_dir, topdown=False):
+        for name in files:
+            os.remove(os.path.join(root, name))
+        os.rmdir(root)
+
+    assert 10 == store.collect_garbage()
+    assert not os.path.exists(store.blob_path(digest))
+
+
+def test_stage_directory_places_files_concurrently(tmp_path, input_dir):
+    store = StagingStore(str(tmp_path / "staging"), strategy="copy", concurrency=2)
+    both_placing = threading.Barrier(2, timeout=5)
+    place = store.place
+
+    def wait_for_other_file(blob, destination):
+        # Times out if the files of the directory are placed one at a time
+        both_placing.wait()
+        place(blob, destination)
+
+    with patch.object(store, "place", side_effect=wait_for_other_file):
+        staged_files = store.stage_directory(
+            str(input_dir), os.path.join(store.staging_path, "job-1"), "job-1"
+        )
+
+    assert ["data/a.csv", "notebook.ipynb"] == sorted(staged_files)
+
+
+def test_stage_file_while_releasing(store, input_dir):
+    source = str(input_dir / "notebook.ipynb")
+    digest = hash_file(source)
+    errors = []
+
+    def stage_and_release(owner: str):
+        try:
+            for _ in range(50):
+                store.stage_file(
+                    source, os.path.join(store.staging_path, owner, "notebook.ipynb"), owner
+                )
+                store.release(owner)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=stage_and_release, args=(f"job-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [] == errors
+    assert 0 == store.refcount(digest)
+    assert not os.path.exists(store.blob_path(digest))
@@ -0,0 +1,207 @@
+import errno
+import os
+import stat
+import tracemalloc
+from unittest.mock import patch
+
+import fsspec
+import pytest
+from fsspec.implementations.asyn_wrapper import AsyncFileSystemWrapper
+
+from jupyter_scheduler.exceptions import InputFolderTooLargeError
+from jupyter_scheduler.utils import FileCopier, copy_directory, copy_file
+
+FILE_SIZE = 8 * 1024 * 1024
+BUFFER_SIZE = 64 * 1024
+
+
+@pytest.fixture
+def large_file(tmp_path):
+    path = tmp_path / "source" / "data.bin"
+    path.parent.mkdir()
+    with open(path, "wb") as f:
+        for _ in range(FILE_SIZE // BUFFER_SIZE):
+            f.write(os.urandom(BUFFER_SIZE))
+    return path
+
+
+@pytest.fixture
+def unsupported_methods():
+    with patch.object(FileCopier, "_unsupported", set()) as unsupported:
+        yield unsupported
+
+
+def copy_peak_memory(source, destination) -> int:
+    """Returns the peak memory allocated while copying `source` to `destination`"""
+    tracemalloc.start()
+    try:
+        copy_file(str(source), str(destination), BUFFER_SIZE)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_copy_file(large_file, tmp_path):
+    destination = tmp_path / "staging" / "job-1" / "data.bin"
+
+    peak = copy_peak_memory(large_file, destination)
+
+    assert large_file.read_bytes() == destination.read_bytes()
+    assert peak < FILE_SIZE / 8
+
+
+def test_copy_file_without_kernel_copy(large_file, tmp_path):
+    destination = tmp_path / "staging" / "data.bin"
+    unsupported = OSError(errno.EXDEV, "Invalid cross-device link")
+
+    with patch("os.copy_file_range", side_effect=unsupported, create=True):
+        peak = copy_peak_memory(large_file, destination)
+
+    assert large_file.read_bytes() == destination.read_bytes()
+    assert peak < BUFFER_SIZE * 4
+
+
+def test_copy_file_to_fsspec_path(large_file):
+    destination = "memory://staging/job-1/data.bin"
+
+    copy_file(str(large_file), destination, BUFFER_SIZE)
+
+    with fsspec.open(destination, "rb") as f:
+        assert large_file.read_bytes() == f.read()
+    fsspec.filesystem("memory").rm(destination)
+
+
+def test_copy_directory(large_file, tmp_path):
+    source_dir = large_file.parent
+    (source_dir / "a" / "b").mkdir(parents=True)
+    (source_dir / "a" / "b" / "helloworld.txt").write_text("hello world")
+    (source_dir / "excluded.txt").write_text("excluded")
+    destination_dir = tmp_path / "staging"
+
+    copied_files = copy_directory(
+        str(source_dir), str(destination_dir), ["excluded.txt"], buffer_size=BUFFER_SIZE
+    )
+
+    assert ["a/b/helloworld.txt", "data.bin"] == sorted(copied_files)
+    assert "hello world" == (destination_dir / "a" / "b" / "helloworld.txt").read_text()
+    assert large_file.read_bytes() == (destination_dir / "data.bin").read_bytes()
+
+
+def test_copy_directory_with_exclude_patterns(tmp_path):
+    source_dir = tmp_path / "source"
+    (source_dir / ".ipynb_checkpoints").mkdir(parents=True)
+    (source_dir / ".ipynb_checkpoints" / "notebook-checkpoint.ipynb").write_text("{}")
+    (source_dir / "notebook.ipynb").write_text("{}")
+    (source_dir / "notebook.log").write_text("log")
+
+    copied_files = copy_directory(
+        str(source_dir), str(tmp_path / "staging"), [".ipynb_checkpoints", "*.log"]
+    )
+
+    assert ["notebook.ipynb"] == copied_files
+    assert not (tmp_path / "staging" / ".ipynb_checkpoints").exists()
+
+
+def test_hardlink_read_only_files(tmp_path, unsupported_methods):
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    (source_dir / "read_only.csv").write_text("a,b")
+    (source_dir / "read_only.csv").chmod(stat.S_IRUSR)
+    (source_dir / "writable.csv").write_text("c,d")
+    destination_dir = tmp_path / "staging"
+
+    copied_files = FileCopier("hardlink").copy_directory(str(source_dir), str(destination_dir))
+
+    assert ["read_only.csv", "writable.csv"] == sorted(copied_files)
+    assert (destination_dir / "read_only.csv").samefile(source_dir / "read_only.csv")
+    assert not (destination_dir / "writable.csv").samefile(source_dir / "writable.csv")
+    assert "c,d" == (destination_dir / "writable.csv").read_text()
+
+
+def test_unsupported_method_is_detected_once(tmp_path, unsupported_methods):
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (source_dir / name).write_text(name)
+    unsupported = OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    with patch.object(FileCopier, "reflink", side_effect=unsupported) as reflink:
+        FileCopier("reflink").copy_directory(str(source_dir), str(tmp_path / "staging"))
+
+    reflink.assert_called_once()
+    assert 1 == len(unsupported_methods)
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        assert name == (tmp_path / "staging" / name).read_text()
+
+
+class AsyncMemoryFileSystem(AsyncFileSystemWrapper):
+    protocol = "asyncmemory"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(fsspec.filesystem("memory"), *args, **kwargs)
+
+
+@pytest.fixture
+def small_files(tmp_path):
+    source_dir = tmp_path / "source"
+    (source_dir / "a").mkdir(parents=True)
+    for i in range(20):
+        (source_dir / "a" / f"{i}.txt").write_text(str(i))
+    return source_dir
+
+
+def test_copy_files_concurrently(small_files, tmp_path):
+    files = [
+        (str(small_files / "a" / f"{i}.txt"), str(tmp_path / "staging" / f"{i}.txt"))
+        for i in range(20)
+    ]
+    files.append((str(small_files / "missing.txt"), str(tmp_path / "staging" / "missing.txt")))
+
+    errors = FileCopier("copy", concurrency=4).copy_files(files)
+
+    assert [None] * 20 == errors[:20]
+    assert isinstance(errors[20], FileNotFoundError)
+    for i in range(20):
+        assert str(i) == (tmp_path / "staging" / f"{i}.txt").read_text()
+
+
+def test_copy_directory_to_async_filesystem(small_files, tmp_path):
+    fsspec.register_implementation("asyncmemory", AsyncMemoryFileSystem, clobber=True)
+    memory = fsspec.filesystem("memory")
+
+    with patch("jupyter_scheduler.utils.copy_file") as mock_copy_file:
+        copied_files = copy_directory(str(small_files), "asyncmemory://staging", concurrency=4)
+
+    mock_copy_file.assert_not_called()
+    assert 20 == len(copied_files)
+    assert b"7" == memory.cat("/staging/a/7.txt")
+    memory.rm("/staging", recursive=True)
+
+
+def test_copy_files_from_async_filesystem(small_files, tmp_path):
+    fsspec.register_implementation("asyncmemory", AsyncMemoryFileSystem, clobber=True)
+    copy_directory(str(small_files), "asyncmemory://staging")
+    files = [
+        (f"asyncmemory://staging/a/{i}.txt", str(tmp_path / "output" / f"{i}.txt"))
+        for i in range(5)
+    ]
+    files.insert(2, ("asyncmemory://staging/missing.txt", str(tmp_path / "output" / "missing.txt")))
+
+    get = AsyncMemoryFileSystem.get
+    with patch.object(AsyncMemoryFileSystem, "get", autospec=True, side_effect=get) as mock_get:
+        errors = FileCopier("copy", concurrency=4).copy_files(files)
+
+    # The whole batch is downloaded with one call
+    assert 6 == len(mock_get.call_args_list[0].args[1])
+    assert [None, None, None, None, None] == errors[:2] + errors[3:]
+    assert isinstance(errors[2], FileNotFoundError)
+    for i in range(5):
+        assert str(i) == (tmp_path / "output" / f"{i}.txt").read_text()
+    fsspec.filesystem("memory").rm("/staging", recursive=True)
+
+
+def test_copy_directory_over_max_bytes(small_files, tmp_path):
+    with pytest.raises(InputFolderTooLargeError):
+        copy_directory(str(small_files), str(tmp_path / "staging"), max_bytes=10)
+
+    assert not (tmp_path / "staging").exists()
@@ -0,0 +1,71 @@
+import os
+import time
+from functools import partial
+
+from jupyter_scheduler.tests.utils import wait_for
+from jupyter_scheduler.workers import WorkerPool, register_exit_callback
+
+
+def write_pid(path):
+    with open(path, "w") as f:
+        f.write(str(os.getpid()))
+
+
+def register_write_pid(path):
+    register_exit_callback(partial(write_pid, path))
+
+
+def test_worker_pool_reuses_workers(tmp_path):
+    pool = WorkerPool(size=1, preload_modules=["json"])
+    try:
+        first = pool.submit(partial(write_pid, tmp_path / "first"))
+        wait_for(first)
+        second = pool.submit(partial(write_pid, tmp_path / "second"))
+        wait_for(second)
+
+        assert first.pid == second.pid
+        assert (tmp_path / "first").read_text() == str(first.pid)
+        assert (tmp_path / "second").read_text() == str(first.pid)
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_runs_overflow_in_new_process(tmp_path):
+    pool = WorkerPool(size=1, preload_modules=["json"])
+    try:
+        pooled = pool.submit(partial(time.sleep, 1))
+        overflow = pool.submit(partial(write_pid, tmp_path / "overflow"))
+        wait_for(overflow)
+
+        assert pooled.pid != overflow.pid
+        assert (tmp_path / "overflow").read_text() == str(overflow.pid)
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_replaces_retired_workers(tmp_path):
+    pool = WorkerPool(size=1, max_jobs_per_worker=1, preload_modules=["json"])
+    try:
+        first = pool.submit(partial(write_pid, tmp_path / "first"))
+        wait_for(first)
+        second = pool.submit(partial(write_pid, tmp_path / "second"))
+        wait_for(second)
+
+        assert first.pid != second.pid
+    finally:
+        pool.shutdown()
+
+
+def test_worker_pool_shutdown_runs_exit_callbacks(tmp_path):
+    pool = WorkerPool(
+        size=1,
+        preload_modules=["json"],
+        initializer=register_write_pid,
+        initargs=(tmp_path / "exited",),
+    )
+    worker = pool.workers[0]
+
+    pool.shutdown(timeout=30)
+
+    assert not worker.is_alive()
+    assert (tmp_path / "exited").read_text() == str(worker.pid)
@@ -1,4 +1,5 @@
 import json
+import time
 
 from tornado.httpclient import HTTPClientError
 from tornado.web import HTTPError
@@ -26,3 +27,11 @@ def expected_http_error(error, expected_code, expected_message=None):
             if expected_message != message:
                 return False
         return True
+
+
+def wait_for(task, timeout=30):
+    """Waits for a process-like `task` to exit"""
+    deadline = time.time() + timeout
+    while task.is_alive():
+        assert time.time() < deadline
+        time.sleep(0.05)
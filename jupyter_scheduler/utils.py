@@ -1,17 +1,36 @@
+import errno
+import fnmatch
 import json
 import os
 import shutil
+import stat
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
 import fsspec
 import pytz
 from croniter import croniter
+from fsspec.asyn import AsyncFileSystem
 from nbformat import NotebookNode
 
+from jupyter_scheduler.exceptions import InputFolderTooLargeError
 from jupyter_scheduler.models import CreateJob
 
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Size of the chunks that files are copied in
+DEFAULT_COPY_BUFFER_SIZE = 1024 * 1024
+
+WRITABLE = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
 
 class UUIDEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -21,6 +40,80 @@ class UUIDEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+class DirectoryListings:
+    """Memoized directory listings, each directory is read with a single
+    `os.scandir` call no matter how many of its entries are looked up
+    """
+
+    def __init__(self):
+        self._listings: Dict[str, Dict[str, bool]] = {}
+
+    def entries(self, path: str) -> Dict[str, bool]:
+        """Returns a mapping of the names of files and directories in `path`
+        to whether the entry is a directory, missing and unreadable
+        directories have no entries
+        """
+        if path not in self._listings:
+            listing = {}
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir():
+                                listing[entry.name] = True
+                            elif entry.is_file():
+                                listing[entry.name] = False
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            self._listings[path] = listing
+
+        return self._listings[path]
+
+    def isfile(self, path: str) -> bool:
+        dirname, name = os.path.split(os.path.normpath(path))
+        return self.entries(dirname).get(name) is False
+
+    def isdir(self, path: str) -> bool:
+        dirname, name = os.path.split(os.path.normpath(path))
+        return self.entries(dirname).get(name) is True
+
+
+class RecentTokens:
+    """Tokens added in the last `ttl` seconds, the oldest
+    tokens are dropped first above `max_entries` tokens
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._tokens: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        deadline = time.monotonic() - self.ttl
+        while self._tokens and (
+            len(self._tokens) > self.max_entries or next(iter(self._tokens.values())) < deadline
+        ):
+            self._tokens.popitem(last=False)
+
+    def __contains__(self, token: str) -> bool:
+        with self._lock:
+            self._expire()
+            return token in self._tokens
+
+    def add(self, token: str):
+        with self._lock:
+            self._tokens.pop(token, None)
+            self._tokens[token] = time.monotonic()
+            self._expire()
+
+    def discard(self, token: str):
+        with self._lock:
+            self._tokens.pop(token, None)
+
+
 def timestamp_to_int(timestamp: str) -> int:
     """Converts string date in format yyyy-mm-dd h:m:s to int"""
 
@@ -87,29 +180,307 @@ def get_localized_timestamp(timezone) -> int:
     return int(local_date.timestamp() * 1000)
 
 
+# Errors of the in-kernel copy calls for files they cannot copy,
+# such as files on different or unsupported filesystems
+UNSUPPORTED_COPY_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.ENOTSUP, errno.EBADF}
+
+
+def is_local_path(path: str) -> bool:
+    return "://" not in path or path.startswith("file://")
+
+
+def strip_file_protocol(path: str) -> str:
+    return path[len("file://") :] if path.startswith("file://") else path
+
+
+def copy_file_object(source_file, destination_file, buffer_size: int = DEFAULT_COPY_BUFFER_SIZE):
+    """Copies the rest of `source_file` to `destination_file` in chunks of `buffer_size` bytes"""
+    shutil.copyfileobj(source_file, destination_file, buffer_size)
+
+
+def copy_local_file(source: str, destination: str, buffer_size: int = DEFAULT_COPY_BUFFER_SIZE):
+    """Copies a local file without reading it into memory, with `os.copy_file_range`
+    or `os.sendfile` where the platform and filesystems support them, otherwise in
+    chunks of `buffer_size` bytes
+    """
+    with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+        source_fd = source_file.fileno()
+        destination_fd = destination_file.fileno()
+        offset = 0
+        try:
+            if hasattr(os, "copy_file_range"):
+                while True:
+                    copied = os.copy_file_range(source_fd, destination_fd, buffer_size)
+                    if not copied:
+                        return
+                    offset += copied
+            elif hasattr(os, "sendfile"):
+                while True:
+                    copied = os.sendfile(destination_fd, source_fd, offset, buffer_size)
+                    if not copied:
+                        return
+                    offset += copied
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_COPY_ERRNOS:
+                raise
+
+        source_file.seek(offset)
+        destination_file.seek(offset)
+        copy_file_object(source_file, destination_file, buffer_size)
+
+
+def copy_file(source: str, destination: str, buffer_size: int = DEFAULT_COPY_BUFFER_SIZE):
+    """Copies the file at `source` to `destination`, creating its parent directories,
+    so that memory use does not grow with the size of the file. Both paths can be
+    any path supported by fsspec, files that are not local are copied in chunks
+    of `buffer_size` bytes.
+    """
+    if is_local_path(source) and is_local_path(destination):
+        source = strip_file_protocol(source)
+        destination = strip_file_protocol(destination)
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        copy_local_file(source, destination, buffer_size)
+    else:
+        with fsspec.open(source, "rb") as source_file:
+            with fsspec.open(destination, "wb") as destination_file:
+                copy_file_object(source_file, destination_file, buffer_size)
+
+
+# ioctl request that clones a file on filesystems with shared extents, such as btrfs and XFS
+FICLONE = 0x40049409
+
+COPY_STRATEGIES = ("auto", "reflink", "hardlink", "copy")
+
+# Errors of cloning and linking between filesystems that do not support them
+UNSUPPORTED_LINK_ERRNOS = UNSUPPORTED_COPY_ERRNOS | {
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EPERM,
+    errno.EMLINK,
+}
+
+
+class FileCopier:
+    """Copies local files with the cheapest method allowed by `strategy`
+    and supported by the filesystems of the source and the destination.
+
+    - `reflink` clones files that share their extents with the source
+      until either one is written to, then falls back to `copy`.
+    - `hardlink` links the files that cannot be written to, which
+      cannot change through the link, then falls back to `copy`.
+    - `auto` tries `reflink`, then `hardlink`, then `copy`.
+    - `copy` copies the bytes.
+
+    Whether a filesystem supports a method is detected with the first
+    file copied between the two devices and shared by all copiers. Up to
+    `concurrency` files are copied at a time by `copy_files`.
+    """
+
+    _unsupported = set()
+    _unsupported_lock = threading.Lock()
+
+    def __init__(
+        self,
+        strategy: str = "auto",
+        buffer_size: int = DEFAULT_COPY_BUFFER_SIZE,
+        concurrency: int = 1,
+    ):
+        if strategy not in COPY_STRATEGIES:
+            raise ValueError(f"Unknown copy strategy '{strategy}'.")
+        self.strategy = strategy
+        self.buffer_size = buffer_size
+        self.concurrency = max(concurrency, 1)
+
+    def methods(self) -> List[str]:
+        if self.strategy == "auto":
+            return ["reflink", "hardlink"]
+        if self.strategy == "copy":
+            return []
+        return [self.strategy]
+
+    def is_supported(self, method: str, devices: tuple) -> bool:
+        return (method, *devices) not in self._unsupported
+
+    def set_unsupported(self, method: str, devices: tuple):
+        with self._unsupported_lock:
+            self._unsupported.add((method, *devices))
+
+    def reflink(self, source: str, destination: str):
+        with open(source, "rb") as source_file, open(destination, "wb") as destination_file:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+
+    def copy(self, source: str, destination: str, source_stat: Optional[os.stat_result] = None):
+        """Copies the local file `source` to `destination`, whose directory must exist"""
+        source_stat = source_stat or os.stat(source)
+        devices = (source_stat.st_dev, os.stat(os.path.dirname(destination) or ".").st_dev)
+        for method in self.methods():
+            if not self.is_supported(method, devices):
+                continue
+            if method == "hardlink" and source_stat.st_mode & WRITABLE:
+                continue
+            try:
+                if method == "reflink":
+                    if fcntl is None:
+                        raise OSError(errno.ENOTSUP, "Cloning files is not supported")
+                    self.reflink(source, destination)
+                else:
+                    os.link(source, destination)
+                    return
+            except OSError as e:
+                if e.errno not in UNSUPPORTED_LINK_ERRNOS:
+                    raise
+                self.set_unsupported(method, devices)
+                if os.path.lexists(destination):
+                    os.remove(destination)
+                continue
+            shutil.copystat(source, destination)
+            return
+
+        copy_local_file(source, destination, self.buffer_size)
+        shutil.copystat(source, destination)
+
+    def copy_path(self, source: str, destination: str):
+        """Copies `source` to `destination`, creating its parent directories. Both
+        paths can be any path supported by fsspec, local files are copied with `copy`.
+        """
+        if not (is_local_path(source) and is_local_path(destination)):
+            copy_file(source, destination, self.buffer_size)
+            return
+
+        source = strip_file_protocol(source)
+        destination = strip_file_protocol(destination)
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        # Replaces the file instead of writing to it, a link would change the source
+        if os.path.lexists(destination):
+            os.remove(destination)
+        self.copy(source, destination)
+
+    def copy_files(self, files: List[Tuple[str, str]]) -> List[Optional[Exception]]:
+        """Copies every (source, destination) pair of `files`, up to `concurrency` at a
+        time. Files between a local path and an async fsspec filesystem are transferred
+        in batches with `get` or `put` of the filesystem, the others on a thread pool.
+        Returns the error of every pair, None for the pairs that were copied.
+        """
+        errors: List[Optional[Exception]] = [None] * len(files)
+        batches: Dict[Tuple[AsyncFileSystem, bool], List[Tuple[int, str, str]]] = {}
+        threaded = []
+        for i, (source, destination) in enumerate(files):
+            if is_local_path(source) != is_local_path(destination):
+                download = is_local_path(destination)
+                fs, remote_path = fsspec.core.url_to_fs(source if download else destination)
+                if isinstance(fs, AsyncFileSystem):
+                    local_path = strip_file_protocol(destination if download else source)
+                    batches.setdefault((fs, download), []).append((i, remote_path, local_path))
+                    continue
+            threaded.append(i)
+
+        for (fs, download), batch in batches.items():
+            remote_paths = [remote_path for _, remote_path, _ in batch]
+            local_paths = [local_path for _, _, local_path in batch]
+            try:
+                if download:
+                    fs.get(remote_paths, local_paths, batch_size=self.concurrency)
+                else:
+                    fs.put(local_paths, remote_paths, batch_size=self.concurrency)
+            except Exception:
+                # The batch stops at the first error, its files are copied again
+                # one at a time to find the files that fail
+                threaded.extend(i for i, _, _ in batch)
+                threaded.sort()
+
+        def copy_pair(i: int):
+            try:
+                self.copy_path(*files[i])
+            except Exception as e:
+                errors[i] = e
+
+        if self.concurrency > 1 and len(threaded) > 1:
+            with ThreadPoolExecutor(min(self.concurrency, len(threaded))) as executor:
+                list(executor.map(copy_pair, threaded))
+        else:
+            for i in threaded:
+                copy_pair(i)
+
+        return errors
+
+    def copy_directory(
+        self,
+        source_dir: str,
+        destination_dir: str,
+        exclude_files: Optional[List[str]] = None,
+        max_bytes: int = 0,
+    ) -> List[str]:
+        """Copies the files under the local `source_dir` to `destination_dir`, which can
+        be any path supported by fsspec, except for the files and directories whose name
+        matches one of the `exclude_files` glob patterns. Nothing is copied if the files
+        add up to more than `max_bytes`, when set. Returns the paths of the copied files
+        relative to `destination_dir`.
+        """
+        directories, copied_files = list_directory(source_dir, exclude_files, max_bytes)
+        if is_local_path(destination_dir):
+            for rel_dir in directories:
+                os.makedirs(
+                    os.path.join(strip_file_protocol(destination_dir), rel_dir), exist_ok=True
+                )
+
+        files = [
+            (
+                os.path.join(source_dir, rel_path),
+                destination_dir.rstrip("/") + "/" + rel_path.replace(os.sep, "/"),
+            )
+            for rel_path in copied_files
+        ]
+        for error in self.copy_files(files):
+            if error:
+                raise error
+
+        return copied_files
+
+
+def list_directory(
+    source_dir: str, exclude_files: Optional[List[str]] = None, max_bytes: int = 0
+) -> Tuple[List[str], List[str]]:
+    """Returns the paths of the directories and of the files under `source_dir` relative
+    to it, except for those whose name matches one of the `exclude_files` glob patterns.
+    Raises InputFolderTooLargeError as soon as the files add up to more than `max_bytes`,
+    when set, so that a large directory is not walked to the end.
+    """
+    exclude_files = exclude_files or []
+
+    def is_excluded(name: str) -> bool:
+        return any(fnmatch.fnmatch(name, pattern) for pattern in exclude_files)
+
+    directories = []
+    files = []
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(source_dir, followlinks=True):
+        dirnames[:] = [name for name in dirnames if not is_excluded(name)]
+        rel_dir = os.path.relpath(dirpath, source_dir)
+        directories.append(rel_dir)
+        for filename in filenames:
+            if is_excluded(filename):
+                continue
+            if max_bytes:
+                size += os.stat(os.path.join(dirpath, filename)).st_size
+                if size > max_bytes:
+                    raise InputFolderTooLargeError(source_dir, max_bytes)
+            files.append(os.path.normpath(os.path.join(rel_dir, filename)))
+
+    return directories, files
+
+
 def copy_directory(
     source_dir: str,
     destination_dir: str,
     exclude_files: Optional[List[str]] = [],
+    buffer_size: int = DEFAULT_COPY_BUFFER_SIZE,
+    strategy: str = "copy",
+    concurrency: int = 1,
+    max_bytes: int = 0,
 ) -> List[str]:
     """Copies content of source_dir to destination_dir excluding exclude_files.
     Returns a list of relative paths to copied files from destination_dir.
     """
-    copied_files = []
-    for item in os.listdir(source_dir):
-        source = os.path.join(source_dir, item)
-        destination = os.path.join(destination_dir, item)
-        if os.path.isdir(source):
-            shutil.copytree(source, destination, ignore=shutil.ignore_patterns(*exclude_files))
-            for dirpath, _, filenames in os.walk(destination):
-                for filename in filenames:
-                    rel_path = os.path.relpath(os.path.join(dirpath, filename), destination_dir)
-                    copied_files.append(rel_path)
-        elif os.path.isfile(source) and item not in exclude_files:
-            with fsspec.open(source, "rb") as source_file:
-                with fsspec.open(destination, "wb") as output_file:
-                    output_file.write(source_file.read())
-            rel_path = os.path.relpath(destination, destination_dir)
-            copied_files.append(rel_path)
-
-    return copied_files
+    return FileCopier(strategy, buffer_size, concurrency).copy_directory(
+        source_dir, destination_dir, exclude_files, max_bytes
+    )
@@ -0,0 +1,298 @@
+import atexit
+import importlib
+import multiprocessing as mp
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_PRELOAD_MODULES = [
+    "fsspec",
+    "nbconvert",
+    "nbconvert.preprocessors",
+    "nbformat",
+    "sqlalchemy",
+    "jupyter_scheduler.executors",
+]
+
+# Seconds between calls of the idle callbacks while a worker waits for work
+IDLE_CALLBACK_INTERVAL = 10
+
+_idle_callbacks: List[Callable] = []
+_exit_callbacks: List[Callable] = []
+_stats_callbacks: List[Callable[[], Dict[str, int]]] = []
+
+
+def register_idle_callback(callback: Callable):
+    """Registers a callback that a worker process calls periodically while idle"""
+    _idle_callbacks.append(callback)
+
+
+def register_exit_callback(callback: Callable):
+    """Registers a callback that a worker process calls before it exits"""
+    _exit_callbacks.append(callback)
+
+
+def register_stats_callback(callback: Callable[[], Dict[str, int]]):
+    """Registers a callback that returns counters of a worker process,
+    they are sent to the parent with the result of each work item
+    """
+    _stats_callbacks.append(callback)
+
+
+def collect_stats() -> Dict[str, int]:
+    stats = {}
+    for callback in _stats_callbacks:
+        try:
+            stats.update(callback())
+        except Exception:
+            traceback.print_exc()
+    return stats
+
+
+def run_callbacks(callbacks: List[Callable]):
+    for callback in callbacks:
+        try:
+            callback()
+        except Exception:
+            traceback.print_exc()
+
+
+def worker_main(
+    conn,
+    preload_modules: List[str],
+    initializer: Optional[Callable] = None,
+    initargs: Sequence = (),
+):
+    """Entry point of a worker process, imports the expensive
+    modules once and then runs the received work items one
+    at a time until the pipe is closed.
+    """
+    for module in preload_modules:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            traceback.print_exc()
+
+    if initializer:
+        try:
+            initializer(*initargs)
+        except Exception:
+            traceback.print_exc()
+
+    try:
+        run_work_items(conn)
+    finally:
+        run_callbacks(_exit_callbacks)
+
+
+def run_work_items(conn):
+    while True:
+        try:
+            if not conn.poll(IDLE_CALLBACK_INTERVAL):
+                run_callbacks(_idle_callbacks)
+                continue
+
+            target = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if target is None:
+            break
+
+        try:
+            target()
+        except Exception:
+            traceback.print_exc()
+
+        try:
+            conn.send(collect_stats())
+        except (BrokenPipeError, OSError):
+            break
+
+
+class Worker:
+    """A long-lived worker process that receives work items over a pipe"""
+
+    def __init__(
+        self,
+        mp_ctx,
+        preload_modules: List[str],
+        initializer: Optional[Callable] = None,
+        initargs: Sequence = (),
+    ):
+        parent_conn, child_conn = mp_ctx.Pipe()
+        self.process = mp_ctx.Process(
+            target=worker_main, args=(child_conn, preload_modules, initializer, initargs)
+        )
+        self.process.start()
+        child_conn.close()
+
+        self.conn = parent_conn
+        self.busy = False
+        self.jobs_run = 0
+        # Counters reported by the worker with the result of its last work item
+        self.stats: Dict[str, int] = {}
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def submit(self, target: Callable):
+        self.busy = True
+        self.jobs_run += 1
+        self.conn.send(target)
+
+    def poll(self):
+        """Marks the worker as idle if the current work item has finished"""
+        if not self.busy:
+            return
+
+        try:
+            if self.conn.poll():
+                self.stats = self.conn.recv()
+                self.busy = False
+        except (EOFError, OSError):
+            self.busy = False
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def close(self):
+        """Asks the worker to exit once it is done with the current work item"""
+        try:
+            if self.is_alive():
+                self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            self.conn.close()
+
+
+class WorkerTask:
+    """Handle for a work item running in a pooled worker,
+    mirrors the `pid` and `is_alive` API of `multiprocessing.Process`
+    """
+
+    def __init__(self, worker: Worker):
+        self.worker = worker
+        self.pid = worker.pid
+        self.sequence = worker.jobs_run
+
+    def is_alive(self) -> bool:
+        self.worker.poll()
+        return self.worker.busy and self.worker.jobs_run == self.sequence and self.worker.is_alive()
+
+
+class WorkerPool:
+    """Pool of pre-started worker processes for executing jobs.
+
+    Workers are started with the `spawn` context, so they are never
+    forked from the server process. Each worker imports the modules
+    in `preload_modules` up front and then runs work items one after
+    the other, which removes the interpreter start and import time
+    from the execution of each job.
+
+    Parameters
+    ----------
+    size : int
+        Number of workers kept warm
+    max_jobs_per_worker : int, optional
+        Number of work items after which a worker is replaced with a
+        fresh one, 0 means workers are never replaced
+    preload_modules : list of str, optional
+        Modules imported by each worker at start
+    initializer : callable, optional
+        Called with `initargs` by each worker after the imports
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_jobs_per_worker: int = 0,
+        preload_modules: Optional[List[str]] = None,
+        initializer: Optional[Callable] = None,
+        initargs: Sequence = (),
+    ):
+        self.size = size
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.preload_modules = preload_modules or DEFAULT_PRELOAD_MODULES
+        self.initializer = initializer
+        self.initargs = initargs
+        self.mp_ctx = mp.get_context("spawn")
+        self.workers: List[Worker] = []
+        # Counters of the workers that have been replaced or shut down
+        self.retired_stats: Dict[str, int] = {}
+        self.maintain()
+        atexit.register(self.shutdown)
+
+    def maintain(self):
+        """Replaces exited and retired workers so that `size` workers are available"""
+        workers = []
+        for worker in self.workers:
+            worker.poll()
+            if not worker.is_alive():
+                worker.conn.close()
+                self.retire(worker)
+            elif (
+                not worker.busy
+                and self.max_jobs_per_worker
+                and worker.jobs_run >= self.max_jobs_per_worker
+            ):
+                worker.close()
+                self.retire(worker)
+            else:
+                workers.append(worker)
+
+        while len(workers) < self.size:
+            workers.append(
+                Worker(self.mp_ctx, self.preload_modules, self.initializer, self.initargs)
+            )
+
+        self.workers = workers
+
+    def retire(self, worker: Worker):
+        for name, value in worker.stats.items():
+            self.retired_stats[name] = self.retired_stats.get(name, 0) + value
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the sum of the counters reported by the workers of the pool,
+        such as the kernel pool hits and misses, since the pool was created
+        """
+        stats = dict(self.retired_stats)
+        for worker in self.workers:
+            worker.poll()
+            for name, value in worker.stats.items():
+                stats[name] = stats.get(name, 0) + value
+        return stats
+
+    def submit(self, target: Callable):
+        """Runs `target` in an idle worker, returns a process-like handle.
+
+        When all workers are busy, `target` runs in a new process
+        that exits once it completes.
+        """
+        self.maintain()
+        for worker in self.workers:
+            if not worker.busy:
+                worker.submit(target)
+                return WorkerTask(worker)
+
+        p = self.mp_ctx.Process(target=target)
+        p.start()
+        return p
+
+    def shutdown(self, timeout: float = 10):
+        """Asks the workers to exit and waits up to `timeout` seconds for the
+        idle ones, which shut down their kernels before exiting. Busy workers
+        exit once their current work item completes.
+        """
+        workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.poll()
+            worker.close()
+            self.retire(worker)
+
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            if not worker.busy:
+                worker.process.join(max(0, deadline - time.monotonic()))